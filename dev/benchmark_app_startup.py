@@ -0,0 +1,53 @@
+#!/usr/bin/env -S uv run
+"""Measure how long it takes to create a provider app.
+
+Signing keys are generated when they are first needed and shared by all
+providers in the process, so creating an app does not generate keys. The first
+`/jwks` request of the process generates them.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import oidc_provider_mock
+from oidc_provider_mock._keys import generate_signing_key
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    start = time.perf_counter()
+    for _ in range(count):
+        oidc_provider_mock.app()
+    _print("app()", (time.perf_counter() - start) / count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        key_file = Path(tmp_dir) / "key.pem"
+        key_file.write_bytes(generate_signing_key("RS256").as_pem(private=True))
+
+        start = time.perf_counter()
+        for _ in range(count):
+            oidc_provider_mock.app(signing_key_file=str(key_file))
+        _print("app(signing_key_file=...)", (time.perf_counter() - start) / count)
+
+    client = oidc_provider_mock.app().test_client()
+    start = time.perf_counter()
+    client.get("/jwks")
+    _print("first /jwks request", time.perf_counter() - start)
+
+    client = oidc_provider_mock.app().test_client()
+    start = time.perf_counter()
+    client.get("/jwks")
+    _print("/jwks request of new app", time.perf_counter() - start)
+
+
+def _print(name: str, seconds: float):
+    print(f"{name:<26} {seconds * 1000:8.2f} ms")  # ruff: ignore[print]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env -S uv run
+"""Compare the throughput of the server with the ASGI and the WSGI interface
+under concurrent requests.
+
+The server runs in a separate process started with `--production`.
+"""
+
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+_REDIRECT_URI = "https://example.com/callback"
+_CONCURRENCY = 32
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for port, interface in [(9481, "wsgi"), (9482, "asgi")]:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "oidc_provider_mock",
+                "--production",
+                "--interface",
+                interface,
+                "--port",
+                str(port),
+            ],
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            _wait_for_server(base_url)
+            results = asyncio.run(_benchmark(base_url, count))
+        finally:
+            server.terminate()
+            server.wait()
+
+        for endpoint, requests_per_second in results.items():
+            print(f"{interface} {endpoint:<10} {requests_per_second:8.0f} requests/s")  # ruff: ignore[print]
+
+
+def _wait_for_server(base_url: str):
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/.well-known/openid-configuration")
+            return
+        except httpx.ConnectError:
+            time.sleep(0.1)
+    raise TimeoutError("Server did not start")
+
+
+async def _benchmark(base_url: str, count: int) -> dict[str, float]:
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=httpx.Limits(max_connections=_CONCURRENCY)
+    ) as client:
+        response = await client.post(
+            "/tokens/mint",
+            json=[{"sub": f"user-{i}", "client_id": "client"} for i in range(count)],
+        )
+        access_tokens = [
+            json.loads(line)["access_token"] for line in response.text.splitlines()
+        ]
+        codes: list[str] = []
+
+        async def discovery(_: int):
+            response = await client.get("/.well-known/openid-configuration")
+            assert response.status_code == 200
+
+        async def userinfo(i: int):
+            response = await client.get(
+                "/userinfo", headers={"Authorization": f"Bearer {access_tokens[i]}"}
+            )
+            assert response.status_code == 200, response.text
+
+        async def authorize(i: int):
+            response = await client.post(
+                "/oauth2/authorize",
+                params={
+                    "client_id": "client",
+                    "redirect_uri": _REDIRECT_URI,
+                    "response_type": "code",
+                    "scope": "openid",
+                },
+                data={"sub": f"user-{i}"},
+            )
+            location = response.headers["location"]
+            codes.append(parse_qs(urlparse(location).query)["code"][0])
+
+        async def token(i: int):
+            response = await client.post(
+                "/oauth2/token",
+                data={
+                    "grant_type": "authorization_code",
+                    "code": codes[i],
+                    "redirect_uri": _REDIRECT_URI,
+                },
+                auth=("client", "secret"),
+            )
+            assert response.status_code == 200, response.text
+
+        return {
+            "discovery": await _measure(discovery, count),
+            "userinfo": await _measure(userinfo, count),
+            "authorize": await _measure(authorize, count),
+            "token": await _measure(token, count),
+        }
+
+
+async def _measure(request: Callable[[int], Awaitable[None]], count: int) -> float:
+    queue = iter(range(count))
+
+    async def worker():
+        for i in queue:
+            await request(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(_CONCURRENCY)))
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
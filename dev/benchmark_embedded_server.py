@@ -0,0 +1,77 @@
+#!/usr/bin/env -S uv run
+"""Compare the throughput of `run_server_in_thread()` with a thread per
+connection and with a pool of threads and keep-alive connections.
+
+Runs the authorization code flow with one `/oauth2/authorize` and one
+`/oauth2/token` request per user from a pooled `httpx.Client`, first from one
+thread and then from several threads.
+"""
+
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+import oidc_provider_mock
+
+_REDIRECT_URI = "https://example.com/callback"
+_CLIENT_THREADS = 8
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # Don’t measure logging of requests
+    logging.getLogger("werkzeug").disabled = True
+
+    for name, threads in [("thread per connection", None), ("pool", 8)]:
+        with (
+            oidc_provider_mock.run_server_in_thread(
+                threads=threads, production=True
+            ) as server,
+            httpx.Client(base_url=f"http://localhost:{server.server_port}") as client,
+        ):
+            # Create the signing key before measuring
+            client.get("/jwks")
+            for client_threads in [1, _CLIENT_THREADS]:
+                flows_per_second = _benchmark(client, count, client_threads)
+                result = (
+                    f"{client_threads} client threads {flows_per_second:8.0f} flows/s"
+                )
+                print(f"{name:<22} {result}")  # ruff: ignore[print]
+
+
+def _benchmark(client: httpx.Client, count: int, client_threads: int) -> float:
+    def flow(i: int):
+        response = client.post(
+            "/oauth2/authorize",
+            params={
+                "client_id": "client",
+                "redirect_uri": _REDIRECT_URI,
+                "response_type": "code",
+                "scope": "openid email",
+            },
+            data={"sub": f"user-{i}@example.com"},
+        )
+        code = parse_qs(urlparse(response.headers["location"]).query)["code"][0]
+        response = client.post(
+            "/oauth2/token",
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": _REDIRECT_URI,
+            },
+            auth=("client", "secret"),
+        )
+        assert response.json()["id_token"]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(client_threads) as executor:
+        list(executor.map(flow, range(count)))
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env -S uv run
+"""Measure how many requests per second the introspection endpoint serves.
+
+Introspection results are cached with the in-memory storage but not with the
+SQLite storage, which is shared between providers.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+
+import oidc_provider_mock
+
+_REDIRECT_URI = "https://example.com/callback"
+_TOKEN_COUNT = 100
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, storage_url in [
+            ("memory", None),
+            ("sqlite", f"sqlite:{tmp_dir}/provider.db"),
+        ]:
+            app = oidc_provider_mock.app(storage_url=storage_url)
+            # Don’t measure logging of requests
+            app.logger.disabled = True
+            requests_per_second = _benchmark(app.test_client(), count)
+            print(f"{name:<8} {requests_per_second:8.0f} requests/s")  # ruff: ignore[print]
+
+
+def _benchmark(client: flask.testing.FlaskClient, count: int) -> float:
+    tokens = [_access_token(client) for _ in range(_TOKEN_COUNT)]
+    requests = random.choices(tokens, k=count)
+
+    start = time.perf_counter()
+    for token in requests:
+        response = client.post(
+            "/oauth2/introspect",
+            data={"token": token},
+            auth=("resource-server", "secret"),
+        )
+        assert response.json
+        assert response.json["active"]
+    return count / (time.perf_counter() - start)
+
+
+def _access_token(client: flask.testing.FlaskClient) -> str:
+    response = client.post(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "scope": "openid",
+        },
+        data={"sub": "alice@example.com"},
+    )
+    assert response.location
+    code = parse_qs(urlparse(response.location).query)["code"][0]
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": _REDIRECT_URI,
+        },
+        auth=("client", "secret"),
+    )
+    assert response.json
+    return response.json["access_token"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env -S uv run
+"""Measure how many requests per second the discovery and JWKS endpoints
+serve, with and without a matching ``If-None-Match`` header.
+"""
+
+import sys
+import time
+
+import flask.testing
+
+import oidc_provider_mock
+
+_PATHS = ["/.well-known/openid-configuration", "/jwks"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    app = oidc_provider_mock.app()
+    # Don’t measure logging of requests
+    app.logger.disabled = True
+    client = app.test_client()
+
+    for path in _PATHS:
+        # Warm up key generation and caches
+        etag = client.get(path).headers["ETag"]
+
+        requests_per_second = _benchmark(client, path, count, {})
+        print(f"{path:<40} {requests_per_second:8.0f} requests/s")  # ruff: ignore[print]
+
+        requests_per_second = _benchmark(
+            client, path, count, {"If-None-Match": etag}, expected_status=304
+        )
+        print(f"{path + ' (304)':<40} {requests_per_second:8.0f} requests/s")  # ruff: ignore[print]
+
+
+def _benchmark(
+    client: flask.testing.FlaskClient,
+    path: str,
+    count: int,
+    headers: dict[str, str],
+    expected_status: int = 200,
+) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path, headers=headers)
+        assert response.status_code == expected_status
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
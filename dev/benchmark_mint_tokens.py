@@ -0,0 +1,87 @@
+#!/usr/bin/env -S uv run
+"""Measure how many token sets per second the provider issues.
+
+Compares the authorization code flow with one `/oauth2/authorize` and one
+`/oauth2/token` request per user to the bulk `/tokens/mint` endpoint.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+
+import oidc_provider_mock
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, storage_url in [
+            ("memory", None),
+            ("sqlite", f"sqlite:{tmp_dir}/provider.db"),
+        ]:
+            app = oidc_provider_mock.app(storage_url=storage_url)
+            # Don’t measure logging of requests
+            app.logger.disabled = True
+            client = app.test_client()
+            flow = _benchmark_authorization_code_flow(client, count)
+            mint = _benchmark_mint(client, count)
+            print(f"{name:<8} code flow {flow:8.0f} tokens/s")  # ruff: ignore[print]
+            print(f"{name:<8} mint      {mint:8.0f} tokens/s")  # ruff: ignore[print]
+
+
+def _benchmark_authorization_code_flow(
+    client: flask.testing.FlaskClient, count: int
+) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        response = client.post(
+            "/oauth2/authorize",
+            query_string={
+                "client_id": "client",
+                "redirect_uri": _REDIRECT_URI,
+                "response_type": "code",
+                "scope": "openid email",
+            },
+            data={"sub": f"user-{i}@example.com"},
+        )
+        assert response.location
+        code = parse_qs(urlparse(response.location).query)["code"][0]
+        response = client.post(
+            "/oauth2/token",
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": _REDIRECT_URI,
+            },
+            auth=("client", "secret"),
+        )
+        assert response.json
+        assert response.json["id_token"]
+    return count / (time.perf_counter() - start)
+
+
+def _benchmark_mint(client: flask.testing.FlaskClient, count: int) -> float:
+    body = [
+        {"sub": f"user-{i}@example.com", "client_id": "client", "scope": "openid email"}
+        for i in range(count)
+    ]
+
+    start = time.perf_counter()
+    response = client.post("/tokens/mint", json=body)
+    lines = [json.loads(line) for line in response.iter_encoded()]
+    assert len(lines) == count
+    assert all(line["id_token"] for line in lines)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env -S uv run
+"""Compare the throughput of the token and userinfo endpoints of the default
+and the production profile.
+"""
+
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+
+import oidc_provider_mock
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    for name, production in [("default", False), ("production", True)]:
+        app = oidc_provider_mock.app(production=production)
+        # Don’t measure logging of requests
+        app.logger.disabled = True
+        client = app.test_client()
+        token, userinfo = _benchmark(client, count)
+        print(f"{name:<10} token    {token:8.0f} requests/s")  # ruff: ignore[print]
+        print(f"{name:<10} userinfo {userinfo:8.0f} requests/s")  # ruff: ignore[print]
+
+
+def _benchmark(client: flask.testing.FlaskClient, count: int) -> tuple[float, float]:
+    client.put(
+        "/users/alice@example.com",
+        json={"email": "alice@example.com", "name": "Alice", "nickname": "al"},
+    )
+    codes = [_authorization_code(client) for _ in range(count)]
+
+    access_tokens: list[str] = []
+    start = time.perf_counter()
+    for code in codes:
+        response = client.post(
+            "/oauth2/token",
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": _REDIRECT_URI,
+            },
+            auth=("client", "secret"),
+        )
+        assert response.json
+        access_tokens.append(response.json["access_token"])
+    token = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for access_token in access_tokens:
+        response = client.get(
+            "/userinfo", headers={"Authorization": f"Bearer {access_token}"}
+        )
+        assert response.status_code == 200, response.text
+    userinfo = count / (time.perf_counter() - start)
+
+    return token, userinfo
+
+
+def _authorization_code(client: flask.testing.FlaskClient) -> str:
+    response = client.post(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "scope": "openid email profile",
+        },
+        data={"sub": "alice@example.com"},
+    )
+    assert response.location
+    return parse_qs(urlparse(response.location).query)["code"][0]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env -S uv run
+"""Measure the latency of `/users/<sub>/revoke-tokens` as the number of tokens
+of other users grows.
+
+The latency only depends on the number of tokens of the revoked user, so it
+stays flat. The largest number of tokens of other users is the first
+argument.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import flask.testing
+
+import oidc_provider_mock
+
+_USER_TOKENS = 10
+_ROUNDS = 50
+
+
+def main():
+    max_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    app = oidc_provider_mock.app(production=True)
+    # Don’t measure logging of requests
+    app.logger.disabled = True
+    client = app.test_client()
+
+    other_tokens = 0
+    total = 1000
+    while total <= max_tokens:
+        _mint(client, [f"user-{i}" for i in range(other_tokens, total)])
+        other_tokens = total
+
+        latencies: list[float] = []
+        for _ in range(_ROUNDS):
+            _mint(client, ["alice@example.com"] * _USER_TOKENS)
+            start = time.perf_counter()
+            response = client.post("/users/alice@example.com/revoke-tokens")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 204
+
+        latency = statistics.median(latencies) * 1000
+        print(f"{other_tokens:>9} other tokens {latency:8.3f} ms")  # ruff: ignore[print]
+        total *= 10
+
+
+def _mint(client: flask.testing.FlaskClient, subs: list[str]):
+    # Without the `openid` scope no ID tokens are signed
+    response = client.post(
+        "/tokens/mint",
+        json=[{"sub": sub, "client_id": "client", "scope": "email"} for sub in subs],
+    )
+    assert len(response.text.splitlines()) == len(subs)
+
+
+if __name__ == "__main__":
+    main()
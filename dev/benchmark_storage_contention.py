@@ -0,0 +1,66 @@
+#!/usr/bin/env -S uv run
+"""Measure the throughput of the in-memory storage when 1, 4 and 16 threads use
+it at the same time.
+
+Every thread stores access tokens, looks up tokens that other threads have
+stored and records subjects. With the GIL the throughput cannot grow with the
+number of threads but it should not collapse because threads wait for locks.
+"""
+
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from oidc_provider_mock._storage import AccessToken, MemoryStorage
+
+_PRELOADED_TOKENS = 10_000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    for threads in [1, 4, 16]:
+        operations_per_second = _benchmark(threads, count)
+        print(f"{threads:>2} threads {operations_per_second:10.0f} operations/s")  # ruff: ignore[print]
+
+
+def _benchmark(threads: int, count: int) -> float:
+    storage = MemoryStorage()
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    for i in range(_PRELOADED_TOKENS):
+        storage.store_access_token(_access_token(f"preloaded-{i}", expires_at))
+
+    def work(thread: int):
+        rng = random.Random(thread)
+        for i in range(count // threads):
+            storage.store_access_token(
+                _access_token(f"thread-{thread}-{i}", expires_at)
+            )
+            token = storage.get_access_token(
+                f"preloaded-{rng.randrange(_PRELOADED_TOKENS)}"
+            )
+            assert token
+            assert token.user_id
+            storage.record_subject(token.user_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, range(threads)))
+    # Every iteration stores, gets and records
+    return 3 * count / (time.perf_counter() - start)
+
+
+def _access_token(token: str, expires_at: datetime) -> AccessToken:
+    return AccessToken(
+        token=token,
+        user_id=f"user-{hash(token) % 100}@example.com",
+        scope="openid",
+        expires_at=expires_at,
+        client_id="client",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env -S uv run
+"""Check that the memory of the in-memory storage stays bounded when tokens
+expire.
+
+Stores authorization codes that are never redeemed and pairs of access and
+refresh tokens that expire after one second for the number of seconds given as
+the first argument. Every second, the number of live access tokens and the
+memory allocated by Python are printed. Both stop growing after the first
+second.
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+
+from oidc_provider_mock._storage import (
+    AccessToken,
+    AuthorizationCode,
+    MemoryStorage,
+    RefreshToken,
+)
+
+_LIFETIME = timedelta(seconds=1)
+
+
+def main():
+    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    storage = MemoryStorage()
+
+    tracemalloc.start()
+    start = time.monotonic()
+    next_report = start + 1
+    stored = 0
+    while (now := time.monotonic()) < start + duration:
+        _store(storage, stored)
+        stored += 1
+
+        if now >= next_report:
+            next_report += 1
+            memory, _ = tracemalloc.get_traced_memory()
+            live = len(list(storage.access_tokens()))
+            print(  # ruff: ignore[print]
+                f"{now - start:4.0f}s {stored:>9} stored {live:>7} live "
+                f"{memory / 2**20:7.1f} MiB"
+            )
+
+
+def _store(storage: MemoryStorage, i: int):
+    expires_at = datetime.now(UTC) + _LIFETIME
+    user_id = f"user-{i % 100}@example.com"
+    storage.store_authorization_code(
+        AuthorizationCode(
+            code=f"code-{i}",
+            client_id="client",
+            redirect_uri="https://example.com/callback",
+            user_id=user_id,
+            scope="openid",
+            nonce=None,
+            expires_at=expires_at,
+        )
+    )
+    storage.store_tokens(
+        AccessToken(
+            token=f"access-token-{i}",
+            user_id=user_id,
+            scope="openid",
+            expires_at=expires_at,
+            client_id="client",
+        ),
+        RefreshToken(
+            token=f"refresh-token-{i}",
+            user_id=user_id,
+            scope="openid",
+            expires_at=expires_at,
+            client_id="client",
+            access_token=f"access-token-{i}",
+            family_id=f"refresh-token-{i}",
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env -S uv run
+"""Measure how many tokens per second the token endpoint issues for each ID
+token signing algorithm.
+
+The authorization codes are created before the measurement so that only token
+requests are timed.
+"""
+
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+
+import oidc_provider_mock
+from oidc_provider_mock._keys import SIGNING_ALGORITHMS, SigningAlgorithm
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+    app = oidc_provider_mock.app()
+    # Don’t measure logging of requests
+    app.logger.disabled = True
+    client = app.test_client()
+
+    for alg in SIGNING_ALGORITHMS:
+        tokens_per_second = _benchmark(client, alg, count)
+        print(f"{alg:<6} {tokens_per_second:8.0f} tokens/s")  # ruff: ignore[print]
+
+
+def _benchmark(
+    client: flask.testing.FlaskClient, alg: SigningAlgorithm, count: int
+) -> float:
+    registration = client.post(
+        "/oauth2/clients",
+        json={"redirect_uris": [_REDIRECT_URI], "id_token_signed_response_alg": alg},
+    ).json
+    assert registration
+    client_id = registration["client_id"]
+    client_secret = registration["client_secret"]
+
+    # Warm up key generation and caches
+    codes = [_authorization_code(client, client_id) for _ in range(count + 1)]
+    _fetch_token(client, client_id, client_secret, codes.pop())
+
+    start = time.perf_counter()
+    for code in codes:
+        _fetch_token(client, client_id, client_secret, code)
+    return count / (time.perf_counter() - start)
+
+
+def _authorization_code(client: flask.testing.FlaskClient, client_id: str) -> str:
+    response = client.post(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": client_id,
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "scope": "openid",
+        },
+        data={"sub": "alice@example.com"},
+    )
+    assert response.location
+    return parse_qs(urlparse(response.location).query)["code"][0]
+
+
+def _fetch_token(
+    client: flask.testing.FlaskClient, client_id: str, client_secret: str, code: str
+):
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": _REDIRECT_URI,
+        },
+        auth=(client_id, client_secret),
+    )
+    assert response.status_code == 200, response.text
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env -S uv run
+"""Measure the memory of live tokens in the in-memory storage.
+
+Stores pairs of access and refresh tokens for 1000 users and prints the bytes
+allocated per pair, including the indexes of the storage. The baseline stores
+the tokens without sharing equal user IDs, scopes and client IDs. The number of
+pairs is the first argument, for example 1000000.
+"""
+
+import secrets
+import sys
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+from typing import override
+
+from oidc_provider_mock._storage import (
+    AccessToken,
+    MemoryStorage,
+    RefreshToken,
+    _StringPool,  # pyright: ignore[reportPrivateUsage]
+)
+
+_SCOPES = ["openid", "email"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    for name, strings in [("baseline", _UnsharedStrings()), ("shared", None)]:
+        bytes_per_pair = _benchmark(count, strings)
+        print(f"{name:<8} {count} token pairs {bytes_per_pair:6.0f} bytes per pair")  # ruff: ignore[print]
+
+
+def _benchmark(count: int, strings: _StringPool | None) -> float:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    storage = MemoryStorage()
+    if strings is not None:
+        storage._strings = strings  # pyright: ignore[reportPrivateUsage]
+    for access_token, refresh_token in _tokens(count):
+        storage.store_tokens(access_token, refresh_token)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+class _UnsharedStrings(_StringPool):
+    @override
+    def acquire(self, value: str) -> str:
+        return value
+
+    @override
+    def release(self, value: str) -> None:
+        pass
+
+
+def _tokens(count: int):
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    for i in range(count):
+        # Like strings parsed from requests, equal strings are distinct objects
+        user_id = f"user-{i % 1000}@example.com"
+        client_id = f"client-{i % 10}"
+        scope = " ".join(_SCOPES)
+        access_token = AccessToken(
+            token=secrets.token_urlsafe(32),
+            user_id=user_id,
+            scope=scope,
+            expires_at=expires_at,
+            client_id=client_id,
+        )
+        refresh_token_value = secrets.token_urlsafe(32)
+        yield (
+            access_token,
+            RefreshToken(
+                token=refresh_token_value,
+                user_id=user_id,
+                scope=scope,
+                expires_at=expires_at,
+                client_id=client_id,
+                access_token=access_token.token,
+                family_id=refresh_token_value,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env -S uv run
+"""Measure how the throughput of the server scales with `--workers`.
+
+The server runs in a separate process started with `--production` and one to
+`os.cpu_count()` workers. The workers share the state in a temporary SQLite
+database. Requests are sent from one client process per CPU so that the client
+does not limit the throughput.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+_CONCURRENCY = 16
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, *(2**i for i in range(cpu_count.bit_length()))})
+
+    for workers in worker_counts:
+        port = 9490 + workers
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "oidc_provider_mock",
+                "--production",
+                "--workers",
+                str(workers),
+                "--port",
+                str(port),
+            ],
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            _wait_for_server(base_url)
+            response = httpx.post(
+                f"{base_url}/tokens/mint",
+                json=[
+                    {"sub": f"user-{i}", "client_id": "client"} for i in range(count)
+                ],
+                timeout=60,
+            )
+            access_tokens = [
+                json.loads(line)["access_token"] for line in response.text.splitlines()
+            ]
+
+            with ProcessPoolExecutor(cpu_count) as executor:
+                start = time.perf_counter()
+                batches = [access_tokens[i::cpu_count] for i in range(cpu_count)]
+                list(executor.map(_request_userinfo, [base_url] * cpu_count, batches))
+                requests_per_second = count / (time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"{workers:>2} workers userinfo {requests_per_second:8.0f} requests/s")  # ruff: ignore[print]
+
+
+def _wait_for_server(base_url: str):
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/.well-known/openid-configuration")
+            return
+        except httpx.ConnectError:
+            time.sleep(0.1)
+    raise TimeoutError("Server did not start")
+
+
+def _request_userinfo(base_url: str, access_tokens: list[str]):
+    async def run():
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=httpx.Limits(max_connections=_CONCURRENCY)
+        ) as client:
+            queue = iter(access_tokens)
+
+            async def worker():
+                for access_token in queue:
+                    response = await client.get(
+                        "/userinfo",
+                        headers={"Authorization": f"Bearer {access_token}"},
+                    )
+                    assert response.status_code == 200, response.text
+
+            await asyncio.gather(*(worker() for _ in range(_CONCURRENCY)))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from ._app import app, init_app
+from ._app import TokenSet, app, create_authorization_code, init_app, issue_tokens
+from ._asgi import asgi_app
 from ._server import run_server_in_thread
 from ._storage import User
 
@@ -7,5 +8,9 @@ __all__ = [  # ruff: ignore[unsorted-dunder-all]
     "init_app",
     "app",
     "run_server_in_thread",
+    "asgi_app",
+    "issue_tokens",
+    "create_authorization_code",
+    "TokenSet",
     "User",
 ]
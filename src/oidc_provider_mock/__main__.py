@@ -1,19 +1,26 @@
+import contextlib
+import gc
 import json
 import logging
 import os
+import signal
+import stat
 import sys
+import tempfile
 import time
 import traceback
 from collections.abc import Iterator
 from datetime import timedelta
-from typing import TextIO, cast
+from types import FrameType
+from typing import Literal, TextIO, cast
 
 import click
+import flask
 import uvicorn
 import yaml
 
-from . import app
-from ._app import Config
+from . import app, asgi_app
+from ._app import Config, preload
 from ._storage import User
 
 _default_config = Config
@@ -36,6 +43,12 @@ _default_config = Config
     default="127.0.0.1",
     show_default=True,
 )
+@click.option(
+    "--uds",
+    help="Listen on a Unix domain socket at this path instead of the host and port",
+    type=click.Path(dir_okay=False),
+    default=None,
+)
 @click.option(
     "-r",
     "--require-registration",
@@ -93,10 +106,74 @@ _default_config = Config
     type=click.File(),
     default=None,
 )
+@click.option(
+    "--storage-url",
+    help="Store provider state in a database instead of memory (sqlite:PATH or redis://HOST)",
+    type=str,
+    default=_default_config.storage_url,
+)
+@click.option(
+    "--signing-key-file",
+    help="PEM or JWK file with a private RSA, P-256 or Ed25519 key to sign ID tokens with",
+    type=click.Path(exists=True, dir_okay=False),
+    default=_default_config.signing_key_file,
+)
+@click.option(
+    "--signing-key-rotation-interval",
+    help="Replace signing keys with new keys after this many seconds",
+    type=click.IntRange(min=1),
+    default=None,
+)
+@click.option(
+    "--jwt-access-tokens",
+    help="Issue JWT access tokens (RFC 9068) instead of opaque tokens",
+    is_flag=True,
+    default=_default_config.jwt_access_tokens,
+)
+@click.option(
+    "--no-cascade-token-revocation",
+    help="Do not revoke the access token when its refresh token is revoked",
+    is_flag=True,
+    default=not _default_config.cascade_token_revocation,
+)
+@click.option(
+    "--auto-approve",
+    help="Issue authorization codes without showing the authorization form for the login_hint or first predefined user",
+    is_flag=True,
+    default=_default_config.auto_approve,
+)
+@click.option(
+    "--session-max-age",
+    help="Remember the authorized user of a browser for this many seconds and skip the authorization form for them",
+    type=click.IntRange(min=1),
+    default=None,
+)
+@click.option(
+    "--interface",
+    help="Serve the provider through the server’s WSGI interface or as an ASGI app",
+    type=click.Choice(["wsgi", "asgi"]),
+    default="wsgi",
+    show_default=True,
+)
+@click.option(
+    "-w",
+    "--workers",
+    help="Number of server processes. Without --storage-url the processes share the provider state in a temporary SQLite database",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--production",
+    help="Disable debug mode, pretty-printed JSON and access logs to serve more requests",
+    is_flag=True,
+    default=_default_config.production,
+)
 def run(
     port: int,
     host: str,
     *,
+    uds: str | None,
     require_registration: bool,
     require_nonce: bool,
     no_refresh_token: bool,
@@ -104,6 +181,16 @@ def run(
     users: tuple[str, ...],
     user_claims_json: tuple[str, ...],
     user_claims_file: TextIO | None,
+    storage_url: str | None,
+    signing_key_file: str | None,
+    signing_key_rotation_interval: int | None,
+    jwt_access_tokens: bool,
+    no_cascade_token_revocation: bool,
+    auto_approve: bool,
+    session_max_age: int | None,
+    interface: Literal["asgi", "wsgi"],
+    workers: int,
+    production: bool,
 ):
     """Start an OpenID Connect Provider for testing"""
 
@@ -122,6 +209,9 @@ def run(
     if user_claims_file:
         user_claims_list.extend(_load_claims_file(user_claims_file))
 
+    if workers > 1 and not hasattr(os, "fork"):
+        raise click.ClickException("--workers is not supported on this platform")
+
     os.environ["AUTHLIB_INSECURE_TRANSPORT"] = "1"
     handler = logging.StreamHandler(sys.stderr)
     handler.setFormatter(
@@ -133,19 +223,125 @@ def run(
     logging.getLogger().addHandler(handler)
     logging.getLogger().setLevel(logging.INFO)
 
-    uvicorn.run(
-        app(
-            require_client_registration=require_registration,
-            require_nonce=require_nonce,
-            issue_refresh_token=not no_refresh_token,
-            access_token_max_age=timedelta(seconds=token_max_age),
-            user_claims=user_claims_list,
-        ),
-        interface="wsgi",
-        port=port,
-        host=host,
-        log_config=None,
-    )
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and storage_url is None:
+            # Memory storage is not shared between processes
+            tmp_dir = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="oidc-provider-mock-")
+            )
+            storage_url = f"sqlite:{tmp_dir}/provider.db"
+
+        try:
+            provider_app = app(
+                require_client_registration=require_registration,
+                require_nonce=require_nonce,
+                issue_refresh_token=not no_refresh_token,
+                access_token_max_age=timedelta(seconds=token_max_age),
+                user_claims=user_claims_list,
+                storage_url=storage_url,
+                signing_key_file=signing_key_file,
+                signing_key_rotation_interval=timedelta(
+                    seconds=signing_key_rotation_interval
+                )
+                if signing_key_rotation_interval
+                else None,
+                jwt_access_tokens=jwt_access_tokens,
+                cascade_token_revocation=not no_cascade_token_revocation,
+                auto_approve=auto_approve,
+                session_max_age=timedelta(seconds=session_max_age)
+                if session_max_age
+                else None,
+                production=production,
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+
+        server_config = uvicorn.Config(
+            asgi_app(provider_app) if interface == "asgi" else provider_app,
+            interface="asgi3" if interface == "asgi" else "wsgi",
+            port=port,
+            host=host,
+            uds=uds,
+            log_config=None,
+            access_log=not production,
+        )
+        try:
+            if workers == 1:
+                # The server raises the signal that stopped it again after it
+                # shut down. Exit normally instead so that the socket file is
+                # removed.
+                signal.signal(signal.SIGTERM, _exit)
+                server = uvicorn.Server(server_config)
+                server.run()
+                if not server.started:
+                    sys.exit(1)
+            else:
+                _run_workers(provider_app, server_config, workers)
+        finally:
+            if uds is not None and os.path.exists(uds):
+                os.remove(uds)
+
+
+def _exit(signum: int, frame: FrameType | None):
+    sys.exit(0)
+
+
+def _run_workers(provider_app: flask.Flask, config: uvicorn.Config, workers: int):
+    """Serve the app with ``workers`` forked processes that accept connections
+    on the same socket.
+
+    The app, its signing keys and templates are loaded before the processes
+    fork, so the workers share their memory.
+    """
+    preload(provider_app)
+    config.load()
+    # Like the server of a single process, replace the socket file that a
+    # previous server left behind.
+    if (
+        config.uds is not None
+        and os.path.exists(config.uds)
+        and stat.S_ISSOCK(os.stat(config.uds).st_mode)
+    ):
+        os.remove(config.uds)
+    sock = config.bind_socket()
+    # Queue connections until the workers have started
+    sock.listen(config.backlog)
+
+    pids: list[int] = []
+
+    def terminate_workers(signum: int, frame: FrameType | None):
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    # Set before forking so that no signal is missed. The workers replace the
+    # handlers when the server starts.
+    signal.signal(signal.SIGTERM, terminate_workers)
+    # The workers receive SIGINT from the terminal themselves
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Objects that exist now are excluded from garbage collection. Otherwise
+    # the collector writes to their memory pages and the pages are copied
+    # into every worker.
+    gc.freeze()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+                exit_code = 0
+            finally:
+                os._exit(exit_code)
+        pids.append(pid)
+
+    sock.close()
+    failed = False
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        failed = failed or os.waitstatus_to_exitcode(status) != 0
+    if failed:
+        sys.exit(1)
 
 
 def _decode_claims_dict(claims_dict: object) -> User:
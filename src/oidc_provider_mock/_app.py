@@ -1,12 +1,15 @@
+import hashlib
+import json
 import logging
 import secrets
 import textwrap
 import warnings
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Generator, Hashable, Iterable, Sequence
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from http import HTTPStatus
-from typing import Never, cast, override
+from typing import Annotated, Never, cast, override
 from urllib.parse import parse_qs, urlencode, urljoin, urlparse, urlunparse
 from uuid import uuid4
 
@@ -14,25 +17,43 @@ import authlib.deprecate
 import authlib.oauth2.rfc6749
 import authlib.oauth2.rfc6749.errors
 import authlib.oauth2.rfc6750
+import authlib.oauth2.rfc7009
+import authlib.oauth2.rfc7662
 import authlib.oidc.core
+import authlib.oidc.core.errors
+import authlib.oidc.core.util
 import flask
 import flask.typing
+import joserfc.errors
 import joserfc.jwk
+import joserfc.jws
+import joserfc.jwt
 import pydantic
 import werkzeug.exceptions
 import werkzeug.local
+import werkzeug.wrappers
 from authlib.integrations import flask_oauth2
 from authlib.integrations.flask_oauth2.requests import FlaskOAuth2Request
 from authlib.oauth2 import OAuth2Error, OAuth2Request
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from . import _client
+from ._cache import LruCache
+from ._keys import (
+    SIGNING_ALGORITHMS,
+    SigningAlgorithm,
+    SigningKey,
+    TokenSigner,
+    load_signing_key,
+)
+from ._sqlite_storage import SqliteStorage
 from ._storage import (
     AccessToken,
     AuthorizationCode,
     Client,
     ClientAllowAny,
     ClientAuthMethod,
+    MemoryStorage,
     RefreshToken,
     Storage,
     User,
@@ -42,7 +63,31 @@ from ._storage import (
 assert __package__
 _logger = logging.getLogger(__package__)
 
-_JWS_ALG = "RS256"
+# Refresh tokens outlive the access tokens they were issued with so that clients
+# can obtain new access tokens after the old ones expired.
+_REFRESH_TOKEN_MAX_AGE = timedelta(days=30)
+
+# Clients re-fetch the JWKS when they see an unknown `kid`, so a rotated key
+# must not stay hidden behind a cached response for long.
+_JWKS_MAX_AGE = timedelta(minutes=1)
+_DISCOVERY_MAX_AGE = timedelta(hours=1)
+
+_INTROSPECTION_CACHE_SIZE = 4096
+
+# Bounds the work a single request to a batch endpoint can cause.
+_MAX_BATCH_SIZE = 100
+
+# Number of minted tokens that are written to the storage at once.
+_MINT_BATCH_SIZE = 500
+
+_SESSION_COOKIE = "oidc_provider_mock_session"
+
+# Prompt values that ask the provider to show the authorization form even if
+# the browser has a session.
+_INTERACTIVE_PROMPTS = frozenset({"login", "consent", "select_account"})
+
+# Only `RS256` is required by RFC 9068, so every resource server supports it.
+_JWT_ACCESS_TOKEN_ALG: SigningAlgorithm = "RS256"
 
 _authlib_version = tuple(int(x) for x in authlib.__version__.split(".")[:2])
 
@@ -50,13 +95,125 @@ _authlib_version = tuple(int(x) for x in authlib.__version__.split(".")[:2])
 class TokenValidator(authlib.oauth2.rfc6750.BearerTokenValidator):
     @override
     def authenticate_token(self, token_string: str):
-        token = storage.get_access_token(token_string)
+        token = _get_access_token(token_string)
         if not token:
             raise authlib.oauth2.rfc6749.AccessDeniedError()
 
         return token
 
 
+def _get_access_token(token_string: str) -> AccessToken | None:
+    """Look up an access token, including expired ones."""
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    if config.jwt_access_tokens:
+        return _decode_jwt_access_token(token_string)
+    else:
+        return storage.get_access_token(token_string)
+
+
+def _generate_jwt_access_token(
+    client: Client, grant_type: str, user: User | None, scope: str
+) -> str:
+    """Create a JWT access token as specified by `RFC 9068
+    <https://datatracker.ietf.org/doc/html/rfc9068>`_.
+
+    Used as the ``OAUTH2_ACCESS_TOKEN_GENERATOR`` for authlib.
+    """
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    now = datetime.now(UTC)
+    key = _current_signing_key(_JWT_ACCESS_TOKEN_ALG)
+    claims = {
+        "iss": flask.request.host_url.rstrip("/"),
+        "sub": user.sub if user else client.id,
+        "aud": client.id,
+        "client_id": client.id,
+        "scope": scope,
+        "iat": int(now.timestamp()),
+        "exp": int((now + config.access_token_max_age).timestamp()),
+        "jti": secrets.token_urlsafe(16),
+    }
+    if user is None:
+        # Like the subject of a user, any string can be a client ID, so we mark
+        # tokens without a user explicitly.
+        claims["gty"] = _CLIENT_CREDENTIALS_GTY
+    header = {"alg": _JWT_ACCESS_TOKEN_ALG, "typ": "at+jwt", "kid": key.kid}
+    return joserfc.jwt.encode(header, claims, key, algorithms=[_JWT_ACCESS_TOKEN_ALG])
+
+
+def _decode_jwt_access_token(token_string: str) -> AccessToken | None:
+    """Validate a JWT access token by its signature and claims.
+
+    Besides the signing keys, this only reads the denylist of revoked tokens
+    from the storage. Like for opaque tokens, `TokenValidator` rejects expired
+    tokens.
+    """
+    keys: list[joserfc.jwk.Key] = [_current_signing_key(_JWT_ACCESS_TOKEN_ALG)]
+    keys.extend(storage.retired_signing_keys())
+    try:
+        token = joserfc.jwt.decode(
+            token_string,
+            joserfc.jwk.KeySet(keys),
+            algorithms=[_JWT_ACCESS_TOKEN_ALG],
+        )
+        if token.header.get("typ") != "at+jwt":
+            return None
+        claims = _JwtAccessTokenClaims.model_validate(token.claims)
+    except (joserfc.errors.JoseError, ValueError):
+        return None
+
+    if claims.iss != flask.request.host_url.rstrip("/"):
+        return None
+    if storage.is_access_token_revoked(claims.jti):
+        return None
+
+    return AccessToken(
+        token=token_string,
+        user_id=None if claims.gty == _CLIENT_CREDENTIALS_GTY else claims.sub,
+        scope=claims.scope,
+        expires_at=datetime.fromtimestamp(claims.exp, UTC),
+        client_id=claims.client_id,
+    )
+
+
+def _revoke_access_tokens(tokens: Iterable[str]) -> None:
+    """Add revoked JWT access tokens to the denylist of the storage.
+
+    Opaque access tokens are revoked by removing them from the storage, so
+    this does nothing if the provider does not issue JWT access tokens.
+    """
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    if not config.jwt_access_tokens:
+        return
+
+    for token in tokens:
+        # We issued the token, so we don’t need to verify it.
+        try:
+            payload = joserfc.jws.extract_compact(token.encode()).payload
+            claims = _JwtAccessTokenClaims.model_validate_json(payload)
+        except (joserfc.errors.JoseError, ValueError):
+            # Opaque tokens issued before JWT access tokens were enabled
+            continue
+        storage.revoke_access_token(claims.jti, datetime.fromtimestamp(claims.exp, UTC))
+
+
+class _JwtAccessTokenClaims(pydantic.BaseModel):
+    iss: str
+    sub: str
+    client_id: str
+    scope: str = ""
+    exp: int
+    jti: str
+    gty: str | None = None
+
+
+# Value of the `gty` claim of JWT access tokens issued with the client
+# credentials grant
+_CLIENT_CREDENTIALS_GTY = "client-credentials"
+
+
 class AuthorizationCodeGrant(authlib.oauth2.rfc6749.AuthorizationCodeGrant):
     TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post", "none"]
 
@@ -64,13 +221,21 @@ class AuthorizationCodeGrant(authlib.oauth2.rfc6749.AuthorizationCodeGrant):
     def query_authorization_code(  # pyright: ignore[reportIncompatibleMethodOverride]
         self, code: str, client: Client
     ) -> AuthorizationCode | None:
-        auth_code = storage.get_authorization_code(code)
-        if auth_code and auth_code.client_id == client.get_client_id():
+        # Removing the code claims it, so that concurrent requests that share
+        # the storage cannot exchange it twice. A code is also used up if the
+        # rest of the token request is invalid.
+        auth_code = storage.remove_authorization_code(code)
+        if (
+            auth_code
+            and auth_code.client_id == client.get_client_id()
+            and not auth_code.is_expired()
+        ):
             return auth_code
 
     @override
     def delete_authorization_code(self, authorization_code: AuthorizationCode):
-        storage.remove_authorization_code(authorization_code.code)
+        # Removed by `query_authorization_code`
+        pass
 
     @override
     def authenticate_user(self, authorization_code: AuthorizationCode) -> User | None:
@@ -81,6 +246,8 @@ class AuthorizationCodeGrant(authlib.oauth2.rfc6749.AuthorizationCodeGrant):
         assert isinstance(request, OAuth2Request)
         assert isinstance(request.user, User)
         client = cast("Client", request.client)
+        config = flask.g.oidc_provider_mock_config
+        assert isinstance(config, Config)
         with warnings.catch_warnings():
             # Silence warnings for deprecated `OAuth2Request` properties.
             warnings.simplefilter("ignore", authlib.deprecate.AuthlibDeprecationWarning)
@@ -93,55 +260,76 @@ class AuthorizationCodeGrant(authlib.oauth2.rfc6749.AuthorizationCodeGrant):
                     redirect_uri=request.redirect_uri,  # pyright: ignore[reportDeprecated]
                     scope=request.scope,  # pyright: ignore[reportDeprecated]
                     nonce=request.data.get("nonce"),  # pyright: ignore[reportDeprecated]
+                    expires_at=datetime.now(UTC) + config.authorization_code_max_age,
                 )
             )
 
 
 class OpenIDCode(authlib.oidc.core.OpenIDCode):
-    def __init__(self, require_nonce: bool, token_max_age: timedelta):
-        super().__init__(require_nonce)
-        self._token_max_mage = token_max_age
-
     @override
     def exists_nonce(self, nonce: str, request: OAuth2Request) -> bool:
         return storage.exists_nonce(nonce)
 
-    if _authlib_version >= (1, 7):
-
-        def resolve_client_private_key(self, client: object):
-            return joserfc.jwk.KeySet([storage.jwk])
-
-        def get_client_claims(self, client: object):
-            return {
-                "iss": flask.request.host_url.rstrip("/"),
-                "exp": int((datetime.now(UTC) + self._token_max_mage).timestamp()),
-            }
-
-    else:
+    @override
+    def process_token(  # pyright: ignore[reportIncompatibleMethodOverride]
+        self, grant: authlib.oauth2.rfc6749.BaseGrant, response: object
+    ):
+        # authlib 1.7 passes the token response, earlier versions the token
+        if _authlib_version >= (1, 7):
+            _, token, _ = cast("tuple[int, dict[str, object], object]", response)
+        else:
+            token = cast("dict[str, object]", response)
 
-        @override
-        def get_jwt_config(  # pyright: ignore[reportIncompatibleMethodOverride]
-            self, grant: authlib.oauth2.rfc6749.BaseGrant, client: object = None
-        ):
-            return {
-                "key": storage.jwk.as_dict(is_private=True),
-                "alg": _JWS_ALG,
-                "exp": int(self._token_max_mage.total_seconds()),
-                "iss": flask.request.host_url.rstrip("/"),
-            }
+        scope = token.get("scope")
+        if not isinstance(scope, str) or "openid" not in scope.split():
+            return token
 
-    @override
-    def generate_user_info(self, user: User, scope: str):  # pyright: ignore[reportIncompatibleMethodOverride]
-        return _user_claims_for_scope(user, scope)
+        request = grant.request
+        assert isinstance(request, OAuth2Request)
+        assert isinstance(request.user, User)
+        client = cast("Client", request.client)
+        # Not set when a refresh token is exchanged
+        authorization_code = request.authorization_code
+        assert isinstance(authorization_code, AuthorizationCode | None)
+        access_token = token["access_token"]
+        assert isinstance(access_token, str)
+
+        alg = client.id_token_signed_response_alg
+        token["id_token"] = TokenSigner(_current_signing_key(alg), alg).sign(
+            _id_token_claims(
+                request.user,
+                client,
+                scope,
+                authorization_code.get_nonce() if authorization_code else None,
+                access_token,
+                refreshed=authorization_code is None,
+            )
+        )
+        return token
 
 
 class RefreshTokenGrant(authlib.oauth2.rfc6749.RefreshTokenGrant):
     TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post", "none"]
+    INCLUDE_NEW_REFRESH_TOKEN = True
 
     @override
     def authenticate_refresh_token(self, refresh_token: str):
         token = storage.get_refresh_token(refresh_token)
-        if not token:
+        if not token or token.is_expired():
+            family_id = storage.get_retired_refresh_token_family(refresh_token)
+            if family_id is not None:
+                # A rotated refresh token is reused. The token may have been
+                # leaked, so we revoke all tokens that descend from it.
+                # See https://datatracker.ietf.org/doc/html/rfc9700#section-4.14.2
+                _logger.warning(
+                    "reuse of rotated refresh token, revoking token family",
+                    extra={"family_id": family_id},
+                )
+                _revoke_access_tokens(
+                    token.token
+                    for token in storage.remove_refresh_token_family(family_id)
+                )
+                _invalidate_introspection()
             raise authlib.oauth2.rfc6749.InvalidGrantError("invalid refresh token")
 
         return token
@@ -152,6 +340,173 @@ class RefreshTokenGrant(authlib.oauth2.rfc6749.RefreshTokenGrant):
     def revoke_old_credential(self, refresh_token: authlib.oauth2.rfc6749.TokenMixin):
         assert isinstance(refresh_token, RefreshToken)
         storage.remove_access_token(refresh_token.access_token)
+        _revoke_access_tokens([refresh_token.access_token])
+        storage.retire_refresh_token(refresh_token.token)
+        _invalidate_introspection([refresh_token.access_token, refresh_token.token])
+
+
+class ClientCredentialsGrant(authlib.oauth2.rfc6749.ClientCredentialsGrant):
+    # Only confidential clients may use this grant
+    TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post"]
+
+
+class IntrospectionEndpoint(authlib.oauth2.rfc7662.IntrospectionEndpoint):
+    """Token introspection as specified by `RFC 7662
+    <https://datatracker.ietf.org/doc/html/rfc7662>`_.
+
+    Any client may introspect any token. With in-memory storage, the
+    introspection responses of active tokens are cached until the tokens expire
+    or are revoked.
+    """
+
+    CLIENT_AUTH_METHODS = ["client_secret_basic", "client_secret_post", "none"]
+
+    @override
+    def query_token(
+        self, token_string: str, token_type_hint: str | None
+    ) -> "_IntrospectedToken | None":
+        return _query_introspected_token(token_string, token_type_hint)
+
+    @override
+    def check_permission(self, token: object, client: object, request: object):
+        return True
+
+    @override
+    def introspect_token(self, token: "_IntrospectedToken"):
+        return token.payload
+
+
+class RevocationEndpoint(authlib.oauth2.rfc7009.RevocationEndpoint):
+    """Token revocation as specified by `RFC 7009
+    <https://datatracker.ietf.org/doc/html/rfc7009>`_.
+
+    Clients may only revoke tokens that were issued to them.
+    """
+
+    CLIENT_AUTH_METHODS = ["client_secret_basic", "client_secret_post", "none"]
+
+    @override
+    def query_token(
+        self, token_string: str, token_type_hint: str | None
+    ) -> AccessToken | None:
+        lookups = [_get_access_token, storage.get_refresh_token]
+        if token_type_hint == "refresh_token":
+            lookups.reverse()
+        for lookup in lookups:
+            token = lookup(token_string)
+            if token:
+                return token
+
+    @override
+    def revoke_token(self, token: AccessToken, request: OAuth2Request):
+        config = flask.g.oidc_provider_mock_config
+        assert isinstance(config, Config)
+        revoked = [token.token]
+        if isinstance(token, RefreshToken):
+            storage.remove_refresh_token(token.token)
+            if config.cascade_token_revocation:
+                revoked.append(token.access_token)
+                storage.remove_access_token(token.access_token)
+                _revoke_access_tokens([token.access_token])
+        else:
+            storage.remove_access_token(token.token)
+            _revoke_access_tokens([token.token])
+        _invalidate_introspection(revoked)
+
+
+@dataclass(frozen=True)
+class _IntrospectedToken:
+    """Introspection response for an active token"""
+
+    payload: dict[str, object]
+    expires_at: datetime
+
+    def is_expired(self) -> bool:
+        return datetime.now(UTC) >= self.expires_at
+
+    def is_revoked(self) -> bool:
+        return False
+
+
+def _query_introspected_token(
+    token_string: str, token_type_hint: str | None = None
+) -> _IntrospectedToken | None:
+    cache = cast(
+        "LruCache[str, _IntrospectedToken] | None",
+        flask.g.oidc_provider_mock_introspection_cache,
+    )
+    if cache is not None and (cached := cache.get(token_string)):
+        return cached
+
+    lookups = [_introspect_access_token, _introspect_refresh_token]
+    if token_type_hint == "refresh_token":
+        lookups.reverse()
+    for lookup in lookups:
+        introspected = lookup(token_string)
+        if introspected:
+            if cache is not None:
+                cache.set(token_string, introspected)
+            return introspected
+
+
+def _introspect_access_token(token_string: str) -> _IntrospectedToken | None:
+    token = _get_access_token(token_string)
+    if token:
+        return _introspected_token(token, token_type="Bearer")
+
+
+def _introspect_refresh_token(token_string: str) -> _IntrospectedToken | None:
+    token = storage.get_refresh_token(token_string)
+    if token:
+        return _introspected_token(token, client_id=token.client_id)
+
+
+def _introspected_token(token: AccessToken, **claims: object) -> _IntrospectedToken:
+    return _IntrospectedToken(
+        payload={
+            "active": True,
+            "scope": token.scope,
+            "sub": _token_subject(token),
+            "exp": int(token.expires_at.timestamp()),
+            **claims,
+        },
+        expires_at=token.expires_at,
+    )
+
+
+def _invalidate_introspection(tokens: Iterable[str] | None = None) -> None:
+    """Remove revoked tokens from the introspection cache.
+
+    Clears the whole cache if ``tokens`` is not given.
+    """
+    cache = cast(
+        "LruCache[str, _IntrospectedToken] | None",
+        flask.g.oidc_provider_mock_introspection_cache,
+    )
+    if cache is None:
+        return
+
+    if tokens is None:
+        cache.clear()
+    else:
+        for token in tokens:
+            cache.pop(token)
+
+
+def _userinfo_claims(access_token: AccessToken) -> dict[str, object]:
+    if access_token.user_id is None:
+        return {"sub": access_token.client_id}
+
+    # JWT access tokens may have been issued by another provider that shares
+    # the signing key but not the users.
+    user = storage.get_user(access_token.user_id) or User(sub=access_token.user_id)
+    return _user_claims_for_scope(user, access_token.scope)
+
+
+def _token_subject(token: AccessToken) -> str:
+    # Tokens issued without a user have the client as their subject, like JWT
+    # access tokens.
+    return token.client_id if token.user_id is None else token.user_id
 
 
 def _user_claims_for_scope(user: User, scope: str) -> dict[str, object]:
@@ -223,7 +578,16 @@ class Config:
     require_nonce: bool = False
     issue_refresh_token: bool = True
     access_token_max_age: timedelta = timedelta(hours=1)
+    authorization_code_max_age: timedelta = timedelta(minutes=10)
     user_claims: Sequence[User] = ()
+    storage_url: str | None = None
+    signing_key_file: str | None = None
+    signing_key_rotation_interval: timedelta | None = None
+    jwt_access_tokens: bool = False
+    cascade_token_revocation: bool = True
+    auto_approve: bool = False
+    session_max_age: timedelta | None = None
+    production: bool = False
 
 
 @blueprint.record
@@ -236,24 +600,48 @@ def setup(setup_state: flask.blueprints.BlueprintSetupState):
     setup_state.app.config["OAUTH2_TOKEN_EXPIRES_IN"] = {
         "authorization_code": int(config.access_token_max_age.total_seconds()),
         "refresh_token": int(config.access_token_max_age.total_seconds()),
+        "client_credentials": int(config.access_token_max_age.total_seconds()),
     }
 
     setup_state.app.config["OAUTH2_REFRESH_TOKEN_GENERATOR"] = (
         config.issue_refresh_token
     )
+    if config.jwt_access_tokens:
+        setup_state.app.config["OAUTH2_ACCESS_TOKEN_GENERATOR"] = (
+            _generate_jwt_access_token
+        )
 
     authorization = flask_oauth2.AuthorizationServer()
-    storage = Storage()
+    if config.signing_key_file is None:
+        jwk = None
+    else:
+        jwk = load_signing_key(config.signing_key_file)
+    storage = _open_storage(config.storage_url, jwk)
 
     for user in config.user_claims:
         storage.store_user(user)
 
+    # Keys include request data like the host, so the cache must be bounded.
+    response_cache = LruCache[Hashable, _CachedJson](maxsize=64)
+    # Tokens can be revoked through other providers that share the storage.
+    # These revocations would not invalidate the cache.
+    introspection_cache = (
+        LruCache[str, _IntrospectedToken](maxsize=_INTROSPECTION_CACHE_SIZE)
+        if isinstance(storage, MemoryStorage)
+        else None
+    )
+
     @setup_state.app.before_request
     def set_globals():
         flask.g.oidc_provider_mock_storage = storage
         flask.g.oidc_provider_mock_config = config
+        flask.g.oidc_provider_mock_response_cache = response_cache
+        flask.g.oidc_provider_mock_introspection_cache = introspection_cache
         flask.g._authlib_authorization_server = authorization
 
+    # Lets the Python API use the provider outside of requests
+    setup_state.app.extensions["oidc_provider_mock"] = set_globals
+
     def query_client(id: str) -> Client | None:
         client = storage.get_client(id)
         if not client and not config.require_client_registration:
@@ -268,38 +656,17 @@ def setup(setup_state: flask.blueprints.BlueprintSetupState):
         return client
 
     def save_token(token: dict[str, object], request: OAuth2Request):
-        assert token["token_type"] == "Bearer"
-        assert isinstance(token["access_token"], str)
-        assert isinstance(token["expires_in"], int)
-        assert isinstance(request.user, User)
-        scope = token.get("scope", "")
-        assert isinstance(scope, str)
-
-        storage.store_access_token(
-            AccessToken(
-                token=token["access_token"],
-                user_id=request.user.sub,
-                # request.scope may actually be None
-                scope=scope,
-                expires_at=datetime.now(UTC) + timedelta(seconds=token["expires_in"]),
-            )
-        )
-
-        if "refresh_token" in token:
-            assert isinstance(token["refresh_token"], str)
-            assert isinstance(request.client, Client)
+        # The client credentials grant issues tokens without a user
+        assert isinstance(request.user, User | None)
+        assert isinstance(request.client, Client)
+        if isinstance(request.refresh_token, RefreshToken):
+            family_id = request.refresh_token.family_id
+        else:
+            family_id = None
 
-            storage.store_refresh_token(
-                RefreshToken(
-                    access_token=token["access_token"],
-                    token=token["refresh_token"],
-                    user_id=request.user.sub,
-                    scope=scope,
-                    expires_at=datetime.now(UTC)
-                    + timedelta(seconds=token["expires_in"]),
-                    client_id=request.client.id,
-                )
-            )
+        storage.store_tokens(
+            *_tokens_to_store(token, request.user, request.client, family_id)
+        )
 
     authorization.init_app(  # type: ignore
         setup_state.app,
@@ -310,13 +677,71 @@ def setup(setup_state: flask.blueprints.BlueprintSetupState):
     for grant in (AuthorizationCodeGrant, RefreshTokenGrant):
         authorization.register_grant(
             grant,
-            [
-                OpenIDCode(
-                    require_nonce=config.require_nonce,
-                    token_max_age=config.access_token_max_age,
-                )
-            ],
+            [OpenIDCode(require_nonce=config.require_nonce)],
+        )
+
+    # Tokens issued without a user don’t include an ID token
+    authorization.register_grant(ClientCredentialsGrant)
+
+    authorization.register_endpoint(IntrospectionEndpoint)  # pyright: ignore[reportUnknownMemberType]
+    authorization.register_endpoint(RevocationEndpoint)  # pyright: ignore[reportUnknownMemberType]
+
+
+def _tokens_to_store(
+    token: dict[str, object], user: User | None, client: Client, family_id: str | None
+) -> tuple[AccessToken, RefreshToken | None]:
+    """Create the storage records for a token response generated by authlib.
+
+    A new refresh token starts a new family unless ``family_id`` is given.
+    """
+    assert token["token_type"] == "Bearer"
+    assert isinstance(token["access_token"], str)
+    assert isinstance(token["expires_in"], int)
+    scope = token.get("scope", "")
+    assert isinstance(scope, str)
+
+    access_token = AccessToken(
+        token=token["access_token"],
+        user_id=user.sub if user else None,
+        scope=scope,
+        expires_at=datetime.now(UTC) + timedelta(seconds=token["expires_in"]),
+        client_id=client.id,
+    )
+
+    if "refresh_token" in token:
+        assert isinstance(token["refresh_token"], str)
+        # Refresh tokens are only issued to users
+        assert user
+        refresh_token = RefreshToken(
+            access_token=token["access_token"],
+            token=token["refresh_token"],
+            user_id=user.sub,
+            scope=scope,
+            expires_at=datetime.now(UTC) + _REFRESH_TOKEN_MAX_AGE,
+            client_id=client.id,
+            family_id=family_id or token["refresh_token"],
         )
+    else:
+        refresh_token = None
+
+    return access_token, refresh_token
+
+
+def _open_storage(url: str | None, jwk: SigningKey | None) -> Storage:
+    if url is None:
+        return MemoryStorage(jwk=jwk)
+
+    scheme, _, path = url.partition(":")
+    if scheme == "sqlite":
+        # Accept both `sqlite:PATH` and `sqlite://PATH`
+        return SqliteStorage(path.removeprefix("//"), jwk=jwk)
+    elif scheme in {"redis", "rediss", "unix"}:
+        # redis is an optional dependency
+        from ._redis_storage import RedisStorage
+
+        return RedisStorage.from_url(url, jwk=jwk)
+
+    raise ValueError(f"Unsupported storage URL {url}")
 
 
 @blueprint.record_once
@@ -330,7 +755,16 @@ def app(
     require_nonce: bool = False,
     issue_refresh_token: bool = True,
     access_token_max_age: timedelta = timedelta(hours=1),
+    authorization_code_max_age: timedelta = timedelta(minutes=10),
     user_claims: Sequence[User] = (),
+    storage_url: str | None = None,
+    signing_key_file: str | None = None,
+    signing_key_rotation_interval: timedelta | None = None,
+    jwt_access_tokens: bool = False,
+    cascade_token_revocation: bool = True,
+    auto_approve: bool = False,
+    session_max_age: timedelta | None = None,
+    production: bool = False,
 ) -> flask.Flask:
     """Create a Flask app running the OpenID provider.
 
@@ -346,12 +780,24 @@ def app(
         require_nonce=require_nonce,
         issue_refresh_token=issue_refresh_token,
         access_token_max_age=access_token_max_age,
+        authorization_code_max_age=authorization_code_max_age,
         user_claims=user_claims,
+        storage_url=storage_url,
+        signing_key_file=signing_key_file,
+        signing_key_rotation_interval=signing_key_rotation_interval,
+        jwt_access_tokens=jwt_access_tokens,
+        cascade_token_revocation=cascade_token_revocation,
+        auto_approve=auto_approve,
+        session_max_age=session_max_age,
+        production=production,
     )
     app.secret_key = secrets.token_bytes(16)
     if isinstance(app.json, flask.json.provider.DefaultJSONProvider):
-        # Make it easier to debug responses
-        app.json.compact = False
+        if production:
+            app.json.sort_keys = False
+        else:
+            # Make it easier to debug responses
+            app.json.compact = False
     return app
 
 
@@ -362,7 +808,16 @@ def init_app(
     require_nonce: bool = False,
     issue_refresh_token: bool = True,
     access_token_max_age: timedelta = timedelta(hours=1),
+    authorization_code_max_age: timedelta = timedelta(minutes=10),
     user_claims: Sequence[User] = (),
+    storage_url: str | None = None,
+    signing_key_file: str | None = None,
+    signing_key_rotation_interval: timedelta | None = None,
+    jwt_access_tokens: bool = False,
+    cascade_token_revocation: bool = True,
+    auto_approve: bool = False,
+    session_max_age: timedelta | None = None,
+    production: bool = False,
 ):
     """Add the OpenID provider and its endpoints to the flask ``app``.
 
@@ -376,7 +831,49 @@ def init_app(
     :param issue_refresh_token: If true (the default), the token endpoint response
         will include a refresh token.
     :param access_token_max_age: Max age of access and ID token after which it expires.
+    :param authorization_code_max_age: Max age of an authorization code. Codes
+        that have not been exchanged for a token within this time are discarded.
     :param user_claims: Predefined users that can be authorized with one click.
+    :param storage_url: Where to store users, clients and tokens. By default, the
+        state is kept in memory. With ``sqlite:PATH`` the state is stored in the
+        SQLite database at ``PATH``, which is created if it does not exist. With
+        a ``redis://`` URL the state is stored in Redis. This requires the
+        ``redis`` extra. Several providers, for example in different processes
+        or on different hosts, can share state and signing keys through the
+        same database.
+    :param signing_key_file: Path to a PEM or JWK file with a private RSA,
+        P-256 or Ed25519 key. The key signs ID tokens for clients that use the
+        ``RS256``, ``ES256`` or ``EdDSA`` algorithm, respectively. By default,
+        keys are generated when they are first needed and shared by all
+        providers in the process.
+    :param signing_key_rotation_interval: If set, signing keys are replaced
+        with new keys after this time. The replaced keys are still published by
+        the ``/jwks`` endpoint until the ID tokens signed with them expire.
+        Keys can also be rotated with the ``POST /signing-keys/rotate``
+        endpoint.
+    :param jwt_access_tokens: If true, access tokens are JWTs as specified by
+        `RFC 9068 <https://datatracker.ietf.org/doc/html/rfc9068>`_ and signed
+        with the ``RS256`` key. The provider validates them by their signature
+        and claims. Only revoked tokens are looked up in the storage, so
+        providers that share a signing key accept each other’s tokens without
+        sharing storage.
+    :param cascade_token_revocation: If true (the default), revoking a refresh
+        token with the ``/oauth2/revoke`` endpoint also revokes the access
+        token that was issued with it.
+    :param auto_approve: If true, ``GET /oauth2/authorize`` requests redirect
+        to the client with an authorization code right away instead of showing
+        the authorization form. The user is the ``login_hint`` query parameter
+        or, if it is missing, the first user from ``user_claims``. Requests
+        without either show the form.
+    :param session_max_age: If set, the provider remembers the user that
+        authorized in a browser for this long. Further authorization requests
+        from the browser redirect to the client with an authorization code
+        without showing the form unless they include ``prompt=login``. The
+        browser session is identified by a cookie and ended by the
+        ``/oauth2/end_session`` endpoint.
+    :param production: If true, the app does not run in debug mode. `app`
+        additionally serves compact JSON with unsorted keys. Use this when
+        running the provider under load.
 
     .. _nonce parameter: https://openid.net/specs/openid-connect-core-1_0.html#AuthRequest
     """
@@ -388,18 +885,191 @@ def init_app(
             require_nonce=require_nonce,
             issue_refresh_token=issue_refresh_token,
             access_token_max_age=access_token_max_age,
+            authorization_code_max_age=authorization_code_max_age,
             user_claims=user_claims,
+            storage_url=storage_url,
+            signing_key_file=signing_key_file,
+            signing_key_rotation_interval=signing_key_rotation_interval,
+            jwt_access_tokens=jwt_access_tokens,
+            cascade_token_revocation=cascade_token_revocation,
+            auto_approve=auto_approve,
+            session_max_age=session_max_age,
+            production=production,
         ),
     )
 
     app.register_blueprint(_client.blueprint)
 
-    app.debug = True
+    app.debug = not production
     app.wsgi_app = ProxyFix(app.wsgi_app, x_host=1, x_proto=1, x_port=1)
 
     return app
 
 
+@dataclass(kw_only=True, frozen=True)
+class TokenSet:
+    """Tokens issued by `issue_tokens`."""
+
+    access_token: str
+    #: Seconds until the access token expires
+    expires_in: int
+    scope: str
+    #: ``None`` if the provider does not issue refresh tokens
+    refresh_token: str | None
+    #: ``None`` if the scope does not include ``openid``
+    id_token: str | None
+
+
+def issue_tokens(
+    app: flask.Flask,
+    user: User | str,
+    *,
+    client_id: str = "client",
+    scope: str = "openid",
+    nonce: str | None = None,
+    base_url: str | None = None,
+) -> TokenSet:
+    """Issue tokens for ``user`` without sending requests to the provider.
+
+    The tokens are the same as the ones the token endpoint issues after
+    ``user`` authorized the client. They are stored in the provider’s storage,
+    so the provider accepts them.
+
+    >>> import oidc_provider_mock
+    >>> provider = oidc_provider_mock.app()
+    >>> tokens = issue_tokens(provider, "alice@example.com", scope="openid email")
+    >>> tokens.scope
+    'openid email'
+
+    :param app: App that the provider was added to with `init_app`.
+    :param user: The user the tokens are issued to. If ``user`` is a `User`,
+        the user’s claims are stored and included in the ID token and the
+        userinfo response. If ``user`` is a subject, the claims of a stored user
+        are used. Unknown subjects are stored like in the authorization form.
+    :param client_id: The client the tokens are issued to. The client must be
+        registered if the provider requires client registration.
+    :param scope: Space-separated scopes of the tokens. An ID token is only
+        issued if the scope includes ``openid``.
+    :param nonce: Value of the ``nonce`` claim in the ID token.
+    :param base_url: URL the provider is served at, for example
+        ``http://localhost:54321``. The issuer of the ID token is derived from
+        it. Defaults to ``SERVER_NAME`` from the app config or
+        ``http://localhost``.
+    :raises ValueError: if the client is not registered.
+    """
+    with _provider_context(app, base_url):
+        client = _query_client(client_id)
+        alg = client.id_token_signed_response_alg
+        token, stored = _issue_tokens(
+            _store_user(user),
+            client,
+            scope,
+            nonce,
+            TokenSigner(_current_signing_key(alg), alg),
+        )
+        storage.store_tokens(*stored)
+
+    access_token, refresh_token = stored
+    expires_in = token["expires_in"]
+    assert isinstance(expires_in, int)
+    id_token = token.get("id_token")
+    assert isinstance(id_token, str | None)
+    return TokenSet(
+        access_token=access_token.token,
+        expires_in=expires_in,
+        scope=access_token.scope,
+        refresh_token=refresh_token.token if refresh_token else None,
+        id_token=id_token,
+    )
+
+
+def create_authorization_code(
+    app: flask.Flask,
+    user: User | str,
+    *,
+    redirect_uri: str,
+    client_id: str = "client",
+    scope: str = "openid",
+    nonce: str | None = None,
+) -> str:
+    """Create an authorization code as if ``user`` authorized the client.
+
+    Use this to test how a client exchanges the code at the token endpoint
+    without submitting the authorization form.
+
+    :param app: App that the provider was added to with `init_app`.
+    :param user: The user that authorizes the client. See `issue_tokens`.
+    :param redirect_uri: Redirect URI of the authorization request. The client
+        must use the same URI in the token request.
+    :param client_id: The client that requested the authorization.
+    :param scope: Space-separated scopes of the authorization.
+    :param nonce: Value of the ``nonce`` claim in the ID token.
+    :raises ValueError: if the client is not registered or the redirect URI is
+        not allowed for the client.
+    """
+    with _provider_context(app, None):
+        client = _query_client(client_id)
+        if not client.check_redirect_uri(redirect_uri):
+            raise ValueError(f"Redirect URI {redirect_uri} not allowed for client")
+
+        config = flask.g.oidc_provider_mock_config
+        assert isinstance(config, Config)
+        code = secrets.token_urlsafe(32)
+        storage.store_authorization_code(
+            AuthorizationCode(
+                code=code,
+                user_id=_store_user(user).sub,
+                client_id=client.id,
+                redirect_uri=redirect_uri,
+                scope=client.get_allowed_scope(scope),
+                nonce=nonce,
+                expires_at=datetime.now(UTC) + config.authorization_code_max_age,
+            )
+        )
+        return code
+
+
+@contextmanager
+def _provider_context(app: flask.Flask, base_url: str | None) -> Generator[None]:
+    set_globals = app.extensions.get("oidc_provider_mock")
+    if set_globals is None:
+        raise ValueError("The OpenID provider has not been added to the app")
+
+    with app.test_request_context(base_url=base_url):
+        set_globals()
+        yield
+
+
+def preload(app: flask.Flask) -> None:
+    """Load the signing keys and templates of the provider ``app``.
+
+    The server calls this before it forks worker processes so that the workers
+    share the keys and the loaded templates instead of creating their own.
+    """
+    with _provider_context(app, None):
+        for alg in SIGNING_ALGORITHMS:
+            _current_signing_key(alg)
+
+    for template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template)
+
+
+def _query_client(client_id: str) -> Client:
+    client = authorization.query_client(client_id)  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    if client is None:
+        raise ValueError(f"Unknown client {client_id}")
+    assert isinstance(client, Client)
+    return client
+
+
+def _store_user(user: User | str) -> User:
+    if isinstance(user, str):
+        return _get_or_create_user(user)
+
+    storage.store_user(user)
+    return user
+
+
 @blueprint.get("/")
 def home():
     return flask.render_template("index.html")
@@ -415,32 +1085,136 @@ def openid_config():
 
     # See https://openid.net/specs/openid-connect-discovery-1_0.html#ProviderMetadata
     # for information about the fields.
-    return flask.jsonify({
-        "issuer": flask.request.host_url.rstrip("/"),
-        "authorization_endpoint": url_for(authorize),
-        "token_endpoint": url_for(issue_token),
-        "userinfo_endpoint": url_for(userinfo),
-        "registration_endpoint": url_for(register_client),
-        "end_session_endpoint": url_for(end_session),
-        "jwks_uri": url_for(jwks),
-        "response_types_supported": Client.RESPONSE_TYPES_SUPPORTED,
-        "response_modes_supported": ["query"],
-        "grant_types_supported": Client.GRANT_TYPES_SUPPORTED,
-        "scopes_supported": Client.SCOPES_SUPPORTED,
-        "id_token_signing_alg_values_supported": [_JWS_ALG],
-        "subject_types_supported": ["public"],
-    })
+    def metadata():
+        return {
+            "issuer": flask.request.host_url.rstrip("/"),
+            "authorization_endpoint": url_for(authorize),
+            "token_endpoint": url_for(issue_token),
+            "userinfo_endpoint": url_for(userinfo),
+            "registration_endpoint": url_for(register_client),
+            "end_session_endpoint": url_for(end_session),
+            "jwks_uri": url_for(jwks),
+            "introspection_endpoint": url_for(introspect_token),
+            "revocation_endpoint": url_for(revoke_token),
+            "response_types_supported": Client.RESPONSE_TYPES_SUPPORTED,
+            "response_modes_supported": ["query"],
+            "grant_types_supported": Client.GRANT_TYPES_SUPPORTED,
+            "scopes_supported": Client.SCOPES_SUPPORTED,
+            "id_token_signing_alg_values_supported": SIGNING_ALGORITHMS,
+            "subject_types_supported": ["public"],
+        }
+
+    # The metadata only depends on the URL the provider is reached at
+    return _cached_json_response(
+        ("openid_config", flask.request.root_url), metadata, _DISCOVERY_MAX_AGE
+    )
 
 
 @blueprint.get("/jwks")
 def jwks():
-    return flask.jsonify(joserfc.jwk.KeySet([storage.jwk]).as_dict(private=False))
+    keys: list[joserfc.jwk.Key] = [
+        _current_signing_key(alg) for alg in SIGNING_ALGORITHMS
+    ]
+    keys.extend(storage.retired_signing_keys())
+    # The key IDs identify the key ring, so the key set is only serialized
+    # again after a rotation.
+    return _cached_json_response(
+        ("jwks", *(key.kid for key in keys)),
+        lambda: joserfc.jwk.KeySet(keys).as_dict(private=False),
+        _JWKS_MAX_AGE,
+    )
+
+
+@blueprint.post("/signing-keys/rotate")
+def rotate_signing_keys():
+    alg = flask.request.args.get("alg")
+    if alg is None:
+        algs = SIGNING_ALGORITHMS
+    elif alg in SIGNING_ALGORITHMS:
+        algs = (alg,)
+    else:
+        return f"Unsupported signing algorithm {alg}", HTTPStatus.BAD_REQUEST
+
+    for alg in algs:
+        _rotate_signing_key(alg)
+    return "", HTTPStatus.NO_CONTENT
+
+
+@dataclass(frozen=True)
+class _CachedJson:
+    body: bytes
+    etag: str
+
+
+def _cached_json_response(
+    key: Hashable, build: Callable[[], object], max_age: timedelta
+) -> flask.Response:
+    """Respond with the JSON returned by ``build`` and cache the serialized
+    body under ``key``.
+
+    The response carries an ``ETag`` and answers ``If-None-Match`` requests for
+    the current body with ``304 Not Modified``.
+    """
+    response_cache = cast(
+        "LruCache[Hashable, _CachedJson]", flask.g.oidc_provider_mock_response_cache
+    )
+
+    def build_entry():
+        body = json.dumps(build(), separators=(",", ":")).encode()
+        return _CachedJson(body=body, etag=hashlib.sha256(body).hexdigest()[:32])
+
+    entry = response_cache.get_or_build(key, build_entry)
+
+    # Werkzeug’s `make_conditional()` and `cache_control` cost more than
+    # serializing a small body, so the headers are set directly.
+    headers = {
+        "ETag": f'"{entry.etag}"',
+        "Cache-Control": f"public, max-age={int(max_age.total_seconds())}",
+    }
+    if flask.request.if_none_match.contains(entry.etag):
+        return flask.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+    return flask.Response(entry.body, mimetype="application/json", headers=headers)
+
+
+def _current_signing_key(alg: SigningAlgorithm) -> SigningKey:
+    """Return the key to sign ID tokens with ``alg``.
+
+    Rotates the key first if it is older than the configured
+    ``signing_key_rotation_interval``.
+    """
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    interval = config.signing_key_rotation_interval
+    if interval is not None:
+        max_created_at = datetime.now(UTC) - interval
+        if storage.signing_key_created_at(alg) <= max_created_at:
+            # Another provider that shares the storage may rotate the key at
+            # the same time. The storage replaces the key only once.
+            _rotate_signing_key(alg, max_created_at=max_created_at)
+
+    return storage.signing_key(alg)
+
+
+def _rotate_signing_key(
+    alg: SigningAlgorithm, *, max_created_at: datetime | None = None
+) -> None:
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    # ID tokens signed with the retired key expire after `access_token_max_age`.
+    # Until then, clients need the key to verify them.
+    if storage.rotate_signing_key(
+        alg,
+        datetime.now(UTC) + config.access_token_max_age,
+        max_created_at=max_created_at,
+    ):
+        _logger.info("rotated signing key", extra={"alg": alg})
 
 
 class RegisterClientBody(pydantic.BaseModel):
     redirect_uris: Sequence[pydantic.HttpUrl]
     token_endpoint_auth_method: ClientAuthMethod = "client_secret_basic"
     scope: str | None = None
+    id_token_signed_response_alg: SigningAlgorithm = "RS256"
 
 
 @blueprint.post("/oauth2/clients")
@@ -456,6 +1230,7 @@ def register_client():
         redirect_uris=[str(uri) for uri in body.redirect_uris],
         allowed_scopes=body.scope or Client.SCOPES_SUPPORTED,
         token_endpoint_auth_method=body.token_endpoint_auth_method,
+        id_token_signed_response_alg=body.id_token_signed_response_alg,
     )
 
     storage.store_client(client)
@@ -463,7 +1238,13 @@ def register_client():
         "client_id": client.id,
         "redirect_uris": client.redirect_uris,
         "token_endpoint_auth_method": body.token_endpoint_auth_method,
-        "grant_types": Client.GRANT_TYPES_SUPPORTED,
+        "id_token_signed_response_alg": body.id_token_signed_response_alg,
+        "grant_types": [
+            grant_type
+            for grant_type in Client.GRANT_TYPES_SUPPORTED
+            # Public clients can’t authenticate to obtain tokens for themselves
+            if not (is_public and grant_type == "client_credentials")
+        ],
         "response_types": Client.RESPONSE_TYPES_SUPPORTED,
     }
     if not is_public:
@@ -473,9 +1254,11 @@ def register_client():
 
 @blueprint.route("/oauth2/authorize", methods=["GET", "POST"])
 def authorize() -> flask.typing.ResponseReturnValue:
-    request = FlaskOAuth2Request(flask.request)
+    session_user = _session_user()
     try:
-        grant, redirect_uri = _validate_auth_request_client_params(flask.request)
+        grant, redirect_uri = _validate_auth_request_client_params(
+            flask.request, session_user
+        )
         assert isinstance(grant.client, Client)  # pyright: ignore[reportUnknownMemberType]
     except _AuthorizationValidationException as exc:
         _logger.warning(f"invalid authorization request: {exc.description}")
@@ -491,6 +1274,27 @@ def authorize() -> flask.typing.ResponseReturnValue:
     scopes = flask.request.args.get("scope", "").split()
 
     if flask.request.method == "GET":
+        prompts = set(flask.request.args.get("prompt", "").split())
+        if session_user and not prompts & _INTERACTIVE_PROMPTS:
+            return _approve_authorization(grant, redirect_uri, session_user.sub)
+
+        if "none" in prompts:
+            # authlib only checks the prompt of OpenID Connect requests
+            return authorization.handle_error_response(  # pyright: ignore
+                FlaskOAuth2Request(flask.request),
+                authlib.oidc.core.errors.LoginRequiredError(
+                    redirect_uri=redirect_uri,
+                    state=flask.request.args.get("state"),
+                ),
+            )
+
+        if config.auto_approve:
+            sub = flask.request.args.get("login_hint") or next(
+                iter(predefined_users), None
+            )
+            if sub:
+                return _approve_authorization(grant, redirect_uri, sub)
+
         return flask.render_template(
             "authorization_form.html",
             redirect_uri=redirect_uri,
@@ -514,29 +1318,102 @@ def authorize() -> flask.typing.ResponseReturnValue:
                 "Missing 'sub' form parameter",
             )
 
-        user = storage.get_user(sub)
-        if not user:
-            user = User(sub=sub, claims={"email": sub})
-            storage.store_user(user)
+        return _approve_authorization(grant, redirect_uri, sub)
+
+
+def _approve_authorization(
+    grant: AuthorizationCodeGrant, redirect_uri: str, sub: str
+) -> flask.typing.ResponseReturnValue:
+    """Redirect to the client with an authorization code for ``sub``."""
+
+    assert isinstance(grant.client, Client)  # pyright: ignore[reportUnknownMemberType]
+    user = _get_or_create_user(sub)
+
+    try:
+        response = grant.create_authorization_response(redirect_uri, user)  # pyright: ignore
+        _logger.info(
+            "issued authorization code",
+            extra=({"client": grant.client, "user": user}),
+        )
+        storage.record_subject(sub)
+        response = flask.make_response(authorization.handle_response(*response))  # pyright: ignore
+        _start_session(response, sub)
+        return response
+    except authlib.oauth2.OAuth2Error as error:
+        _logger.warning("invalid authorization request", exc_info=True)
+        return authorization.handle_error_response(  # pyright: ignore
+            FlaskOAuth2Request(flask.request), error
+        )
 
-        try:
-            response = grant.create_authorization_response(redirect_uri, user)  # pyright: ignore
-            _logger.info(
-                "issued authorization code",
-                extra=({"client": grant.client, "user": user}),
-            )
-            storage.record_subject(sub)
-            return authorization.handle_response(*response)  # pyright: ignore
-        except authlib.oauth2.OAuth2Error as error:
-            _logger.warning("invalid authorization request", exc_info=True)
-            return authorization.handle_error_response(request, error)  # pyright: ignore
+
+def _session_user() -> User | None:
+    """User of the browser session of the current request.
+
+    Returns ``None`` if sessions are disabled, there is no session or the
+    ``login_hint`` of the authorization request names a different user.
+    """
+
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    session_id = flask.request.cookies.get(_SESSION_COOKIE)
+    if not config.session_max_age or not session_id:
+        return None
+
+    sub = storage.get_session(session_id)
+    login_hint = flask.request.args.get("login_hint")
+    if sub is None or (login_hint and login_hint != sub):
+        return None
+
+    return _get_or_create_user(sub)
+
+
+def _start_session(response: werkzeug.wrappers.Response, sub: str):
+    """Remember ``sub`` as the user of the browser session.
+
+    Does nothing if sessions are disabled or the browser already has a session
+    for ``sub``.
+    """
+
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+    if not config.session_max_age:
+        return
+
+    session_id = flask.request.cookies.get(_SESSION_COOKIE)
+    if session_id:
+        if storage.get_session(session_id) == sub:
+            return
+        storage.remove_session(session_id)
+
+    session_id = secrets.token_urlsafe(32)
+    storage.store_session(session_id, sub, datetime.now(UTC) + config.session_max_age)
+    response.set_cookie(
+        _SESSION_COOKIE,
+        session_id,
+        max_age=config.session_max_age,
+        httponly=True,
+        # Browsers only send cookies from iframes of other sites with
+        # `SameSite=None`, which requires a secure cookie.
+        secure=flask.request.is_secure,
+        samesite="None" if flask.request.is_secure else "Lax",
+    )
+
+
+def _end_session(response: werkzeug.wrappers.Response):
+    session_id = flask.request.cookies.get(_SESSION_COOKIE)
+    if session_id:
+        storage.remove_session(session_id)
+        response.delete_cookie(_SESSION_COOKIE)
 
 
 def _validate_auth_request_client_params(
-    flask_request: flask.Request,
-) -> tuple[AuthorizationCodeGrant | RefreshTokenGrant, str]:
+    flask_request: flask.Request, end_user: User | None = None
+) -> tuple[AuthorizationCodeGrant, str]:
     """Validate query parameters sent by the client to the authorization endpoint.
 
+    ``end_user`` is the user that is already authenticated, if any. It is used
+    to validate the ``prompt`` parameter.
+
     Raises ``_AuthorizationValidationException`` if validation fails which results
     in an appropriate 400 response.
     """
@@ -544,7 +1421,7 @@ def _validate_auth_request_client_params(
     request = FlaskOAuth2Request(flask_request)
 
     try:
-        grant = authorization.get_consent_grant()  # type: ignore
+        grant = authorization.get_consent_grant(end_user=end_user)  # type: ignore
         assert isinstance(grant, AuthorizationCodeGrant)
         redirect_uri = grant.validate_authorization_request()
     except authlib.oauth2.rfc6749.InvalidClientError as e:
@@ -608,11 +1485,13 @@ def issue_token() -> flask.typing.ResponseReturnValue:
         )
         return authorization.handle_error_response(request, error)  # type: ignore
 
-    assert isinstance(grant, AuthorizationCodeGrant | RefreshTokenGrant)
+    assert isinstance(
+        grant, AuthorizationCodeGrant | RefreshTokenGrant | ClientCredentialsGrant
+    )
 
     try:
         grant.validate_token_request()
-        args = grant.create_token_response()
+        args = grant.create_token_response()  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
         return authorization.handle_response(*args)  # type: ignore
     except OAuth2Error as error:
         if error.error:
@@ -625,14 +1504,67 @@ def issue_token() -> flask.typing.ResponseReturnValue:
         return authorization.handle_error_response(request, error)  # type: ignore
 
 
+@blueprint.post("/oauth2/introspect")
+def introspect_token() -> flask.typing.ResponseReturnValue:
+    return authorization.create_endpoint_response(  # type: ignore
+        IntrospectionEndpoint.ENDPOINT_NAME
+    )
+
+
+@blueprint.post("/oauth2/revoke")
+def revoke_token() -> flask.typing.ResponseReturnValue:
+    return authorization.create_endpoint_response(  # type: ignore
+        RevocationEndpoint.ENDPOINT_NAME
+    )
+
+
+BatchTokensBody = pydantic.RootModel[
+    Annotated[list[str], pydantic.Field(max_length=_MAX_BATCH_SIZE)]
+]
+
+
+@blueprint.post("/oauth2/introspect/batch")
+def introspect_tokens_batch() -> flask.typing.ResponseReturnValue:
+    request = FlaskOAuth2Request(flask.request)
+    try:
+        authorization.authenticate_client(
+            request,
+            IntrospectionEndpoint.CLIENT_AUTH_METHODS,
+            IntrospectionEndpoint.ENDPOINT_NAME,
+        )
+    except OAuth2Error as error:
+        return authorization.handle_error_response(request, error)  # type: ignore
+
+    body = _validate_body(flask.request, BatchTokensBody)
+    results: list[dict[str, object]] = []
+    for token_string in body.root:
+        token = _query_introspected_token(token_string)
+        if token and not token.is_expired():
+            results.append(token.payload)
+        else:
+            results.append({"active": False})
+    return flask.jsonify(results)
+
+
 @blueprint.route("/userinfo", methods=["GET", "POST"])
 @require_oauth()  # pyright: ignore[reportUntypedFunctionDecorator]
 def userinfo():
     access_token = flask_oauth2.current_token
     assert isinstance(access_token, AccessToken)
-    return flask.jsonify(
-        _user_claims_for_scope(access_token.get_user(), access_token.scope)
-    )
+    return flask.jsonify(_userinfo_claims(access_token))
+
+
+@blueprint.post("/userinfo/batch")
+def userinfo_batch():
+    body = _validate_body(flask.request, BatchTokensBody)
+    results: list[dict[str, object]] = []
+    for token_string in body.root:
+        token = _get_access_token(token_string)
+        if token and not token.is_expired():
+            results.append(_userinfo_claims(token))
+        else:
+            results.append({"error": "invalid_token"})
+    return flask.jsonify(results)
 
 
 SetUserBody = pydantic.RootModel[dict[str, object]]
@@ -647,15 +1579,149 @@ def set_user(sub: str):
 
 @blueprint.post("/users/<sub>/revoke-tokens")
 def revoke_user_tokens(sub: str):
-    for access_token in storage.access_tokens():
-        if access_token.user_id == sub:
-            storage.remove_access_token(access_token.token)
-    for refresh_token in storage.refresh_tokens():
-        if refresh_token.user_id == sub:
-            storage.remove_refresh_token(refresh_token.token)
+    _revoke_access_tokens(token.token for token in storage.remove_user_tokens(sub))
+    _invalidate_introspection()
     return "", HTTPStatus.NO_CONTENT
 
 
+class MintTokenBody(pydantic.BaseModel):
+    sub: str
+    client_id: str
+    scope: str = "openid"
+    nonce: str | None = None
+
+
+MintTokensBody = pydantic.RootModel[list[MintTokenBody]]
+
+
+@blueprint.post("/tokens/mint")
+def mint_tokens() -> flask.typing.ResponseReturnValue:
+    body = _validate_body(flask.request, MintTokensBody)
+
+    clients: dict[str, Client] = {}
+    for item in body.root:
+        if item.client_id not in clients:
+            client = authorization.query_client(item.client_id)  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+            if not isinstance(client, Client):
+                return f"Unknown client {item.client_id}", HTTPStatus.BAD_REQUEST
+            clients[item.client_id] = client
+
+    # Sign all ID tokens of the request with the same keys and serialized headers
+    signers: dict[SigningAlgorithm, TokenSigner] = {}
+    for client in clients.values():
+        alg = client.id_token_signed_response_alg
+        if alg not in signers:
+            signers[alg] = TokenSigner(_current_signing_key(alg), alg)
+
+    def generate_lines():
+        for start in range(0, len(body.root), _MINT_BATCH_SIZE):
+            minted = [
+                (item, _mint_tokens(item, clients[item.client_id], signers))
+                for item in body.root[start : start + _MINT_BATCH_SIZE]
+            ]
+            storage.store_token_batch(stored for _, (_, stored) in minted)
+            for item, (token, _) in minted:
+                response = {"sub": item.sub, "client_id": item.client_id, **token}
+                yield json.dumps(response) + "\n"
+        _logger.info("minted tokens", extra={"count": len(body.root)})
+
+    return flask.Response(
+        flask.stream_with_context(generate_lines()),
+        mimetype="application/x-ndjson",
+    )
+
+
+def _mint_tokens(
+    item: MintTokenBody, client: Client, signers: dict[SigningAlgorithm, TokenSigner]
+) -> tuple[dict[str, object], tuple[AccessToken, RefreshToken | None]]:
+    return _issue_tokens(
+        _get_or_create_user(item.sub),
+        client,
+        item.scope,
+        item.nonce,
+        signers[client.id_token_signed_response_alg],
+    )
+
+
+def _issue_tokens(
+    user: User, client: Client, scope: str, nonce: str | None, signer: TokenSigner
+) -> tuple[dict[str, object], tuple[AccessToken, RefreshToken | None]]:
+    """Issue tokens like the token endpoint does for an authorization code.
+
+    Returns the token response and the tokens to store. ``signer`` signs the ID
+    token and must use the client’s ID token signing algorithm.
+    """
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+
+    scope = client.get_allowed_scope(scope)
+    token = cast(
+        "dict[str, object]",
+        authorization.generate_token(  # pyright: ignore[reportUnknownMemberType]
+            "authorization_code",
+            client,
+            user=user,
+            scope=scope,
+            include_refresh_token=config.issue_refresh_token,
+        ),
+    )
+
+    if "openid" in scope.split():
+        access_token = token["access_token"]
+        assert isinstance(access_token, str)
+        token["id_token"] = signer.sign(
+            _id_token_claims(user, client, scope, nonce, access_token)
+        )
+
+    return token, _tokens_to_store(token, user, client, family_id=None)
+
+
+def _id_token_claims(
+    user: User,
+    client: Client,
+    scope: str,
+    nonce: str | None,
+    access_token: str,
+    *,
+    refreshed: bool = False,
+) -> dict[str, object]:
+    """Claims of the ID token that is issued with ``access_token``.
+
+    The standard claims take precedence over claims of the user with the same
+    name. ID tokens issued for a refresh token don’t include ``auth_time``
+    because the time the user authenticated is not recorded.
+    """
+    config = flask.g.oidc_provider_mock_config
+    assert isinstance(config, Config)
+
+    at_hash = authlib.oidc.core.util.create_half_hash(
+        access_token, client.id_token_signed_response_alg
+    )
+    assert at_hash
+    now = int(datetime.now(UTC).timestamp())
+    claims = {
+        **_user_claims_for_scope(user, scope),
+        "iss": flask.request.host_url.rstrip("/"),
+        "aud": [client.id],
+        "iat": now,
+        "exp": now + int(config.access_token_max_age.total_seconds()),
+        "at_hash": at_hash.decode(),
+    }
+    if not refreshed:
+        claims["auth_time"] = now
+    if nonce is not None:
+        claims["nonce"] = nonce
+    return claims
+
+
+def _get_or_create_user(sub: str) -> User:
+    user = storage.get_user(sub)
+    if not user:
+        user = User(sub=sub, claims={"email": sub})
+        storage.store_user(user)
+    return user
+
+
 @blueprint.route("/oauth2/end_session", methods=["GET", "POST"])
 def end_session() -> flask.typing.ResponseReturnValue:
     # https://openid.net/specs/openid-connect-rpinitiated-1_0.html#RPLogout
@@ -690,12 +1756,16 @@ def end_session() -> flask.typing.ResponseReturnValue:
 def end_session_confirm() -> flask.typing.ResponseReturnValue:
     redirect_uri = flask.request.form.get("redirect_uri")
     if redirect_uri is not None:
-        return flask.redirect(redirect_uri)
+        response = flask.redirect(redirect_uri)
     else:
-        return flask.render_template(
-            "end_session_confirm.html",
-            session_ended=True,
+        response = flask.make_response(
+            flask.render_template(
+                "end_session_confirm.html",
+                session_ended=True,
+            )
         )
+    _end_session(response)
+    return response
 
 
 class InsecureTransportError(Exception):
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import itertools
+import sys
+from collections.abc import Awaitable, Callable, Iterable, Iterator, MutableMapping
+from typing import Any
+
+import flask
+
+type _Message = MutableMapping[str, Any]
+type _Scope = MutableMapping[str, Any]
+type _Receive = Callable[[], Awaitable[_Message]]
+type _Send = Callable[[_Message], Awaitable[None]]
+
+# Response chunks are collected up to this size before they are sent. The
+# `/tokens/mint` endpoint yields one small chunk per token.
+_CHUNK_SIZE = 64 * 1024
+
+
+class AsgiApp:
+    """ASGI application that adapts the WSGI interface of a Flask app.
+
+    The request body is read asynchronously and the WSGI app is called with
+    the complete body. With ``threaded`` the app is called on a worker thread
+    so that slow requests and storages that block on I/O, like SQLite and
+    Redis, do not stall other requests. Otherwise the app is called on the
+    event loop and requests are handled one at a time.
+    """
+
+    _app: flask.Flask
+    _threaded: bool
+
+    def __init__(self, app: flask.Flask, *, threaded: bool = True):
+        self._app = app
+        self._threaded = threaded
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
+
+        body = await _read_body(receive)
+        if body is None:
+            # The client disconnected
+            return
+
+        messages = self._response_messages(
+            _wsgi_environ(scope, body, multithread=self._threaded)
+        )
+        if self._threaded:
+            loop = asyncio.get_running_loop()
+
+            async def send_message(message: _Message):
+                await send(message)
+
+            def send_messages():
+                for message in messages:
+                    asyncio.run_coroutine_threadsafe(
+                        send_message(message), loop
+                    ).result()
+
+            await asyncio.to_thread(send_messages)
+        else:
+            for message in messages:
+                await send(message)
+
+    def _response_messages(self, environ: dict[str, Any]) -> Iterator[_Message]:
+        """Call the WSGI app and generate the ASGI messages for its response."""
+
+        start: list[_Message] = []
+        written: list[bytes] = []
+
+        def start_response(
+            status: str, headers: list[tuple[str, str]], exc_info: object = None
+        ):
+            start[:] = [
+                {
+                    "type": "http.response.start",
+                    "status": int(status.split(" ", 1)[0]),
+                    "headers": [
+                        (name.lower().encode("latin1"), value.encode("latin1"))
+                        for name, value in headers
+                    ],
+                }
+            ]
+            return written.append
+
+        body = self._app(environ, start_response)
+        try:
+            # Data passed to the `write` callable precedes the body
+            chunks = itertools.chain(written, body)
+            # Werkzeug responses call `start_response` before they produce
+            # the body but WSGI allows calling it with the first chunk.
+            chunk = _read_chunk(chunks)
+            yield start[0]
+            while chunk:
+                yield {"type": "http.response.body", "body": chunk, "more_body": True}
+                chunk = _read_chunk(chunks)
+            yield {"type": "http.response.body", "body": b"", "more_body": False}
+        finally:
+            if hasattr(body, "close"):
+                body.close()  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType]
+
+
+def asgi_app(app: flask.Flask, *, threaded: bool = True) -> AsgiApp:
+    """Serve the provider ``app`` with an ASGI server like uvicorn.
+
+    >>> import oidc_provider_mock
+    >>> import uvicorn
+    >>> config = uvicorn.Config(asgi_app(oidc_provider_mock.app()))
+
+    Requests are handled on worker threads so that slow requests, like the
+    first request that needs a signing key or a large ``/tokens/mint`` request,
+    and waiting for an SQLite or Redis storage do not block the server’s event
+    loop. With ``threaded=False`` requests are handled on the event loop one at
+    a time.
+    """
+    return AsgiApp(app, threaded=threaded)
+
+
+async def _lifespan(receive: _Receive, send: _Send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _read_body(receive: _Receive) -> bytes | None:
+    """Read the complete request body or return ``None`` if the client
+    disconnects.
+    """
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+def _read_chunk(chunks: Iterator[bytes]) -> bytes:
+    """Read chunks until they add up to `_CHUNK_SIZE`.
+
+    Returns an empty byte string if there are no more chunks.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= _CHUNK_SIZE:
+            break
+    return bytes(buffer)
+
+
+def _wsgi_environ(scope: _Scope, body: bytes, *, multithread: bool) -> dict[str, Any]:
+    """Build the WSGI environment for an HTTP request as specified by the `ASGI
+    WSGI compatibility <https://asgi.readthedocs.io/en/latest/specs/www.html#wsgi-compatibility>`_.
+    """
+    root_path: str = scope.get("root_path", "")
+    path: str = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    client_host, client_port = scope.get("client") or ("", 0)
+
+    environ: dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode().decode("latin1"),
+        "PATH_INFO": path.encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client_host,
+        "REMOTE_PORT": str(client_port),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": multithread,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+    headers: Iterable[tuple[bytes, bytes]] = scope["headers"]
+    for raw_name, raw_value in headers:
+        name = raw_name.decode("latin1")
+        value = raw_value.decode("latin1")
+        if name == "content-length":
+            continue
+        elif name == "content-type":
+            environ["CONTENT_TYPE"] = value
+            continue
+
+        key = "HTTP_" + name.upper().replace("-", "_")
+        if key in environ:
+            # Cookie headers are the exception to joining header values with
+            # a comma. See RFC 9110 section 5.3 and RFC 6265 section 5.4.
+            separator = "; " if key == "HTTP_COOKIE" else ","
+            value = f"{environ[key]}{separator}{value}"
+        environ[key] = value
+
+    return environ
@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+
+class LruCache[K: Hashable, V]:
+    """Thread-safe mapping that holds at most ``maxsize`` entries.
+
+    When the cache is full, adding an entry evicts the least recently used one.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def get_or_build(self, key: K, build: Callable[[], V]) -> V:
+        """Return the entry for ``key`` or store the result of ``build``.
+
+        ``build`` is called without holding the lock, so concurrent calls for
+        the same key may build the value more than once.
+        """
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.set(key, value)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
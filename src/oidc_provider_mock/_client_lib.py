@@ -1,3 +1,5 @@
+import time
+import warnings
 from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
@@ -5,11 +7,17 @@ from typing import Literal, Self
 from urllib.parse import parse_qsl, urljoin, urlparse
 
 import httpx
+import joserfc.errors
 import joserfc.jwk
+import joserfc.jws
 import joserfc.jwt
 import pydantic
 from authlib.integrations.httpx_client import OAuth2Client
 
+# Minimum time in seconds before the signing keys are fetched again after they
+# did not contain the key of an ID token
+_UNKNOWN_KID_REFETCH_INTERVAL = 30
+
 
 @dataclass(kw_only=True, frozen=True)
 class TokenData:
@@ -58,6 +66,10 @@ class OidcClient:
     DEFAULT_AUTH_METHOD = "client_secret_basic"
 
     _authlib_client: OAuth2Client
+    _jwks: joserfc.jwk.KeySet
+    _jwks_by_kid: dict[str, joserfc.jwk.Key]
+    # Monotonic time before which the signing keys are not fetched again
+    _jwks_refetch_not_before: float
 
     def __init__(
         self,
@@ -77,8 +89,11 @@ class OidcClient:
         # TODO: validate response
         config = self.get_authorization_server_metadata(issuer)
 
-        self._jwks = joserfc.jwk.KeySet.import_key_set(
-            httpx.get(config["jwks_uri"]).json()
+        self._jwks_uri: str = config["jwks_uri"]
+        self._jwks_refetch_not_before = 0.0
+        self._update_jwks()
+        self._id_token_algorithms: list[str] = config.get(
+            "id_token_signing_alg_values_supported", ["RS256"]
         )
 
         self._issuer = config["issuer"]
@@ -297,11 +312,43 @@ class OidcClient:
             refresh_token=response.refresh_token,
         )
 
+    def _update_jwks(self) -> None:
+        response = httpx.get(self._jwks_uri)
+        response.raise_for_status()
+        self._jwks = joserfc.jwk.KeySet.import_key_set(response.json())
+        self._jwks_by_kid = {
+            key.kid: key for key in self._jwks.keys if key.kid is not None
+        }
+
+    def _signing_key(self, kid: str) -> joserfc.jwk.Key:
+        key = self._jwks_by_kid.get(kid)
+        if key is None and time.monotonic() >= self._jwks_refetch_not_before:
+            # The provider may have rotated its signing keys
+            self._update_jwks()
+            key = self._jwks_by_kid.get(kid)
+            if key is None:
+                # Don’t fetch the keys for every token with an unknown `kid`
+                self._jwks_refetch_not_before = (
+                    time.monotonic() + _UNKNOWN_KID_REFETCH_INTERVAL
+                )
+
+        if key is None:
+            raise ValueError(f"Unknown ID token signing key {kid}")
+        return key
+
     def _decode_and_verify_id_token(self, id_token: str) -> dict[str, object]:
         # See https://openid.net/specs/openid-connect-core-1_0.html#IDTokenValidation
 
         # 1. decode and verify signature
-        token = joserfc.jwt.decode(id_token, self._jwks)
+        kid = joserfc.jws.extract_compact(id_token.encode()).protected.get("kid")
+        key = self._jwks if kid is None else self._signing_key(kid)
+
+        with warnings.catch_warnings():
+            # Allow `EdDSA` which joserfc deprecates in favor of `Ed25519`
+            warnings.simplefilter("ignore", joserfc.errors.SecurityWarning)
+            token = joserfc.jwt.decode(
+                id_token, key, algorithms=self._id_token_algorithms
+            )
         # TODO: wrap error
         claims = _OidcClaims.model_validate(token.claims)
 
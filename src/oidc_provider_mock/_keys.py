@@ -0,0 +1,149 @@
+import base64
+import functools
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Literal
+
+import joserfc.errors
+import joserfc.jwk
+import joserfc.jws
+
+type SigningAlgorithm = Literal["RS256", "ES256", "EdDSA"]
+type SigningKey = joserfc.jwk.RSAKey | joserfc.jwk.ECKey | joserfc.jwk.OKPKey
+
+#: Algorithms the provider can sign ID tokens with.
+SIGNING_ALGORITHMS: tuple[SigningAlgorithm, ...] = ("RS256", "ES256", "EdDSA")
+
+_default_signing_keys: dict[SigningAlgorithm, SigningKey] = {}
+_default_signing_keys_lock = threading.Lock()
+
+
+def generate_signing_key(alg: SigningAlgorithm) -> SigningKey:
+    """Generate a key for ``alg`` with its thumbprint as the key ID."""
+    key: SigningKey
+    if alg == "RS256":
+        key = joserfc.jwk.RSAKey.generate_key(private=True)
+    elif alg == "ES256":
+        key = joserfc.jwk.ECKey.generate_key("P-256", private=True)
+    else:
+        key = joserfc.jwk.OKPKey.generate_key("Ed25519", private=True)
+    key.ensure_kid()
+    return key
+
+
+def default_signing_key(alg: SigningAlgorithm) -> SigningKey:
+    """Signing key for providers that are not configured with a key.
+
+    Generating an RSA key takes a significant part of the time it takes to
+    create a provider app. The key is therefore generated only when it is first
+    needed and then shared by all providers in the process.
+    """
+    with _default_signing_keys_lock:
+        key = _default_signing_keys.get(alg)
+        if key is None:
+            key = _default_signing_keys[alg] = generate_signing_key(alg)
+        return key
+
+
+def signing_key_algorithm(key: SigningKey) -> SigningAlgorithm:
+    """Return the algorithm the provider signs ID tokens with when using ``key``.
+
+    :raises ValueError: if no supported algorithm uses the key.
+    """
+    if isinstance(key, joserfc.jwk.RSAKey):
+        return "RS256"
+
+    crv = key.as_dict(private=False)["crv"]
+    if isinstance(key, joserfc.jwk.ECKey) and crv == "P-256":
+        return "ES256"
+    elif isinstance(key, joserfc.jwk.OKPKey) and crv == "Ed25519":
+        return "EdDSA"
+
+    raise ValueError(f"Unsupported {key.key_type} signing key with curve {crv}")
+
+
+@functools.lru_cache(maxsize=64)
+def import_signing_key(data: str) -> SigningKey:
+    """Import a signing key stored with `export_signing_key`.
+
+    Storages read keys on every use so that they see keys rotated by other
+    processes. Imported keys are cached because parsing an RSA key is expensive.
+    """
+    key = joserfc.jwk.import_key(json.loads(data))
+    assert not isinstance(key, joserfc.jwk.OctKey)
+    return key
+
+
+def export_signing_key(key: SigningKey) -> str:
+    return json.dumps(key.as_dict(private=True))
+
+
+class TokenSigner:
+    """Signs JWTs with ``key`` using a JOSE header that is serialized once.
+
+    `joserfc.jwt.encode` serializes and validates the header for every token.
+    When many tokens are signed with the same key, this is a noticeable part
+    of the work that is not spent on the signature itself.
+    """
+
+    def __init__(self, key: SigningKey, alg: SigningAlgorithm, typ: str = "JWT"):
+        header = {"alg": alg, "typ": typ, "kid": key.kid}
+        self._signing_input_prefix = _b64encode(_json_bytes(header)) + b"."
+        self._algorithm = joserfc.jws.JWSRegistry.algorithms[alg]
+        self._key = key
+
+    def sign(self, claims: dict[str, object]) -> str:
+        signing_input = self._signing_input_prefix + _b64encode(_json_bytes(claims))
+        signature = self._algorithm.sign(signing_input, self._key)
+        return (signing_input + b"." + _b64encode(signature)).decode()
+
+
+def _json_bytes(value: object) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def load_signing_key(path: str | os.PathLike[str]) -> SigningKey:
+    """Load a private RSA, P-256 or Ed25519 key from a PEM or JWK file.
+
+    :raises ValueError: if the file does not contain a supported private key.
+    """
+    data = Path(path).read_bytes()
+
+    try:
+        if data.lstrip().startswith(b"{"):
+            key = _import_jwk(data)
+        else:
+            key = _import_pem_key(data)
+        signing_key_algorithm(key)
+    except (ValueError, joserfc.errors.JoseError) as e:
+        raise ValueError(f"Invalid signing key file {path}: {e}") from e
+
+    if not key.is_private:
+        raise ValueError(f"Signing key file {path} does not contain a private key")
+
+    key.ensure_kid()
+    return key
+
+
+def _import_jwk(data: bytes) -> SigningKey:
+    key = joserfc.jwk.import_key(json.loads(data))
+    if not isinstance(key, joserfc.jwk.OctKey):
+        return key
+
+    raise ValueError("symmetric keys are not supported")
+
+
+def _import_pem_key(data: bytes) -> SigningKey:
+    for key_type in (joserfc.jwk.RSAKey, joserfc.jwk.ECKey, joserfc.jwk.OKPKey):
+        try:
+            return key_type.import_key(data)
+        except (ValueError, joserfc.errors.JoseError):
+            pass
+
+    raise ValueError("unsupported PEM key")
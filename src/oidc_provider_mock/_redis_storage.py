@@ -0,0 +1,495 @@
+import json
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
+from typing import Any, cast
+
+import redis
+import redis.client
+
+from ._keys import (
+    SigningAlgorithm,
+    SigningKey,
+    default_signing_key,
+    export_signing_key,
+    generate_signing_key,
+    import_signing_key,
+    signing_key_algorithm,
+)
+from ._storage import (
+    AccessToken,
+    AuthorizationCode,
+    Client,
+    ClientAllowAny,
+    RefreshToken,
+    Storage,
+    User,
+)
+
+_RECENT_SUBJECTS_LIMIT = 20
+
+
+class RedisStorage(Storage):
+    """Store the provider state in Redis.
+
+    Several providers can use the same Redis server and share the provider
+    state, including the signing keys.
+
+    Authorization codes, tokens, nonces and sessions are stored with a TTL so
+    that Redis expires them and `remove_expired` does nothing. Tokens are
+    additionally indexed by user and refresh token family in Redis sorted sets
+    scored by the expiry of the tokens. Adding a token to an index removes the
+    expired tokens from it and the index expires together with the most
+    recently added token.
+    """
+
+    _redis: redis.Redis
+    _prefix: str
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        *,
+        prefix: str = "oidc_provider_mock:",
+        jwk: SigningKey | None = None,
+    ) -> None:
+        """
+        :param client: Redis client to use.
+        :param prefix: Prefix for all keys used by the storage.
+        :param jwk: Key to sign ID tokens with when its algorithm is used. The
+            key is stored in Redis. Other algorithms use the keys stored in
+            Redis. If Redis has no key for an algorithm yet, the key shared by
+            all providers in the process is stored.
+        """
+        self._redis = client
+        self._prefix = prefix
+
+        if jwk is not None:
+            redis_key = self._key("signing_key", signing_key_algorithm(jwk))
+            data = self._redis.get(redis_key)
+            if data is None or json.loads(data)["jwk"] != export_signing_key(jwk):
+                self._redis.set(redis_key, _signing_key_to_json(jwk))
+
+    @classmethod
+    def from_url(cls, url: str, *, jwk: SigningKey | None = None) -> "RedisStorage":
+        return cls(redis.Redis.from_url(url), jwk=jwk)  # pyright: ignore[reportUnknownMemberType]
+
+    def _key(self, *parts: str) -> str:
+        return self._prefix + ":".join(parts)
+
+    # Signing keys
+
+    def signing_key(self, alg: SigningAlgorithm) -> SigningKey:
+        return self._current_signing_key(alg)[0]
+
+    def signing_key_created_at(self, alg: SigningAlgorithm) -> datetime:
+        return self._current_signing_key(alg)[1]
+
+    def rotate_signing_key(
+        self,
+        alg: SigningAlgorithm,
+        expires_at: datetime,
+        *,
+        max_created_at: datetime | None = None,
+    ) -> bool:
+        redis_key = self._key("signing_key", alg)
+        retired_key = self._key("retired_signing_keys")
+        with self._redis.pipeline() as pipeline:  # pyright: ignore[reportUnknownMemberType]
+            # The transaction fails if another provider rotates the key after
+            # it is read
+            pipeline.watch(redis_key)
+            current = pipeline.get(redis_key)
+            if (
+                max_created_at is not None
+                and current is not None
+                and datetime.fromisoformat(json.loads(current)["created_at"])
+                > max_created_at
+            ):
+                return False
+
+            new_key = generate_signing_key(alg)
+            pipeline.multi()
+            if current is not None:
+                pipeline.zadd(
+                    retired_key, {json.loads(current)["jwk"]: expires_at.timestamp()}
+                )
+            pipeline.zremrangebyscore(
+                retired_key, "-inf", datetime.now(UTC).timestamp()
+            )
+            pipeline.set(redis_key, _signing_key_to_json(new_key))
+            try:
+                pipeline.execute()
+            except redis.WatchError:
+                # The key of the other provider is used instead
+                return False
+        return True
+
+    def retired_signing_keys(self) -> Sequence[SigningKey]:
+        jwks = cast(
+            "list[bytes | str]",
+            self._redis.zrangebyscore(  # pyright: ignore[reportUnknownMemberType]
+                self._key("retired_signing_keys"),
+                f"({datetime.now(UTC).timestamp()}",
+                "+inf",
+            ),
+        )
+        return [import_signing_key(_decode(jwk)) for jwk in jwks]
+
+    def _current_signing_key(
+        self, alg: SigningAlgorithm
+    ) -> tuple[SigningKey, datetime]:
+        redis_key = self._key("signing_key", alg)
+        data = self._redis.get(redis_key)
+        if data is None:
+            self._redis.set(
+                redis_key,
+                _signing_key_to_json(default_signing_key(alg)),
+                nx=True,
+            )
+            data = self._redis.get(redis_key)
+            assert data is not None
+
+        fields = json.loads(data)
+        return (
+            import_signing_key(fields["jwk"]),
+            datetime.fromisoformat(fields["created_at"]),
+        )
+
+    # User
+
+    def get_user(self, sub: str) -> User | None:
+        claims = self._redis.hget(self._key("users"), sub)
+        if claims is not None:
+            return User(sub=sub, claims=json.loads(claims))
+
+    def store_user(self, user: User) -> None:
+        self._redis.hset(self._key("users"), user.sub, json.dumps(user.claims))
+
+    def get_recent_subjects(self) -> Sequence[str]:
+        return [
+            _decode(sub)
+            for sub in self._redis.lrange(
+                self._key("recent_subjects"), 0, _RECENT_SUBJECTS_LIMIT - 1
+            )
+        ]
+
+    def record_subject(self, sub: str) -> None:
+        key = self._key("recent_subjects")
+        with self._redis.pipeline() as pipeline:  # pyright: ignore[reportUnknownMemberType]
+            pipeline.lrem(key, 0, sub)
+            pipeline.lpush(key, sub)
+            pipeline.ltrim(key, 0, _RECENT_SUBJECTS_LIMIT - 1)
+            pipeline.execute()
+
+    # AuthorizationCodes
+
+    def get_authorization_code(self, code: str) -> AuthorizationCode | None:
+        data = self._redis.get(self._key("authorization_code", code))
+        if data is not None:
+            return _authorization_code_from_json(data)
+
+    def store_authorization_code(self, code: AuthorizationCode) -> None:
+        self._redis.set(
+            self._key("authorization_code", code.code),
+            _to_json(code),
+            px=_ttl(code.expires_at),
+        )
+
+    def remove_authorization_code(self, code: str) -> AuthorizationCode | None:
+        data = self._redis.getdel(self._key("authorization_code", code))
+        if data is not None:
+            return _authorization_code_from_json(data)
+
+    # AccessTokens
+
+    def get_access_token(self, token: str) -> AccessToken | None:
+        data = self._redis.get(self._key("access_token", token))
+        if data is not None:
+            return _access_token_from_json(data)
+
+    def store_access_token(self, access_token: AccessToken) -> None:
+        with self._redis.pipeline(transaction=False) as pipeline:  # pyright: ignore[reportUnknownMemberType]
+            self._store_access_token(pipeline, access_token)
+            pipeline.execute()
+
+    def remove_access_token(self, access_token: str) -> AccessToken | None:
+        data = self._redis.getdel(self._key("access_token", access_token))
+        if data is not None:
+            token = _access_token_from_json(data)
+            if token.user_id is not None:
+                self._redis.zrem(
+                    self._key("user_access_tokens", token.user_id), token.token
+                )
+            return token
+
+    # RefreshTokens
+
+    def get_refresh_token(self, token: str) -> RefreshToken | None:
+        data = self._redis.get(self._key("refresh_token", token))
+        if data is not None:
+            return _refresh_token_from_json(data)
+
+    def store_refresh_token(self, refresh_token: RefreshToken) -> None:
+        with self._redis.pipeline(transaction=False) as pipeline:  # pyright: ignore[reportUnknownMemberType]
+            self._store_refresh_token(pipeline, refresh_token)
+            pipeline.execute()
+
+    def store_tokens(
+        self, access_token: AccessToken, refresh_token: RefreshToken | None
+    ) -> None:
+        self.store_token_batch([(access_token, refresh_token)])
+
+    def store_token_batch(
+        self, tokens: Iterable[tuple[AccessToken, RefreshToken | None]]
+    ) -> None:
+        with self._redis.pipeline(transaction=False) as pipeline:  # pyright: ignore[reportUnknownMemberType]
+            for access_token, refresh_token in tokens:
+                self._store_access_token(pipeline, access_token)
+                if refresh_token:
+                    self._store_refresh_token(pipeline, refresh_token)
+            pipeline.execute()
+
+    def remove_refresh_token(self, token: str) -> RefreshToken | None:
+        data = self._redis.getdel(self._key("refresh_token", token))
+        if data is not None:
+            refresh_token = _refresh_token_from_json(data)
+            with self._redis.pipeline(transaction=False) as pipeline:  # pyright: ignore[reportUnknownMemberType]
+                self._remove_refresh_token_from_indexes(pipeline, refresh_token)
+                pipeline.execute()
+            return refresh_token
+
+    def retire_refresh_token(self, token: str) -> RefreshToken | None:
+        refresh_token = self.remove_refresh_token(token)
+        if refresh_token:
+            self._redis.set(
+                self._key("retired_refresh_token", token),
+                refresh_token.family_id,
+                px=_ttl(refresh_token.expires_at),
+            )
+        return refresh_token
+
+    def get_retired_refresh_token_family(self, token: str) -> str | None:
+        family_id = self._redis.get(self._key("retired_refresh_token", token))
+        if family_id is not None:
+            return _decode(family_id)
+
+    def remove_refresh_token_family(self, family_id: str) -> Sequence[AccessToken]:
+        removed: list[AccessToken] = []
+        for token in self._index_members(self._key("refresh_token_family", family_id)):
+            refresh_token = self.remove_refresh_token(token)
+            if refresh_token:
+                access_token = self.remove_access_token(refresh_token.access_token)
+                if access_token:
+                    removed.append(access_token)
+        return removed
+
+    def remove_user_tokens(self, user_id: str) -> Sequence[AccessToken]:
+        removed: list[AccessToken] = []
+        access_tokens_key = self._key("user_access_tokens", user_id)
+        for token in self._index_members(access_tokens_key):
+            data = self._redis.getdel(self._key("access_token", token))
+            if data is not None:
+                removed.append(_access_token_from_json(data))
+        self._redis.delete(access_tokens_key)
+
+        for token in self._index_members(self._key("user_refresh_tokens", user_id)):
+            self.remove_refresh_token(token)
+        return removed
+
+    # Revoked access tokens
+
+    def revoke_access_token(self, token_id: str, expires_at: datetime) -> None:
+        self._redis.set(
+            self._key("revoked_access_token", token_id), 1, px=_ttl(expires_at)
+        )
+
+    def is_access_token_revoked(self, token_id: str) -> bool:
+        return bool(self._redis.exists(self._key("revoked_access_token", token_id)))
+
+    def _store_access_token(
+        self, pipeline: redis.client.Pipeline, access_token: AccessToken
+    ) -> None:
+        ttl = _ttl(access_token.expires_at)
+        pipeline.set(
+            self._key("access_token", access_token.token),
+            _to_json(access_token),
+            px=ttl,
+        )
+        if access_token.user_id is not None:
+            _add_to_index(
+                pipeline,
+                self._key("user_access_tokens", access_token.user_id),
+                access_token.token,
+                access_token.expires_at,
+            )
+
+    def _store_refresh_token(
+        self, pipeline: redis.client.Pipeline, refresh_token: RefreshToken
+    ) -> None:
+        ttl = _ttl(refresh_token.expires_at)
+        pipeline.set(
+            self._key("refresh_token", refresh_token.token),
+            _to_json(refresh_token),
+            px=ttl,
+        )
+        for index_key in (
+            self._key("user_refresh_tokens", refresh_token.user_id),
+            self._key("refresh_token_family", refresh_token.family_id),
+        ):
+            _add_to_index(
+                pipeline, index_key, refresh_token.token, refresh_token.expires_at
+            )
+
+    def _index_members(self, index_key: str) -> list[str]:
+        tokens = cast(
+            "list[bytes | str]",
+            self._redis.zrange(index_key, 0, -1),  # pyright: ignore[reportUnknownMemberType]
+        )
+        return [_decode(token) for token in tokens]
+
+    def _remove_refresh_token_from_indexes(
+        self, pipeline: redis.client.Pipeline, refresh_token: RefreshToken
+    ) -> None:
+        pipeline.zrem(
+            self._key("user_refresh_tokens", refresh_token.user_id),
+            refresh_token.token,
+        )
+        pipeline.zrem(
+            self._key("refresh_token_family", refresh_token.family_id),
+            refresh_token.token,
+        )
+
+    # Client
+
+    def get_client(self, id: str) -> Client | None:
+        data = self._redis.hget(self._key("clients"), id)
+        if data is not None:
+            fields = json.loads(data)
+            return Client(
+                id=id,
+                secret=_decode_allow_any(fields["secret"]),
+                redirect_uris=_decode_allow_any(fields["redirect_uris"]),
+                allowed_scopes=fields["allowed_scopes"],
+                token_endpoint_auth_method=_decode_allow_any(
+                    fields["token_endpoint_auth_method"]
+                ),
+                id_token_signed_response_alg=fields["id_token_signed_response_alg"],
+            )
+
+    def store_client(self, client: Client) -> None:
+        self._redis.hset(
+            self._key("clients"),
+            client.id,
+            json.dumps({
+                "secret": _encode_allow_any(client.secret),
+                "redirect_uris": _encode_allow_any(client.redirect_uris),
+                "allowed_scopes": list(client.allowed_scopes),
+                "token_endpoint_auth_method": _encode_allow_any(
+                    client.token_endpoint_auth_method
+                ),
+                "id_token_signed_response_alg": client.id_token_signed_response_alg,
+            }),
+        )
+
+    # Nonce
+
+    def add_nonce(self, nonce: str, expires_at: datetime) -> None:
+        self._redis.set(self._key("nonce", nonce), 1, px=_ttl(expires_at))
+
+    def exists_nonce(self, nonce: str) -> bool:
+        return bool(self._redis.exists(self._key("nonce", nonce)))
+
+    # Sessions
+
+    def get_session(self, session_id: str) -> str | None:
+        sub = self._redis.get(self._key("session", session_id))
+        if sub is not None:
+            return _decode(sub)
+
+    def store_session(self, session_id: str, sub: str, expires_at: datetime) -> None:
+        self._redis.set(self._key("session", session_id), sub, px=_ttl(expires_at))
+
+    def remove_session(self, session_id: str) -> None:
+        self._redis.delete(self._key("session", session_id))
+
+    # Expiry
+
+    def remove_expired(self) -> None:
+        # Redis removes expired keys itself
+        pass
+
+
+def _ttl(expires_at: datetime) -> int:
+    """Time in milliseconds until ``expires_at``.
+
+    Redis rejects non-positive TTLs, so entries that have already expired get
+    the shortest possible TTL.
+    """
+    return max(1, (expires_at - datetime.now(UTC)) // timedelta(milliseconds=1))
+
+
+def _add_to_index(
+    pipeline: redis.client.Pipeline, index_key: str, token: str, expires_at: datetime
+) -> None:
+    """Add ``token`` to the sorted set ``index_key`` and remove expired tokens
+    from it so that the index does not grow with every token that is issued.
+
+    The index expires with its last token. Tokens stored by providers with a
+    shorter token lifetime don’t shorten the TTL of the index.
+    """
+    pipeline.zremrangebyscore(index_key, "-inf", datetime.now(UTC).timestamp())
+    pipeline.zadd(index_key, {token: expires_at.timestamp()})
+    ttl = _ttl(expires_at)
+    # Set the TTL of a new index and only ever extend the TTL of an existing
+    # one
+    pipeline.pexpire(index_key, ttl, nx=True)
+    pipeline.pexpire(index_key, ttl, gt=True)
+
+
+def _signing_key_to_json(key: SigningKey) -> str:
+    return json.dumps({
+        "jwk": export_signing_key(key),
+        "created_at": datetime.now(UTC).isoformat(),
+    })
+
+
+def _to_json(value: AuthorizationCode | AccessToken) -> str:
+    fields = asdict(value)
+    fields["expires_at"] = value.expires_at.isoformat()
+    return json.dumps(fields)
+
+
+def _decode(value: bytes | str) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def _from_json(data: bytes | str) -> dict[str, Any]:
+    fields = json.loads(data)
+    fields["expires_at"] = datetime.fromisoformat(fields["expires_at"])
+    return fields
+
+
+def _authorization_code_from_json(data: bytes | str) -> AuthorizationCode:
+    return AuthorizationCode(**_from_json(data))
+
+
+def _access_token_from_json(data: bytes | str) -> AccessToken:
+    return AccessToken(**_from_json(data))
+
+
+def _refresh_token_from_json(data: bytes | str) -> RefreshToken:
+    return RefreshToken(**_from_json(data))
+
+
+def _encode_allow_any(value: object) -> object:
+    if isinstance(value, ClientAllowAny):
+        return None
+    return value
+
+
+def _decode_allow_any(value: Any) -> Any:
+    if value is None:
+        return ClientAllowAny()
+    return value
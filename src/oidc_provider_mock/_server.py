@@ -1,13 +1,22 @@
+import io
+import os
+import selectors
+import socket
+import sys
 import threading
+import time
+import wsgiref.headers
+import wsgiref.simple_server
 from collections.abc import Generator, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import AbstractContextManager, contextmanager
 from datetime import timedelta
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING, cast, override
 
 import werkzeug.serving
 
 if TYPE_CHECKING:
-    from _typeshed.wsgi import WSGIApplication
+    from _typeshed.wsgi import WSGIApplication, WSGIEnvironment
 
 from ._app import app
 from ._storage import User
@@ -18,11 +27,23 @@ assert __package__
 def run_server_in_thread(
     port: int = 0,
     *,
+    uds: str | os.PathLike[str] | None = None,
+    threads: int | None = None,
+    backlog: int | None = None,
     require_client_registration: bool = False,
     require_nonce: bool = False,
     issue_refresh_token: bool = True,
     access_token_max_age: timedelta = timedelta(hours=1),
+    authorization_code_max_age: timedelta = timedelta(minutes=10),
     user_claims: Sequence[User] = (),
+    storage_url: str | None = None,
+    signing_key_file: str | None = None,
+    signing_key_rotation_interval: timedelta | None = None,
+    jwt_access_tokens: bool = False,
+    cascade_token_revocation: bool = True,
+    auto_approve: bool = False,
+    session_max_age: timedelta | None = None,
+    production: bool = False,
 ) -> AbstractContextManager[werkzeug.serving.BaseWSGIServer]:
     """Run a OIDC provider server on a background thread.
 
@@ -34,15 +55,57 @@ def run_server_in_thread(
     ...     print(f"Server listening at http://localhost:{server.server_port}")
     Server listening at http://localhost:25432
 
+    With ``uds`` the server listens on a Unix domain socket at that path
+    instead of a TCP port. The socket file is removed when the server stops.
+    The issuer is derived from the ``Host`` header of requests, so clients
+    choose it with the URL they request.
+
+    >>> import httpx
+    >>> import tempfile
+    >>> with (
+    ...     tempfile.TemporaryDirectory() as tmp_dir,
+    ...     run_server_in_thread(uds=f"{tmp_dir}/provider.sock"),
+    ... ):
+    ...     transport = httpx.HTTPTransport(uds=f"{tmp_dir}/provider.sock")
+    ...     with httpx.Client(transport=transport) as client:
+    ...         response = client.get("http://oidc.test/.well-known/openid-configuration")
+    ...         print(response.json()["issuer"])
+    http://oidc.test
+
+    By default, the server handles every connection on a new thread and
+    closes the connection after the response. With ``threads`` requests are
+    handled by a pool of that many threads instead and connections are kept
+    alive between requests, so clients with a connection pool like
+    ``httpx.Client`` don’t connect again for every request.
+
+    Connections that are idle for more than five seconds are closed. A client
+    that does not complete a request for that long is disconnected, so it
+    does not occupy a thread of the pool.
+
+    ``backlog`` is the number of connections the operating system queues
+    until the server accepts them.
+
     """
     return _threaded_server(
         port=port,
+        uds=uds,
+        threads=threads,
+        backlog=backlog,
         app=app(
             require_client_registration=require_client_registration,
             require_nonce=require_nonce,
             issue_refresh_token=issue_refresh_token,
             access_token_max_age=access_token_max_age,
+            authorization_code_max_age=authorization_code_max_age,
             user_claims=user_claims,
+            storage_url=storage_url,
+            signing_key_file=signing_key_file,
+            signing_key_rotation_interval=signing_key_rotation_interval,
+            jwt_access_tokens=jwt_access_tokens,
+            cascade_token_revocation=cascade_token_revocation,
+            auto_approve=auto_approve,
+            session_max_age=session_max_age,
+            production=production,
         ),
     )
 
@@ -53,22 +116,30 @@ def _threaded_server(
     *,
     host: str = "localhost",
     port: int = 0,
+    uds: str | os.PathLike[str] | None = None,
+    threads: int | None = None,
+    backlog: int | None = None,
     poll_interval: float = 0.1,
-) -> Generator[werkzeug.serving.ThreadedWSGIServer]:
-    server = werkzeug.serving.make_server(
-        host,
-        port,
-        app,
-        threaded=True,
-    )
+) -> Generator[werkzeug.serving.BaseWSGIServer]:
+    socket_path = os.path.abspath(uds) if uds is not None else None
+    address = f"unix://{socket_path}" if socket_path is not None else host
+    if threads is None:
+        server = werkzeug.serving.make_server(address, port, app, threaded=True)
+    else:
+        server = _PooledWSGIServer(address, port, app, threads=threads)
 
-    assert isinstance(server, werkzeug.serving.ThreadedWSGIServer)
+    if backlog is not None:
+        # The server already listens. Listening again changes the size of the
+        # queue.
+        server.socket.listen(backlog)
 
     def run():
         try:
             server.serve_forever(poll_interval)
         finally:
             server.server_close()
+            if socket_path is not None:
+                os.unlink(socket_path)
 
     server_thread = threading.Thread(target=run)
     server_thread.start()
@@ -86,3 +157,259 @@ def _threaded_server(
         server_thread.join(0.5)
         if server_thread.is_alive():
             raise TimeoutError("Server thread timed out")
+
+
+class _ServerHandler(wsgiref.simple_server.ServerHandler):
+    """Writes the response of a `_PooledRequestHandler`."""
+
+    http_version = "1.1"
+
+    request_handler: werkzeug.serving.WSGIRequestHandler
+    headers: wsgiref.headers.Headers | None
+    keep_alive: bool = False
+
+    def __init__(
+        self,
+        request_handler: werkzeug.serving.WSGIRequestHandler,
+        environ: "WSGIEnvironment",
+    ) -> None:
+        super().__init__(
+            environ["wsgi.input"],
+            cast("IO[bytes]", request_handler.wfile),
+            sys.stderr,
+            dict(environ),
+            multithread=True,
+        )
+        self.request_handler = request_handler
+        # Don’t add the variables of the process to the WSGI environment
+        self.os_environ = {}
+
+    @override
+    def finish_content(self) -> None:
+        super().finish_content()
+        # Without `Content-Length` the client reads the body until the
+        # connection is closed
+        assert self.headers is not None
+        self.keep_alive = "Content-Length" in self.headers
+
+
+class _PooledRequestHandler(werkzeug.serving.WSGIRequestHandler):
+    """Handles the requests on a connection of a `_PooledWSGIServer`.
+
+    Unlike the handlers of `socketserver` servers, the handler does not handle
+    requests when it is created. The server calls `handle_one_request()` for
+    every request on the connection.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # The status line, headers and body are written separately. With a
+    # buffer, they are sent together when the response is flushed.
+    wbufsize = io.DEFAULT_BUFFER_SIZE
+
+    # When the connection is closed if the client does not send a request
+    idle_deadline: float = 0
+
+    def __init__(
+        self,
+        request: socket.socket,
+        client_address: tuple[str, int] | str,
+        server: "_PooledWSGIServer",
+    ) -> None:
+        self.request = request
+        self.client_address = cast("tuple[str, int]", client_address)
+        self.server = server
+        self.close_connection = True
+        self.setup()
+        # Reading a request or writing a response that takes longer fails with
+        # `TimeoutError` and closes the connection
+        self.connection.settimeout(server.keep_alive_timeout)
+        # Unix domain sockets don’t support the TCP options
+        if request.family != socket.AF_UNIX:
+            # Send a response without waiting for the acknowledgement of the
+            # previous one
+            request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+
+    @override
+    def run_wsgi(self) -> None:
+        content_length = self.headers.get("Content-Length", "0")
+        if (
+            not content_length.isdigit()
+            or "Transfer-Encoding" in self.headers
+            or "Expect" in self.headers
+        ):
+            # Werkzeug reads chunked bodies and answers `Expect: 100-continue`
+            # and closes the connection afterwards.
+            super().run_wsgi()
+            return
+
+        # The body is read before the app handles the request so that the next
+        # request on the connection can be parsed even if the app does not
+        # read the body.
+        rfile = self.rfile
+        self.rfile = io.BytesIO(rfile.read(int(content_length)))
+        try:
+            environ = self.make_environ()
+        finally:
+            self.rfile = rfile
+
+        # Werkzeug’s handler waits for more data from the client after every
+        # response, so the response is written by `wsgiref` instead.
+        handler = _ServerHandler(self, environ)
+        handler.run(self.server.app)
+        if not handler.keep_alive:
+            self.close_connection = True
+
+    def has_buffered_request(self) -> bool:
+        """Whether the client has sent the next request and it is already
+        buffered by ``rfile``.
+        """
+        timeout = self.connection.gettimeout()
+        self.connection.setblocking(False)
+        try:
+            return bool(cast("io.BufferedReader", self.rfile).peek(1))
+        finally:
+            self.connection.settimeout(timeout)
+
+
+class _PooledWSGIServer(werkzeug.serving.BaseWSGIServer):
+    """WSGI server that handles requests on a pool of ``threads`` threads.
+
+    Connections are kept alive between requests. While a connection waits for
+    the next request, it is watched by a selector and does not occupy a thread
+    of the pool. Connections are closed when they are idle for
+    ``keep_alive_timeout`` seconds.
+    """
+
+    multithread = True
+    keep_alive_timeout: float = 5
+
+    _executor: ThreadPoolExecutor
+    _idle_selector: selectors.BaseSelector
+    _idle_thread: threading.Thread
+    # Connections to add to `_idle_selector`
+    _idle_queue: list[_PooledRequestHandler]
+    _idle_lock: threading.Lock
+    # `_wakeup_signal` wakes up the selector that waits for `_wakeup`
+    _wakeup: socket.socket
+    _wakeup_signal: socket.socket
+    _closed: bool
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        app: "WSGIApplication",
+        *,
+        threads: int,
+    ) -> None:
+        self._executor = ThreadPoolExecutor(
+            threads, thread_name_prefix="oidc-provider-mock"
+        )
+        self._idle_selector = selectors.DefaultSelector()
+        self._idle_queue = []
+        self._idle_lock = threading.Lock()
+        self._wakeup, self._wakeup_signal = socket.socketpair()
+        self._closed = False
+        super().__init__(host, port, app, handler=_PooledRequestHandler)
+        self._idle_thread = threading.Thread(target=self._watch_idle_connections)
+        self._idle_thread.start()
+
+    @override
+    def process_request(  # pyright: ignore[reportIncompatibleMethodOverride]
+        self, request: socket.socket, client_address: tuple[str, int] | str
+    ) -> None:
+        handler = _PooledRequestHandler(request, client_address, self)
+        self._executor.submit(self._handle_requests, handler)
+
+    @override
+    def server_close(self) -> None:
+        with self._idle_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup_signal.close()
+
+        super().server_close()
+        self._idle_thread.join()
+        self._executor.shutdown()
+
+    def _handle_requests(self, handler: _PooledRequestHandler) -> None:
+        """Handle the requests that the client has sent on the connection.
+
+        Afterwards, the connection is closed or waits for the next request.
+        """
+        try:
+            handler.handle_one_request()
+            while not handler.close_connection and handler.has_buffered_request():
+                handler.handle_one_request()
+        except (ConnectionError, TimeoutError):
+            handler.close_connection = True
+        except Exception:  # ruff: ignore[blind-except]
+            handler.close_connection = True
+            self.handle_error(handler.request, handler.client_address)
+
+        with self._idle_lock:
+            if not handler.close_connection and not self._closed:
+                self._idle_queue.append(handler)
+                self._wakeup_signal.send(b"\0")
+                return
+
+        self._close_connection(handler)
+
+    def _watch_idle_connections(self) -> None:
+        """Wait for requests on idle connections and hand the connections to
+        the thread pool.
+
+        Connections that don’t receive a request before their
+        ``idle_deadline`` are closed.
+        """
+        self._idle_selector.register(self._wakeup, selectors.EVENT_READ)
+        while True:
+            idle_handlers = [
+                cast("_PooledRequestHandler", key.data)
+                for key in self._idle_selector.get_map().values()
+                if key.fileobj is not self._wakeup
+            ]
+            now = time.monotonic()
+            for handler in idle_handlers:
+                if handler.idle_deadline <= now:
+                    self._idle_selector.unregister(handler.connection)
+                    self._close_connection(handler)
+
+            deadlines = [
+                handler.idle_deadline
+                for handler in idle_handlers
+                if handler.idle_deadline > now
+            ]
+            timeout = min(deadlines) - now if deadlines else None
+            for key, _ in self._idle_selector.select(timeout):
+                if key.fileobj is not self._wakeup:
+                    self._idle_selector.unregister(key.fileobj)
+                    self._executor.submit(self._handle_requests, key.data)
+                    continue
+
+                self._wakeup.recv(4096)
+                with self._idle_lock:
+                    handlers = self._idle_queue
+                    self._idle_queue = []
+                    closed = self._closed
+
+                if closed:
+                    for handler in handlers:
+                        self._close_connection(handler)
+                    for key in list(self._idle_selector.get_map().values()):
+                        if key.fileobj is not self._wakeup:
+                            self._close_connection(key.data)
+                    self._idle_selector.close()
+                    self._wakeup.close()
+                    return
+
+                for handler in handlers:
+                    handler.idle_deadline = time.monotonic() + self.keep_alive_timeout
+                    self._idle_selector.register(
+                        handler.connection, selectors.EVENT_READ, handler
+                    )
+
+    def _close_connection(self, handler: _PooledRequestHandler) -> None:
+        handler.finish()
+        self.shutdown_request(handler.request)
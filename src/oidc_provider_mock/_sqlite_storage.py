@@ -0,0 +1,757 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable, Sequence
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from ._keys import (
+    SigningAlgorithm,
+    SigningKey,
+    default_signing_key,
+    export_signing_key,
+    generate_signing_key,
+    import_signing_key,
+    signing_key_algorithm,
+)
+from ._storage import (
+    AccessToken,
+    AuthorizationCode,
+    Client,
+    ClientAllowAny,
+    RefreshToken,
+    Storage,
+    User,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signing_keys (
+    alg TEXT PRIMARY KEY,
+    jwk TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS retired_signing_keys (
+    jwk TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retired_signing_keys_expires_at
+    ON retired_signing_keys (expires_at);
+
+CREATE TABLE IF NOT EXISTS users (
+    sub TEXT PRIMARY KEY,
+    claims TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS recent_subjects (
+    sub TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    secret TEXT NOT NULL,
+    redirect_uris TEXT NOT NULL,
+    allowed_scopes TEXT NOT NULL,
+    token_endpoint_auth_method TEXT NOT NULL,
+    id_token_signed_response_alg TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS authorization_codes (
+    code TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    redirect_uri TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    nonce TEXT,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS authorization_codes_expires_at
+    ON authorization_codes (expires_at);
+
+CREATE TABLE IF NOT EXISTS access_tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT,
+    scope TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    client_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS access_tokens_user_id ON access_tokens (user_id);
+CREATE INDEX IF NOT EXISTS access_tokens_expires_at ON access_tokens (expires_at);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    client_id TEXT NOT NULL,
+    access_token TEXT NOT NULL,
+    family_id TEXT NOT NULL,
+    retired INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS refresh_tokens_user_id ON refresh_tokens (user_id);
+CREATE INDEX IF NOT EXISTS refresh_tokens_client_id ON refresh_tokens (client_id);
+CREATE INDEX IF NOT EXISTS refresh_tokens_family_id ON refresh_tokens (family_id);
+CREATE INDEX IF NOT EXISTS refresh_tokens_expires_at ON refresh_tokens (expires_at);
+
+CREATE TABLE IF NOT EXISTS revoked_access_tokens (
+    token_id TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_access_tokens_expires_at
+    ON revoked_access_tokens (expires_at);
+
+CREATE TABLE IF NOT EXISTS nonces (
+    nonce TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nonces_expires_at ON nonces (expires_at);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    sub TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+"""
+
+_RECENT_SUBJECTS_LIMIT = 20
+
+# Storing entries removes expired entries if they were last removed longer ago
+_REMOVE_EXPIRED_INTERVAL = timedelta(seconds=10)
+
+_ACCESS_TOKEN_COLUMNS = "token, user_id, scope, expires_at, client_id"
+
+_REFRESH_TOKEN_COLUMNS = (
+    "token, user_id, scope, expires_at, client_id, access_token, family_id"
+)
+
+
+class SqliteStorage(Storage):
+    """Store the provider state in an SQLite database.
+
+    Several processes can use the same database file and share the provider
+    state, including the signing keys. The database is opened in WAL mode so
+    that readers are not blocked by writers.
+
+    Every thread uses its own connection. All queries are static and
+    parameterized so that SQLite’s statement cache of the connection serves
+    them as prepared statements.
+
+    Expired entries are removed when entries are stored, at most every ten
+    seconds.
+    """
+
+    _path: str
+    _local: threading.local
+    # Time after which storing an entry removes expired entries
+    _remove_expired_at: datetime
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        jwk: SigningKey | None = None,
+    ) -> None:
+        """
+        :param path: Path of the database file.
+        :param jwk: Key to sign ID tokens with when its algorithm is used. The
+            key is stored in the database. Other algorithms use the keys stored
+            in the database. If the database has no key for an algorithm yet,
+            the key shared by all providers in the process is stored.
+        """
+        self._path = os.fspath(path)
+        self._local = threading.local()
+        self._remove_expired_at = datetime.now(UTC)
+
+        connection = self._connection()
+        with connection:
+            connection.executescript(_SCHEMA)
+
+        if jwk is not None:
+            with connection:
+                connection.execute(
+                    "INSERT INTO signing_keys (alg, jwk, created_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (alg) DO UPDATE "
+                    "SET jwk = excluded.jwk, created_at = excluded.created_at "
+                    "WHERE jwk != excluded.jwk",
+                    (
+                        signing_key_algorithm(jwk),
+                        export_signing_key(jwk),
+                        _to_timestamp(datetime.now(UTC)),
+                    ),
+                )
+
+    # Signing keys
+
+    def signing_key(self, alg: SigningAlgorithm) -> SigningKey:
+        return self._current_signing_key(alg)[0]
+
+    def signing_key_created_at(self, alg: SigningAlgorithm) -> datetime:
+        return self._current_signing_key(alg)[1]
+
+    def rotate_signing_key(
+        self,
+        alg: SigningAlgorithm,
+        expires_at: datetime,
+        *,
+        max_created_at: datetime | None = None,
+    ) -> bool:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            # Take the write lock before the key is read so that processes
+            # that find the key expired at the same time replace it once
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT created_at FROM signing_keys WHERE alg = ?", (alg,)
+            ).fetchone()
+            if (
+                max_created_at is not None
+                and row is not None
+                and _from_timestamp(row[0]) > max_created_at
+            ):
+                return False
+
+            connection.execute(
+                "INSERT OR REPLACE INTO retired_signing_keys (jwk, expires_at) "
+                "SELECT jwk, ? FROM signing_keys WHERE alg = ?",
+                (_to_timestamp(expires_at), alg),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO signing_keys (alg, jwk, created_at) "
+                "VALUES (?, ?, ?)",
+                (
+                    alg,
+                    export_signing_key(generate_signing_key(alg)),
+                    _to_timestamp(datetime.now(UTC)),
+                ),
+            )
+        return True
+
+    def retired_signing_keys(self) -> Sequence[SigningKey]:
+        rows = (
+            self
+            ._connection()
+            .execute(
+                "SELECT jwk FROM retired_signing_keys WHERE expires_at > ?",
+                (_to_timestamp(datetime.now(UTC)),),
+            )
+            .fetchall()
+        )
+        return [import_signing_key(row[0]) for row in rows]
+
+    def _current_signing_key(
+        self, alg: SigningAlgorithm
+    ) -> tuple[SigningKey, datetime]:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT jwk, created_at FROM signing_keys WHERE alg = ?", (alg,)
+        ).fetchone()
+        if row is None:
+            with connection:
+                connection.execute(
+                    "INSERT OR IGNORE INTO signing_keys (alg, jwk, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        alg,
+                        export_signing_key(default_signing_key(alg)),
+                        _to_timestamp(datetime.now(UTC)),
+                    ),
+                )
+            row = connection.execute(
+                "SELECT jwk, created_at FROM signing_keys WHERE alg = ?", (alg,)
+            ).fetchone()
+
+        jwk, created_at = row
+        return import_signing_key(jwk), _from_timestamp(created_at)
+
+    def close(self) -> None:
+        """Close the connection of the current thread."""
+
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is not None:
+            if self._local.pid == os.getpid():
+                connection.close()
+            del self._local.connection
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        # A connection must not be used after the process forks. It is left
+        # open because closing it would affect the parent process.
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=10)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    # User
+
+    def get_user(self, sub: str) -> User | None:
+        row = (
+            self
+            ._connection()
+            .execute("SELECT claims FROM users WHERE sub = ?", (sub,))
+            .fetchone()
+        )
+        if row:
+            return User(sub=sub, claims=json.loads(row[0]))
+
+    def store_user(self, user: User) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO users (sub, claims) VALUES (?, ?)",
+                (user.sub, json.dumps(user.claims)),
+            )
+
+    def get_recent_subjects(self) -> Sequence[str]:
+        rows = (
+            self
+            ._connection()
+            .execute(
+                "SELECT sub FROM recent_subjects ORDER BY rowid DESC LIMIT ?",
+                (_RECENT_SUBJECTS_LIMIT,),
+            )
+            .fetchall()
+        )
+        return [sub for (sub,) in rows]
+
+    def record_subject(self, sub: str) -> None:
+        with self._connection() as connection:
+            # Replacing the row assigns it a new, highest rowid.
+            connection.execute(
+                "INSERT OR REPLACE INTO recent_subjects (sub) VALUES (?)", (sub,)
+            )
+            connection.execute(
+                "DELETE FROM recent_subjects WHERE rowid NOT IN "
+                "(SELECT rowid FROM recent_subjects ORDER BY rowid DESC LIMIT ?)",
+                (_RECENT_SUBJECTS_LIMIT,),
+            )
+
+    # AuthorizationCodes
+
+    def get_authorization_code(self, code: str) -> AuthorizationCode | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                "SELECT code, client_id, redirect_uri, user_id, scope, nonce, "
+                "expires_at FROM authorization_codes WHERE code = ?",
+                (code,),
+            )
+            .fetchone()
+        )
+        if row:
+            return _authorization_code_from_row(row)
+
+    def store_authorization_code(self, code: AuthorizationCode) -> None:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO authorization_codes "
+                "(code, client_id, redirect_uri, user_id, scope, nonce, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    code.code,
+                    code.client_id,
+                    code.redirect_uri,
+                    code.user_id,
+                    code.scope,
+                    code.nonce,
+                    _to_timestamp(code.expires_at),
+                ),
+            )
+
+    def remove_authorization_code(self, code: str) -> AuthorizationCode | None:
+        # Reading and deleting the code in one statement guarantees that only
+        # one request can redeem it
+        with self._connection() as connection:
+            rows = connection.execute(
+                "DELETE FROM authorization_codes WHERE code = ? "
+                "RETURNING code, client_id, redirect_uri, user_id, scope, nonce, "
+                "expires_at",
+                (code,),
+            ).fetchall()
+        if rows:
+            return _authorization_code_from_row(rows[0])
+
+    # AccessTokens
+
+    def get_access_token(self, token: str) -> AccessToken | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                f"SELECT {_ACCESS_TOKEN_COLUMNS} FROM access_tokens WHERE token = ?",
+                (token,),
+            )
+            .fetchone()
+        )
+        if row:
+            return _access_token_from_row(row)
+
+    def store_access_token(self, access_token: AccessToken) -> None:
+        self.store_tokens(access_token, None)
+
+    def remove_access_token(self, access_token: str) -> AccessToken | None:
+        token = self.get_access_token(access_token)
+        if token:
+            with self._connection() as connection:
+                connection.execute(
+                    "DELETE FROM access_tokens WHERE token = ?", (access_token,)
+                )
+        return token
+
+    # RefreshTokens
+
+    def get_refresh_token(self, token: str) -> RefreshToken | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                f"SELECT {_REFRESH_TOKEN_COLUMNS} FROM refresh_tokens "
+                "WHERE token = ? AND NOT retired",
+                (token,),
+            )
+            .fetchone()
+        )
+        if row:
+            return _refresh_token_from_row(row)
+
+    def store_refresh_token(self, refresh_token: RefreshToken) -> None:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            _insert_refresh_token(connection, refresh_token)
+
+    def store_tokens(
+        self, access_token: AccessToken, refresh_token: RefreshToken | None
+    ) -> None:
+        self.store_token_batch([(access_token, refresh_token)])
+
+    def store_token_batch(
+        self, tokens: Iterable[tuple[AccessToken, RefreshToken | None]]
+    ) -> None:
+        self._remove_expired_periodically()
+        tokens = list(tokens)
+        with self._connection() as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO access_tokens ({_ACCESS_TOKEN_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        access_token.token,
+                        access_token.user_id,
+                        access_token.scope,
+                        _to_timestamp(access_token.expires_at),
+                        access_token.client_id,
+                    )
+                    for access_token, _ in tokens
+                ],
+            )
+            connection.executemany(
+                f"INSERT OR REPLACE INTO refresh_tokens ({_REFRESH_TOKEN_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    _refresh_token_row(refresh_token)
+                    for _, refresh_token in tokens
+                    if refresh_token
+                ],
+            )
+
+    def remove_refresh_token(self, token: str) -> RefreshToken | None:
+        refresh_token = self.get_refresh_token(token)
+        if refresh_token:
+            with self._connection() as connection:
+                connection.execute(
+                    "DELETE FROM refresh_tokens WHERE token = ?", (token,)
+                )
+        return refresh_token
+
+    def retire_refresh_token(self, token: str) -> RefreshToken | None:
+        refresh_token = self.get_refresh_token(token)
+        if refresh_token:
+            with self._connection() as connection:
+                connection.execute(
+                    "UPDATE refresh_tokens SET retired = 1 WHERE token = ?", (token,)
+                )
+        return refresh_token
+
+    def get_retired_refresh_token_family(self, token: str) -> str | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                "SELECT family_id FROM refresh_tokens WHERE token = ? AND retired",
+                (token,),
+            )
+            .fetchone()
+        )
+        if row:
+            return row[0]
+
+    def remove_refresh_token_family(self, family_id: str) -> Sequence[AccessToken]:
+        condition = (
+            "token IN (SELECT access_token FROM refresh_tokens "
+            "WHERE family_id = ? AND NOT retired)"
+        )
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT {_ACCESS_TOKEN_COLUMNS} FROM access_tokens WHERE {condition}",
+                (family_id,),
+            ).fetchall()
+            connection.execute(
+                f"DELETE FROM access_tokens WHERE {condition}", (family_id,)
+            )
+            connection.execute(
+                "DELETE FROM refresh_tokens WHERE family_id = ?", (family_id,)
+            )
+        return [_access_token_from_row(row) for row in rows]
+
+    def remove_user_tokens(self, user_id: str) -> Sequence[AccessToken]:
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT {_ACCESS_TOKEN_COLUMNS} FROM access_tokens WHERE user_id = ?",
+                (user_id,),
+            ).fetchall()
+            connection.execute(
+                "DELETE FROM access_tokens WHERE user_id = ?", (user_id,)
+            )
+            connection.execute(
+                "DELETE FROM refresh_tokens WHERE user_id = ? AND NOT retired",
+                (user_id,),
+            )
+        return [_access_token_from_row(row) for row in rows]
+
+    # Revoked access tokens
+
+    def revoke_access_token(self, token_id: str, expires_at: datetime) -> None:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO revoked_access_tokens (token_id, expires_at) "
+                "VALUES (?, ?)",
+                (token_id, _to_timestamp(expires_at)),
+            )
+
+    def is_access_token_revoked(self, token_id: str) -> bool:
+        row = (
+            self
+            ._connection()
+            .execute(
+                "SELECT 1 FROM revoked_access_tokens WHERE token_id = ?", (token_id,)
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    # Client
+
+    def get_client(self, id: str) -> Client | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                "SELECT secret, redirect_uris, allowed_scopes, "
+                "token_endpoint_auth_method, id_token_signed_response_alg "
+                "FROM clients WHERE id = ?",
+                (id,),
+            )
+            .fetchone()
+        )
+        if row:
+            (
+                secret,
+                redirect_uris,
+                allowed_scopes,
+                token_endpoint_auth_method,
+                id_token_signed_response_alg,
+            ) = row
+            return Client(
+                id=id,
+                secret=_decode_allow_any(secret),
+                redirect_uris=_decode_allow_any(redirect_uris),
+                allowed_scopes=json.loads(allowed_scopes),
+                token_endpoint_auth_method=_decode_allow_any(
+                    token_endpoint_auth_method
+                ),
+                id_token_signed_response_alg=id_token_signed_response_alg,
+            )
+
+    def store_client(self, client: Client) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO clients "
+                "(id, secret, redirect_uris, allowed_scopes, "
+                "token_endpoint_auth_method, id_token_signed_response_alg) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    client.id,
+                    _encode_allow_any(client.secret),
+                    _encode_allow_any(client.redirect_uris),
+                    json.dumps(client.allowed_scopes),
+                    _encode_allow_any(client.token_endpoint_auth_method),
+                    client.id_token_signed_response_alg,
+                ),
+            )
+
+    # Nonce
+
+    def add_nonce(self, nonce: str, expires_at: datetime) -> None:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO nonces (nonce, expires_at) VALUES (?, ?)",
+                (nonce, _to_timestamp(expires_at)),
+            )
+
+    def exists_nonce(self, nonce: str) -> bool:
+        row = (
+            self
+            ._connection()
+            .execute("SELECT 1 FROM nonces WHERE nonce = ?", (nonce,))
+            .fetchone()
+        )
+        return row is not None
+
+    # Sessions
+
+    def get_session(self, session_id: str) -> str | None:
+        row = (
+            self
+            ._connection()
+            .execute(
+                "SELECT sub FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, _to_timestamp(datetime.now(UTC))),
+            )
+            .fetchone()
+        )
+        if row:
+            return row[0]
+
+    def store_session(self, session_id: str, sub: str, expires_at: datetime) -> None:
+        self._remove_expired_periodically()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, sub, expires_at) "
+                "VALUES (?, ?, ?)",
+                (session_id, sub, _to_timestamp(expires_at)),
+            )
+
+    def remove_session(self, session_id: str) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+
+    # Expiry
+
+    def remove_expired(self) -> None:
+        self._remove_expired_at = datetime.now(UTC) + _REMOVE_EXPIRED_INTERVAL
+        now = _to_timestamp(datetime.now(UTC))
+        with self._connection() as connection:
+            for table in (
+                "authorization_codes",
+                "access_tokens",
+                "refresh_tokens",
+                "retired_signing_keys",
+                "revoked_access_tokens",
+                "nonces",
+                "sessions",
+            ):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE expires_at <= ?",
+                    (now,),
+                )
+
+    def _remove_expired_periodically(self) -> None:
+        # Running seven `DELETE` statements for every stored entry would cost
+        # more than storing the entry
+        if datetime.now(UTC) >= self._remove_expired_at:
+            self.remove_expired()
+
+
+def _insert_refresh_token(
+    connection: sqlite3.Connection, refresh_token: RefreshToken
+) -> None:
+    connection.execute(
+        f"INSERT OR REPLACE INTO refresh_tokens ({_REFRESH_TOKEN_COLUMNS}) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        _refresh_token_row(refresh_token),
+    )
+
+
+def _refresh_token_row(refresh_token: RefreshToken) -> tuple[object, ...]:
+    return (
+        refresh_token.token,
+        refresh_token.user_id,
+        refresh_token.scope,
+        _to_timestamp(refresh_token.expires_at),
+        refresh_token.client_id,
+        refresh_token.access_token,
+        refresh_token.family_id,
+    )
+
+
+def _authorization_code_from_row(row: Any) -> AuthorizationCode:
+    code, client_id, redirect_uri, user_id, scope, nonce, expires_at = row
+    return AuthorizationCode(
+        code=code,
+        client_id=client_id,
+        redirect_uri=redirect_uri,
+        user_id=user_id,
+        scope=scope,
+        nonce=nonce,
+        expires_at=_from_timestamp(expires_at),
+    )
+
+
+def _access_token_from_row(row: Any) -> AccessToken:
+    token, user_id, scope, expires_at, client_id = row
+    return AccessToken(
+        token=token,
+        user_id=user_id,
+        scope=scope,
+        expires_at=_from_timestamp(expires_at),
+        client_id=client_id,
+    )
+
+
+def _refresh_token_from_row(row: Any) -> RefreshToken:
+    token, user_id, scope, expires_at, client_id, access_token, family_id = row
+    return RefreshToken(
+        token=token,
+        user_id=user_id,
+        scope=scope,
+        expires_at=_from_timestamp(expires_at),
+        client_id=client_id,
+        access_token=access_token,
+        family_id=family_id,
+    )
+
+
+# Timestamps are stored as integer microseconds since the epoch so that they
+# round-trip exactly.
+_EPOCH = datetime.fromtimestamp(0, UTC)
+
+
+def _to_timestamp(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_timestamp(timestamp: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=timestamp)
+
+
+def _encode_allow_any(value: object) -> str:
+    if isinstance(value, ClientAllowAny):
+        return json.dumps(None)
+    return json.dumps(value)
+
+
+def _decode_allow_any(value: str):
+    decoded = json.loads(value)
+    if decoded is None:
+        return ClientAllowAny()
+    return decoded
@@ -0,0 +1,189 @@
+import asyncio
+import json
+from collections.abc import Coroutine, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import flask
+import httpx
+import pytest
+from faker import Faker
+
+import oidc_provider_mock
+
+faker = Faker()
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_authorization_code_flow(app: flask.Flask, threaded: bool):
+    sub = faker.email()
+
+    async def run():
+        async with _client(app, threaded=threaded) as client:
+            response = await client.post(
+                "/oauth2/authorize",
+                params={
+                    "client_id": "client",
+                    "redirect_uri": _REDIRECT_URI,
+                    "response_type": "code",
+                    "scope": "openid",
+                },
+                data={"sub": sub},
+            )
+            assert response.status_code == HTTPStatus.FOUND
+            code = parse_qs(urlparse(response.headers["location"]).query)["code"][0]
+
+            response = await client.post(
+                "/oauth2/token",
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": _REDIRECT_URI,
+                },
+                auth=("client", "secret"),
+            )
+            assert response.status_code == HTTPStatus.OK, response.text
+            access_token = response.json()["access_token"]
+
+            response = await client.get(
+                "/userinfo", headers={"Authorization": f"Bearer {access_token}"}
+            )
+            assert response.json()["sub"] == sub
+
+    _run(run())
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_streaming_response(app: flask.Flask, threaded: bool):
+    subs = [faker.email() for _ in range(200)]
+
+    async def run():
+        async with _client(app, threaded=threaded) as client:
+            response = await client.post(
+                "/tokens/mint",
+                json=[{"sub": sub, "client_id": "client"} for sub in subs],
+            )
+            assert response.status_code == HTTPStatus.OK
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            assert [line["sub"] for line in lines] == subs
+
+    _run(run())
+
+
+def test_metadata_endpoints(app: flask.Flask):
+    async def run():
+        async with _client(app) as client:
+            response = await client.get("/.well-known/openid-configuration")
+            assert response.json()["issuer"] == "http://localhost:54321"
+
+            response = await client.get(
+                "/jwks", headers={"If-None-Match": response.headers["ETag"]}
+            )
+            assert response.status_code == HTTPStatus.OK
+            assert response.json()["keys"]
+
+            response = await client.get(
+                "/jwks", headers={"If-None-Match": response.headers["ETag"]}
+            )
+            assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    _run(run())
+
+
+def test_root_path(app: flask.Flask):
+    async def run():
+        transport = httpx.ASGITransport(
+            app=oidc_provider_mock.asgi_app(app), root_path="/oidc"
+        )
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://localhost:54321"
+        ) as client:
+            response = await client.get("/oidc/.well-known/openid-configuration")
+            assert response.json()["jwks_uri"] == "http://localhost:54321/oidc/jwks"
+
+    _run(run())
+
+
+def test_lifespan(app: flask.Flask):
+    asgi_app = oidc_provider_mock.asgi_app(app)
+    received = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent: list[dict[str, Any]] = []
+
+    async def receive() -> dict[str, Any]:
+        await asyncio.sleep(0)
+        return received.pop(0)
+
+    async def send(message: MutableMapping[str, Any]):
+        await asyncio.sleep(0)
+        sent.append(dict(message))
+
+    _run(asgi_app({"type": "lifespan"}, receive, send))
+    assert sent == [
+        {"type": "lifespan.startup.complete"},
+        {"type": "lifespan.shutdown.complete"},
+    ]
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_wsgi_environ(threaded: bool):
+    app = flask.Flask(__name__)
+
+    @app.get("/")
+    def index():
+        return {
+            "cookies": flask.request.cookies,
+            "multithread": flask.request.environ["wsgi.multithread"],
+        }
+
+    async def run():
+        async with _client(app, threaded=threaded) as client:
+            response = await client.get(
+                "/", headers=[("Cookie", "a=1; b=2"), ("Cookie", "c=3")]
+            )
+            assert response.json() == {
+                "cookies": {"a": "1", "b": "2", "c": "3"},
+                "multithread": threaded,
+            }
+
+    _run(run())
+
+
+def test_write_callable():
+    app = flask.Flask(__name__)
+
+    def wsgi_app(environ: dict[str, Any], start_response: Any):
+        write = start_response("200 OK", [("Content-Type", "text/plain")])
+        write(b"Hello")
+        return [b", world"]
+
+    app.wsgi_app = wsgi_app
+
+    async def run():
+        async with _client(app) as client:
+            response = await client.get("/")
+            assert response.text == "Hello, world"
+
+    _run(run())
+
+
+def _run(coroutine: Coroutine[Any, Any, None]):
+    """Run ``coroutine`` on a new event loop in a separate thread.
+
+    `asyncio.run()` fails in the test thread if a fixture, for example from
+    Playwright, already runs an event loop there.
+    """
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(asyncio.run, coroutine).result()
+
+
+def _client(app: flask.Flask, *, threaded: bool = True) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(
+            app=oidc_provider_mock.asgi_app(app, threaded=threaded)
+        ),
+        base_url="http://localhost:54321",
+    )
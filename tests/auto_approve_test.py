@@ -0,0 +1,134 @@
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+from faker import Faker
+
+from oidc_provider_mock._storage import User
+
+from .conftest import use_provider_config
+
+faker = Faker()
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+@use_provider_config(auto_approve=True)
+def test_auto_approve_login_hint(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    state = faker.password()
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "scope": "openid",
+            "state": state,
+            "login_hint": sub,
+        },
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.location
+    assert response.location.startswith(_REDIRECT_URI)
+    query = parse_qs(urlparse(response.location).query)
+    assert query["state"] == [state]
+    assert _authorized_sub(client, query["code"][0]) == sub
+
+
+@use_provider_config(
+    auto_approve=True,
+    user_claims=[User(sub="alice", claims={}), User(sub="bob", claims={})],
+)
+def test_auto_approve_first_predefined_user(client: flask.testing.FlaskClient):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+        },
+    )
+    assert response.location
+    code = parse_qs(urlparse(response.location).query)["code"][0]
+    assert _authorized_sub(client, code) == "alice"
+
+
+@use_provider_config(auto_approve=True)
+def test_auto_approve_without_user_shows_form(client: flask.testing.FlaskClient):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.mimetype == "text/html"
+
+
+@use_provider_config(auto_approve=True, require_client_registration=True)
+def test_auto_approve_validates_client(client: flask.testing.FlaskClient):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "unknown",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "login_hint": faker.email(),
+        },
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "Error: invalid_client" in response.text
+
+
+@use_provider_config(auto_approve=True, require_nonce=True)
+def test_auto_approve_validates_nonce(client: flask.testing.FlaskClient):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "scope": "openid",
+            "login_hint": faker.email(),
+        },
+    )
+    assert response.location
+    assert parse_qs(urlparse(response.location).query)["error"] == ["invalid_request"]
+
+
+def test_login_hint_without_auto_approve_shows_form(
+    client: flask.testing.FlaskClient,
+):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": "client",
+            "redirect_uri": _REDIRECT_URI,
+            "response_type": "code",
+            "login_hint": faker.email(),
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def _authorized_sub(client: flask.testing.FlaskClient, code: str) -> str:
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": _REDIRECT_URI,
+        },
+        auth=("client", "secret"),
+    )
+    assert response.json, response.text
+
+    response = client.get(
+        "/userinfo",
+        headers={"Authorization": f"Bearer {response.json['access_token']}"},
+    )
+    assert response.json
+    return response.json["sub"]
@@ -7,6 +7,7 @@ from contextlib import contextmanager
 from pathlib import Path
 
 import httpx
+import pytest
 import yaml
 from faker import Faker
 from inline_snapshot import snapshot
@@ -30,6 +31,8 @@ Options:
   -p, --port INTEGER              Port the server listens on  [default: 9400]
   -H, --host TEXT                 IP address to bind the server to  [default:
                                   127.0.0.1]
+  --uds FILE                      Listen on a Unix domain socket at this path
+                                  instead of the host and port
   -r, --require-registration BOOLEAN
                                   Require clients to register before they can
                                   request authentication  [default: False]
@@ -47,6 +50,32 @@ Options:
                                   multiple times)
   --user-claims-file FILENAME     YAML or JSON file containing a list of
                                   predefined user claims
+  --storage-url TEXT              Store provider state in a database instead
+                                  of memory (sqlite:PATH or redis://HOST)
+  --signing-key-file FILE         PEM or JWK file with a private RSA, P-256 or
+                                  Ed25519 key to sign ID tokens with
+  --signing-key-rotation-interval INTEGER RANGE
+                                  Replace signing keys with new keys after
+                                  this many seconds  [x>=1]
+  --jwt-access-tokens             Issue JWT access tokens (RFC 9068) instead
+                                  of opaque tokens
+  --no-cascade-token-revocation   Do not revoke the access token when its
+                                  refresh token is revoked
+  --auto-approve                  Issue authorization codes without showing
+                                  the authorization form for the login_hint or
+                                  first predefined user
+  --session-max-age INTEGER RANGE
+                                  Remember the authorized user of a browser
+                                  for this many seconds and skip the
+                                  authorization form for them  [x>=1]
+  --interface [wsgi|asgi]         Serve the provider through the server’s WSGI
+                                  interface or as an ASGI app  [default: wsgi]
+  -w, --workers INTEGER RANGE     Number of server processes. Without
+                                  --storage-url the processes share the
+                                  provider state in a temporary SQLite
+                                  database  [default: 1; x>=1]
+  --production                    Disable debug mode, pretty-printed JSON and
+                                  access logs to serve more requests
   -h, --help                      Show this message and exit.
 """)
 
@@ -95,6 +124,55 @@ def test_cli():
         )
 
 
+def test_cli_workers():
+    with _running_server(["--workers", "2"]) as base_url:
+        response = httpx.post(
+            f"{base_url}/tokens/mint",
+            json=[{"sub": faker.email(), "client_id": "client"} for _ in range(20)],
+        )
+        access_tokens = [
+            json.loads(line)["access_token"] for line in response.text.splitlines()
+        ]
+
+        # Every request uses a new connection that any worker may accept
+        for access_token in access_tokens:
+            response = httpx.get(
+                f"{base_url}/userinfo",
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+            assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cli_unix_socket(tmp_path: Path, workers: int):
+    socket_path = tmp_path / "provider.sock"
+    transport = httpx.HTTPTransport(uds=str(socket_path))
+    with (
+        subprocess.Popen([
+            "oidc-provider-mock",
+            "--uds",
+            str(socket_path),
+            "--workers",
+            str(workers),
+        ]) as process,
+        httpx.Client(transport=transport, base_url="http://oidc.test") as client,
+    ):
+        try:
+            for _ in range(10):
+                if socket_path.exists():
+                    break
+                time.sleep(0.3)
+            else:
+                raise RuntimeError("Server did not start in time")
+
+            response = client.get("/.well-known/openid-configuration")
+            assert response.json()["issuer"] == "http://oidc.test"
+        finally:
+            process.terminate()
+
+    assert not socket_path.exists()
+
+
 @contextmanager
 def _running_server(args: list[str], port: int | None = None) -> Generator[str]:
     if port is None:
@@ -0,0 +1,159 @@
+from http import HTTPStatus
+
+import flask.testing
+from faker import Faker
+
+from .conftest import fetch_tokens, use_provider_config
+
+faker = Faker()
+
+
+def test_client_credentials(client: flask.testing.FlaskClient):
+    client_id = faker.uuid4()
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "client_credentials", "scope": "email"},
+        auth=(client_id, "secret"),
+    )
+    assert response.status_code == HTTPStatus.OK, response.text
+    assert response.json
+    assert response.json["token_type"] == "Bearer"
+    assert response.json["scope"] == "email"
+    assert response.json["expires_in"] == 3600
+    assert "refresh_token" not in response.json
+    assert "id_token" not in response.json
+
+    # The client is the subject of the token
+    response = client.get(
+        "/userinfo",
+        headers={"Authorization": f"Bearer {response.json['access_token']}"},
+    )
+    assert response.json == {"sub": client_id}
+
+
+def test_client_credentials_token_is_not_a_user_token(
+    client: flask.testing.FlaskClient,
+):
+    client_id = faker.uuid4()
+    # A user with the same subject as the client
+    client.put(f"/users/{client_id}", json={"email": faker.email()})
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "client_credentials", "scope": "email"},
+        auth=(client_id, "secret"),
+    )
+    assert response.json
+    access_token = response.json["access_token"]
+
+    response = client.get(
+        "/userinfo", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.json == {"sub": client_id}
+
+    client.post(f"/users/{client_id}/revoke-tokens")
+    response = client.post(
+        "/oauth2/introspect",
+        data={"token": access_token},
+        auth=("resource-server", "secret"),
+    )
+    assert response.json
+    assert response.json["active"] is True
+    assert response.json["sub"] == client_id
+
+
+def test_client_credentials_client_secret_post(client: flask.testing.FlaskClient):
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "client_credentials",
+            "client_id": faker.uuid4(),
+            "client_secret": "secret",
+        },
+    )
+    assert response.status_code == HTTPStatus.OK, response.text
+
+
+@use_provider_config(require_client_registration=True)
+def test_client_credentials_registered_client_scope(
+    client: flask.testing.FlaskClient,
+):
+    registration = client.post(
+        "/oauth2/clients",
+        json={"redirect_uris": ["https://example.com/callback"], "scope": "email"},
+    ).json
+    assert registration
+    assert "client_credentials" in registration["grant_types"]
+
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "client_credentials", "scope": "email profile"},
+        auth=(registration["client_id"], registration["client_secret"]),
+    )
+    assert response.json
+    assert response.json["scope"] == "email"
+
+
+@use_provider_config(require_client_registration=True)
+def test_client_credentials_public_client(client: flask.testing.FlaskClient):
+    registration = client.post(
+        "/oauth2/clients",
+        json={
+            "redirect_uris": ["https://example.com/callback"],
+            "token_endpoint_auth_method": "none",
+        },
+    ).json
+    assert registration
+    assert "client_credentials" not in registration["grant_types"]
+
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "client_credentials",
+            "client_id": registration["client_id"],
+        },
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json
+    assert response.json["error"] == "invalid_client"
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_client_credentials_jwt_access_token(client: flask.testing.FlaskClient):
+    client_id = faker.uuid4()
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "client_credentials"},
+        auth=(client_id, "secret"),
+    )
+    assert response.json
+
+    response = client.post(
+        "/oauth2/introspect",
+        data={"token": response.json["access_token"]},
+        auth=("resource-server", "secret"),
+    )
+    assert response.json
+    assert response.json["active"] is True
+    assert response.json["sub"] == client_id
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_jwt_access_token_of_user_with_client_id_as_subject(
+    client: flask.testing.FlaskClient,
+):
+    client_id = faker.uuid4()
+    email = faker.email()
+    client.put(f"/users/{client_id}", json={"email": email})
+    tokens = fetch_tokens(client, sub=client_id, client_id=client_id)
+
+    response = client.get(
+        "/userinfo",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.json == {"sub": client_id, "email": email}
+
+
+def test_discovery_advertises_client_credentials(client: flask.testing.FlaskClient):
+    response = client.get("/.well-known/openid-configuration")
+    assert response.json
+    assert "client_credentials" in response.json["grant_types_supported"]
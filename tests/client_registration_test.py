@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 import httpx
+import joserfc.jws
 import pytest
 from authlib.integrations.base_client import OAuthError
 from faker import Faker
@@ -131,3 +132,41 @@ def test_unregistered_auth_method_rejected(oidc_server: str):
     response = httpx.post(auth_url, data={"sub": faker.email()})
     with pytest.raises(OAuthError, match="invalid_client: "):
         client.fetch_token(response.headers["location"], state=state)
+
+
+@pytest.mark.parametrize("alg", ["RS256", "ES256", "EdDSA"])
+def test_id_token_signed_response_alg(oidc_server: str, alg: str):
+    redirect_uri = faker.uri(schemes=["https"])
+    registration = httpx.post(
+        f"{oidc_server}/oauth2/clients",
+        json={"redirect_uris": [redirect_uri], "id_token_signed_response_alg": alg},
+    ).json()
+    assert registration["id_token_signed_response_alg"] == alg
+
+    client = OidcClient(
+        id=registration["client_id"],
+        secret=registration["client_secret"],
+        redirect_uri=redirect_uri,
+        issuer=oidc_server,
+    )
+    state = faker.password()
+    subject = faker.email()
+    response = httpx.post(client.authorization_url(state=state), data={"sub": subject})
+    # The client verifies the signature with the provider’s key set
+    token_data = client.fetch_token(response.headers["location"], state=state)
+    assert token_data.claims["sub"] == subject
+
+    id_token = client._authlib_client.token["id_token"]  # type: ignore[index]
+    assert isinstance(id_token, str)
+    assert joserfc.jws.extract_compact(id_token.encode()).protected["alg"] == alg
+
+
+def test_unsupported_id_token_signed_response_alg(oidc_server: str):
+    response = httpx.post(
+        f"{oidc_server}/oauth2/clients",
+        json={
+            "redirect_uris": [faker.uri(schemes=["https"])],
+            "id_token_signed_response_alg": "HS256",
+        },
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
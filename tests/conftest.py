@@ -7,8 +7,10 @@ from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Any, TypeVar, cast
+from urllib.parse import parse_qs, urlparse
 
 import flask
+import flask.testing
 import pytest
 import typeguard
 import werkzeug.serving
@@ -50,7 +52,16 @@ def use_provider_config(
     require_nonce: bool = False,
     issue_refresh_token: bool = True,
     access_token_max_age: timedelta = timedelta(hours=1),
+    authorization_code_max_age: timedelta = timedelta(minutes=10),
     user_claims: Sequence[User] = (),
+    storage_url: str | None = None,
+    signing_key_file: str | None = None,
+    signing_key_rotation_interval: timedelta | None = None,
+    jwt_access_tokens: bool = False,
+    cascade_token_revocation: bool = True,
+    auto_approve: bool = False,
+    session_max_age: timedelta | None = None,
+    production: bool = False,
 ) -> Callable[[_C], _C]:
     """Set configuration for the app under test."""
 
@@ -60,7 +71,16 @@ def use_provider_config(
             require_nonce=require_nonce,
             issue_refresh_token=issue_refresh_token,
             access_token_max_age=access_token_max_age,
+            authorization_code_max_age=authorization_code_max_age,
             user_claims=user_claims,
+            storage_url=storage_url,
+            signing_key_file=signing_key_file,
+            signing_key_rotation_interval=signing_key_rotation_interval,
+            jwt_access_tokens=jwt_access_tokens,
+            cascade_token_revocation=cascade_token_revocation,
+            auto_approve=auto_approve,
+            session_max_age=session_max_age,
+            production=production,
         ),
     )
 
@@ -117,3 +137,37 @@ def fake_client(
         scope=scope,
         auth_method=auth_method,
     )
+
+
+def fetch_tokens(
+    client: flask.testing.FlaskClient,
+    *,
+    sub: str | None = None,
+    client_id: str = "client",
+    redirect_uri: str = "https://example.com/callback",
+) -> dict[str, str]:
+    """Obtain tokens from the test ``client`` with the authorization code flow."""
+    response = client.post(
+        "/oauth2/authorize",
+        query_string={
+            "client_id": client_id,
+            "redirect_uri": redirect_uri,
+            "response_type": "code",
+            "scope": "openid email",
+        },
+        data={"sub": _faker.email() if sub is None else sub},
+    )
+    assert response.location
+    code = parse_qs(urlparse(response.location).query)["code"][0]
+
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+        },
+        auth=(client_id, "secret"),
+    )
+    assert response.json, response.text
+    return response.json
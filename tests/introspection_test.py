@@ -0,0 +1,243 @@
+from datetime import timedelta
+from http import HTTPStatus
+from pathlib import Path
+
+import flask.testing
+from faker import Faker
+from freezegun import freeze_time
+
+import oidc_provider_mock
+
+from .conftest import fetch_tokens, use_provider_config
+
+faker = Faker()
+
+
+def test_introspect_access_token(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    tokens = fetch_tokens(client, sub=sub)
+
+    result = _introspect(client, tokens["access_token"])
+    assert result == {
+        "active": True,
+        "token_type": "Bearer",
+        "scope": "openid email",
+        "sub": sub,
+        "exp": result["exp"],
+    }
+
+
+def test_introspect_refresh_token(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    tokens = fetch_tokens(client, sub=sub, client_id="the-client")
+
+    result = _introspect(client, tokens["refresh_token"], "refresh_token")
+    assert result["active"] is True
+    assert result["sub"] == sub
+    assert result["client_id"] == "the-client"
+
+
+def test_introspect_unknown_token(client: flask.testing.FlaskClient):
+    assert _introspect(client, faker.password()) == {"active": False}
+
+
+def test_introspect_requires_client_authentication(client: flask.testing.FlaskClient):
+    response = client.post("/oauth2/introspect", data={"token": faker.password()})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json
+    assert response.json["error"] == "invalid_client"
+
+
+def test_introspect_revoked_tokens(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    tokens = fetch_tokens(client, sub=sub)
+    # Cache the introspection results
+    assert _introspect(client, tokens["access_token"])["active"]
+    assert _introspect(client, tokens["refresh_token"])["active"]
+
+    client.post(f"/users/{sub}/revoke-tokens")
+
+    assert _introspect(client, tokens["access_token"]) == {"active": False}
+    assert _introspect(client, tokens["refresh_token"]) == {"active": False}
+
+
+def test_introspect_refreshed_tokens(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+    assert _introspect(client, tokens["access_token"])["active"]
+
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "refresh_token", "refresh_token": tokens["refresh_token"]},
+        auth=("client", "secret"),
+    )
+    assert response.json
+    new_access_token = response.json["access_token"]
+
+    assert _introspect(client, tokens["access_token"]) == {"active": False}
+    assert _introspect(client, tokens["refresh_token"]) == {"active": False}
+    assert _introspect(client, new_access_token)["active"]
+
+
+@use_provider_config(access_token_max_age=timedelta(minutes=5))
+def test_introspect_expired_token(client: flask.testing.FlaskClient):
+    with freeze_time(faker.date_time(), tick=True) as frozen_datetime:
+        tokens = fetch_tokens(client)
+        assert _introspect(client, tokens["access_token"])["active"]
+
+        frozen_datetime.tick(timedelta(minutes=6))
+        assert _introspect(client, tokens["access_token"]) == {"active": False}
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_introspect_jwt_access_token(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    tokens = fetch_tokens(client, sub=sub)
+
+    result = _introspect(client, tokens["access_token"])
+    assert result["active"] is True
+    assert result["sub"] == sub
+
+    client.post(f"/users/{sub}/revoke-tokens")
+    assert _introspect(client, tokens["access_token"]) == {"active": False}
+
+
+def test_introspect_with_shared_storage(tmp_path: Path):
+    storage_url = f"sqlite:{tmp_path / 'provider.db'}"
+    first, second = (
+        _test_client(oidc_provider_mock.app(storage_url=storage_url)) for _ in range(2)
+    )
+    sub = faker.email()
+    tokens = fetch_tokens(first, sub=sub)
+    assert _introspect(first, tokens["access_token"])["active"]
+
+    # Results are not cached, so revocations by other providers take effect.
+    second.post(f"/users/{sub}/revoke-tokens")
+    assert _introspect(first, tokens["access_token"]) == {"active": False}
+
+
+def test_discovery_advertises_introspection_endpoint(
+    client: flask.testing.FlaskClient,
+):
+    response = client.get("/.well-known/openid-configuration")
+    assert response.json
+    assert (
+        response.json["introspection_endpoint"]
+        == "http://localhost:54321/oauth2/introspect"
+    )
+
+
+def test_introspect_batch(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    tokens = fetch_tokens(client, sub=sub)
+
+    response = client.post(
+        "/oauth2/introspect/batch",
+        json=[tokens["access_token"], faker.password(), tokens["refresh_token"]],
+        auth=("resource-server", "secret"),
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json
+    assert response.json[0]["sub"] == sub
+    assert response.json == [
+        _introspect(client, tokens["access_token"]),
+        {"active": False},
+        _introspect(client, tokens["refresh_token"]),
+    ]
+
+
+@use_provider_config(require_client_registration=True)
+def test_introspect_batch_public_client(client: flask.testing.FlaskClient):
+    registration = client.post(
+        "/oauth2/clients",
+        json={
+            "redirect_uris": ["https://example.com/callback"],
+            "token_endpoint_auth_method": "none",
+        },
+    ).json
+    assert registration
+
+    response = client.post(
+        "/oauth2/introspect/batch",
+        query_string={"client_id": registration["client_id"]},
+        json=[faker.password()],
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == [{"active": False}]
+
+
+def test_introspect_batch_requires_client_authentication(
+    client: flask.testing.FlaskClient,
+):
+    response = client.post("/oauth2/introspect/batch", json=[faker.password()])
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json
+    assert response.json["error"] == "invalid_client"
+
+
+def test_introspect_batch_too_large(client: flask.testing.FlaskClient):
+    response = client.post(
+        "/oauth2/introspect/batch",
+        json=[faker.password() for _ in range(101)],
+        auth=("resource-server", "secret"),
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_userinfo_batch(client: flask.testing.FlaskClient):
+    first_sub, second_sub = faker.email(), faker.email()
+    client.put(f"/users/{first_sub}", json={"email": first_sub, "nickname": "first"})
+    first_tokens = fetch_tokens(client, sub=first_sub)
+    second_tokens = fetch_tokens(client, sub=second_sub)
+
+    response = client.post(
+        "/userinfo/batch",
+        json=[
+            first_tokens["access_token"],
+            faker.password(),
+            second_tokens["access_token"],
+        ],
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == [
+        # Only the claims for the token scope are included
+        {"sub": first_sub, "email": first_sub},
+        {"error": "invalid_token"},
+        {"sub": second_sub, "email": second_sub},
+    ]
+
+
+@use_provider_config(access_token_max_age=timedelta(minutes=5))
+def test_userinfo_batch_expired_token(client: flask.testing.FlaskClient):
+    with freeze_time(faker.date_time(), tick=True) as frozen_datetime:
+        tokens = fetch_tokens(client)
+        frozen_datetime.tick(timedelta(minutes=6))
+        response = client.post("/userinfo/batch", json=[tokens["access_token"]])
+        assert response.json == [{"error": "invalid_token"}]
+
+
+def test_userinfo_batch_too_large(client: flask.testing.FlaskClient):
+    response = client.post(
+        "/userinfo/batch", json=[faker.password() for _ in range(101)]
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "at most 100 items" in response.text
+
+
+def _test_client(app: flask.Flask) -> flask.testing.FlaskClient:
+    # Include the port so that authlib does not complain about insecure URLs
+    app.config["SERVER_NAME"] = "localhost:54321"
+    return app.test_client()
+
+
+def _introspect(
+    client: flask.testing.FlaskClient, token: str, token_type_hint: str | None = None
+) -> dict[str, object]:
+    data = {"token": token}
+    if token_type_hint:
+        data["token_type_hint"] = token_type_hint
+    response = client.post(
+        "/oauth2/introspect", data=data, auth=("resource-server", "secret")
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json is not None
+    return response.json
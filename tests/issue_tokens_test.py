@@ -0,0 +1,157 @@
+import json
+from http import HTTPStatus
+
+import flask
+import flask.testing
+import httpx
+import joserfc.jwk
+import joserfc.jws
+import joserfc.jwt
+import pytest
+from faker import Faker
+
+import oidc_provider_mock
+from oidc_provider_mock import User
+
+from .conftest import use_provider_config
+
+faker = Faker()
+
+
+def test_issue_tokens(app: flask.Flask, client: flask.testing.FlaskClient):
+    sub = faker.email()
+    nonce = faker.password()
+    tokens = oidc_provider_mock.issue_tokens(
+        app,
+        User(sub=sub, claims={"name": "Alice", "email": sub}),
+        scope="openid profile",
+        nonce=nonce,
+    )
+
+    assert tokens.scope == "openid profile"
+    assert tokens.expires_in == 3600
+    response = client.get(
+        "/userinfo", headers={"Authorization": f"Bearer {tokens.access_token}"}
+    )
+    assert response.json == {"sub": sub, "name": "Alice"}
+
+    assert tokens.id_token
+    claims = _id_token_claims(client, tokens.id_token)
+    assert claims["sub"] == sub
+    assert claims["aud"] == ["client"]
+    assert claims["iss"] == "http://localhost:54321"
+    assert claims["nonce"] == nonce
+    assert claims["name"] == "Alice"
+
+    assert tokens.refresh_token
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "refresh_token", "refresh_token": tokens.refresh_token},
+        auth=("client", "secret"),
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_issue_tokens_for_subject(app: flask.Flask, client: flask.testing.FlaskClient):
+    sub = faker.email()
+    client.put(f"/users/{sub}", json={"email": sub, "nickname": "al"})
+
+    tokens = oidc_provider_mock.issue_tokens(app, sub, scope="openid email")
+
+    assert tokens.id_token
+    claims = _id_token_claims(client, tokens.id_token)
+    assert claims["email"] == sub
+    # Not included in the `email` scope
+    assert "nickname" not in claims
+
+
+def test_issue_tokens_without_openid_scope(app: flask.Flask):
+    tokens = oidc_provider_mock.issue_tokens(app, faker.email(), scope="email")
+    assert tokens.id_token is None
+
+
+@use_provider_config(issue_refresh_token=False)
+def test_issue_tokens_without_refresh_token(app: flask.Flask):
+    tokens = oidc_provider_mock.issue_tokens(app, faker.email())
+    assert tokens.refresh_token is None
+
+
+def test_issue_tokens_running_server():
+    with oidc_provider_mock.run_server_in_thread() as server:
+        base_url = f"http://localhost:{server.server_port}"
+        assert isinstance(server.app, flask.Flask)
+        sub = faker.email()
+        tokens = oidc_provider_mock.issue_tokens(server.app, sub, base_url=base_url)
+
+        response = httpx.get(
+            f"{base_url}/userinfo",
+            headers={"Authorization": f"Bearer {tokens.access_token}"},
+        )
+        assert response.json()["sub"] == sub
+
+        assert tokens.id_token
+        claims = json.loads(
+            joserfc.jws.extract_compact(tokens.id_token.encode()).payload
+        )
+        assert claims["iss"] == base_url
+
+
+@use_provider_config(require_client_registration=True)
+def test_issue_tokens_unknown_client(app: flask.Flask):
+    with pytest.raises(ValueError, match="Unknown client unknown"):
+        oidc_provider_mock.issue_tokens(app, faker.email(), client_id="unknown")
+
+
+def test_issue_tokens_without_provider():
+    with pytest.raises(ValueError, match="has not been added to the app"):
+        oidc_provider_mock.issue_tokens(flask.Flask(__name__), faker.email())
+
+
+def test_create_authorization_code(app: flask.Flask, client: flask.testing.FlaskClient):
+    sub = faker.email()
+    redirect_uri = faker.uri(schemes=["https"])
+    nonce = faker.password()
+    code = oidc_provider_mock.create_authorization_code(
+        app, sub, redirect_uri=redirect_uri, nonce=nonce
+    )
+
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+        },
+        auth=("client", "secret"),
+    )
+    assert response.json, response.text
+    claims = _id_token_claims(client, response.json["id_token"])
+    assert claims["sub"] == sub
+    assert claims["nonce"] == nonce
+
+
+@use_provider_config(require_client_registration=True)
+def test_create_authorization_code_invalid_redirect_uri(
+    app: flask.Flask, client: flask.testing.FlaskClient
+):
+    response = client.post(
+        "/oauth2/clients", json={"redirect_uris": ["https://example.com/callback"]}
+    )
+    assert response.json
+
+    with pytest.raises(ValueError, match="not allowed for client"):
+        oidc_provider_mock.create_authorization_code(
+            app,
+            faker.email(),
+            client_id=response.json["client_id"],
+            redirect_uri="https://example.com/other",
+        )
+
+
+def _id_token_claims(
+    client: flask.testing.FlaskClient, id_token: str
+) -> dict[str, object]:
+    response = client.get("/jwks")
+    assert response.json
+    keys = joserfc.jwk.KeySet.import_key_set(response.json)
+    return joserfc.jwt.decode(id_token, keys, algorithms=["RS256"]).claims
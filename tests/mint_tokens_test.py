@@ -0,0 +1,171 @@
+import json
+import warnings
+from http import HTTPStatus
+from pathlib import Path
+
+import flask.testing
+import joserfc.errors
+import joserfc.jwk
+import joserfc.jwt
+import pytest
+from faker import Faker
+
+import oidc_provider_mock
+
+from .conftest import use_provider_config
+
+faker = Faker()
+
+
+def test_mint_tokens(client: flask.testing.FlaskClient):
+    subs = [faker.email() for _ in range(3)]
+    client.put(f"/users/{subs[0]}", json={"email": subs[0], "name": "Alice"})
+
+    lines = _mint(
+        client,
+        [
+            {"sub": sub, "client_id": "client", "scope": "openid profile"}
+            for sub in subs
+        ],
+    )
+
+    assert [line["sub"] for line in lines] == subs
+    for line in lines:
+        assert line["client_id"] == "client"
+        assert line["token_type"] == "Bearer"
+        assert line["scope"] == "openid profile"
+        assert line["expires_in"] == 3600
+
+        response = client.get(
+            "/userinfo", headers={"Authorization": f"Bearer {line['access_token']}"}
+        )
+        assert response.json
+        assert response.json["sub"] == line["sub"]
+
+        response = client.post(
+            "/oauth2/token",
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": line["refresh_token"],
+            },
+            auth=("client", "secret"),
+        )
+        assert response.status_code == HTTPStatus.OK
+
+    claims = _id_token_claims(client, lines[0]["id_token"])
+    assert claims["sub"] == subs[0]
+    assert claims["aud"] == ["client"]
+    assert claims["iss"] == "http://localhost:54321"
+    assert claims["name"] == "Alice"
+    assert "nonce" not in claims
+
+
+def test_mint_tokens_nonce(client: flask.testing.FlaskClient):
+    nonce = faker.password()
+    [line] = _mint(
+        client, [{"sub": faker.email(), "client_id": "client", "nonce": nonce}]
+    )
+
+    assert _id_token_claims(client, line["id_token"])["nonce"] == nonce
+
+
+def test_mint_tokens_without_openid_scope(client: flask.testing.FlaskClient):
+    [line] = _mint(
+        client, [{"sub": faker.email(), "client_id": "client", "scope": "email"}]
+    )
+
+    assert "id_token" not in line
+    assert line["access_token"]
+
+
+@pytest.mark.parametrize("alg", ["ES256", "EdDSA"])
+def test_mint_tokens_client_signing_alg(client: flask.testing.FlaskClient, alg: str):
+    response = client.post(
+        "/oauth2/clients",
+        json={
+            "redirect_uris": ["https://example.com/callback"],
+            "id_token_signed_response_alg": alg,
+        },
+    )
+    assert response.json
+    client_id = response.json["client_id"]
+
+    [line] = _mint(client, [{"sub": faker.email(), "client_id": client_id}])
+
+    assert _id_token_claims(client, line["id_token"], alg)["aud"] == [client_id]
+
+
+@use_provider_config(issue_refresh_token=False)
+def test_mint_tokens_without_refresh_token(client: flask.testing.FlaskClient):
+    [line] = _mint(client, [{"sub": faker.email(), "client_id": "client"}])
+    assert "refresh_token" not in line
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_mint_jwt_access_tokens(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    [line] = _mint(client, [{"sub": sub, "client_id": "client"}])
+
+    response = client.get(
+        "/userinfo", headers={"Authorization": f"Bearer {line['access_token']}"}
+    )
+    assert response.json
+    assert response.json["sub"] == sub
+
+
+@use_provider_config(require_client_registration=True)
+def test_mint_tokens_unknown_client(client: flask.testing.FlaskClient):
+    response = client.post(
+        "/tokens/mint", json=[{"sub": faker.email(), "client_id": "unknown"}]
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.text == "Unknown client unknown"
+
+
+def test_mint_tokens_invalid_body(client: flask.testing.FlaskClient):
+    response = client.post("/tokens/mint", json=[{"sub": faker.email()}])
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert "[0].client_id" in response.text
+
+
+def test_mint_tokens_sqlite_storage(tmp_path: Path):
+    app = oidc_provider_mock.app(storage_url=f"sqlite:{tmp_path / 'provider.db'}")
+    app.config["SERVER_NAME"] = "localhost:54321"
+    client = app.test_client()
+
+    # More tokens than are written to the storage at once
+    lines = _mint(
+        client, [{"sub": faker.email(), "client_id": "client"} for _ in range(501)]
+    )
+
+    assert len(lines) == 501
+    response = client.get(
+        "/userinfo", headers={"Authorization": f"Bearer {lines[-1]['access_token']}"}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def _mint(
+    client: flask.testing.FlaskClient, body: list[dict[str, str]]
+) -> list[dict[str, str]]:
+    response = client.post("/tokens/mint", json=body)
+    assert response.status_code == HTTPStatus.OK, response.text
+    assert response.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _jwks(client: flask.testing.FlaskClient) -> joserfc.jwk.KeySet:
+    response = client.get("/jwks")
+    assert response.json
+    return joserfc.jwk.KeySet.import_key_set(response.json)
+
+
+def _id_token_claims(
+    client: flask.testing.FlaskClient, id_token: str, alg: str = "RS256"
+) -> dict[str, object]:
+    with warnings.catch_warnings():
+        # Allow `EdDSA` which joserfc deprecates in favor of `Ed25519`
+        warnings.simplefilter("ignore", joserfc.errors.SecurityWarning)
+        token = joserfc.jwt.decode(id_token, _jwks(client), algorithms=[alg])
+    assert token.header["alg"] == alg
+    return token.claims
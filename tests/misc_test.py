@@ -1,8 +1,13 @@
 import inspect
+import socket
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from pathlib import Path
 
 import flask.testing
+import httpcore
+import httpx
 import pytest
 
 import oidc_provider_mock
@@ -63,6 +68,48 @@ def test_openid_configuration_uses_forwarded_headers(
     )
 
 
+@pytest.mark.parametrize("path", ["/.well-known/openid-configuration", "/jwks"])
+def test_metadata_conditional_request(client: flask.testing.FlaskClient, path: str):
+    response = client.get(path)
+    assert response.status_code == HTTPStatus.OK
+    assert response.cache_control.max_age
+    etag = response.headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.data == b""
+
+    response = client.get(path, headers={"If-None-Match": '"other"'})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_jwks_etag_changes_on_rotation(client: flask.testing.FlaskClient):
+    response = client.get("/jwks")
+    etag = response.headers["ETag"]
+
+    client.post("/signing-keys/rotate", query_string={"alg": "ES256"})
+
+    response = client.get("/jwks", headers={"If-None-Match": etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+    assert response.json
+    assert len(response.json["keys"]) == 4
+
+
+def test_openid_configuration_cached_per_host(client: flask.testing.FlaskClient):
+    first = client.get(
+        "/.well-known/openid-configuration", base_url="http://first.example.com"
+    )
+    second = client.get(
+        "/.well-known/openid-configuration", base_url="http://second.example.com"
+    )
+    assert first.json
+    assert first.json["issuer"] == "http://first.example.com"
+    assert second.json
+    assert second.json["issuer"] == "http://second.example.com"
+    assert first.headers["ETag"] != second.headers["ETag"]
+
+
 def test_userinfo_unauthorized(client: flask.testing.FlaskClient):
     response = client.get("/userinfo")
     assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -81,9 +128,27 @@ def test_userinfo_unauthorized(client: flask.testing.FlaskClient):
     assert response.json["error"] == "access_denied"
 
 
+def test_debug_mode(app: flask.Flask, client: flask.testing.FlaskClient):
+    assert app.debug
+    response = client.post("/oauth2/clients", json={"redirect_uris": ["https://a"]})
+    assert "\n  " in response.text
+
+
+@use_provider_config(production=True)
+def test_production_mode(app: flask.Flask, client: flask.testing.FlaskClient):
+    assert not app.debug
+    response = client.post("/oauth2/clients", json={"redirect_uris": ["https://a"]})
+    assert response.status_code == HTTPStatus.CREATED
+    assert "\n" not in response.text.strip()
+
+
 def test_consistent_kwargs():
     """Check that kwargs for configuring the provider are consistent across all APIs"""
 
+    # Parameters of `run_server_in_thread` that configure the server instead of
+    # the provider
+    server_params = {"uds", "threads", "backlog"}
+
     def kw_only_params(obj: Callable[..., object]):
         signature = inspect.signature(obj)
 
@@ -91,7 +156,7 @@ def test_consistent_kwargs():
             (k, v.annotation, v.default)
             for k, v in signature.parameters.items()
             if v.kind
-            if v.kind == inspect.Parameter.KEYWORD_ONLY
+            if v.kind == inspect.Parameter.KEYWORD_ONLY and k not in server_params
         )
 
     expected_params = kw_only_params(oidc_provider_mock._app.Config)
@@ -99,3 +164,70 @@ def test_consistent_kwargs():
     assert kw_only_params(oidc_provider_mock.init_app) == expected_params
     assert kw_only_params(oidc_provider_mock.run_server_in_thread) == expected_params
     assert kw_only_params(use_provider_config) == expected_params
+
+
+@pytest.mark.parametrize("threads", [None, 2])
+def test_run_server_in_thread_unix_socket(tmp_path: Path, threads: int | None):
+    socket_path = tmp_path / "provider.sock"
+    with oidc_provider_mock.run_server_in_thread(uds=socket_path, threads=threads):
+        transport = httpx.HTTPTransport(uds=str(socket_path))
+        with httpx.Client(transport=transport, base_url="http://oidc.test") as client:
+            response = client.get("/.well-known/openid-configuration")
+            assert response.json()["issuer"] == "http://oidc.test"
+            assert response.json()["jwks_uri"] == "http://oidc.test/jwks"
+
+    assert not socket_path.exists()
+
+
+def test_run_server_in_thread_pool():
+    with (
+        oidc_provider_mock.run_server_in_thread(threads=2, backlog=16) as server,
+        httpx.Client(base_url=f"http://localhost:{server.server_port}") as client,
+    ):
+
+        def request(_: int) -> httpx.Response:
+            return client.get("/.well-known/openid-configuration")
+
+        # More concurrent requests than threads
+        with ThreadPoolExecutor(4) as executor:
+            responses = list(executor.map(request, range(20)))
+
+        for response in responses:
+            assert response.status_code == HTTPStatus.OK
+
+        # The app does not read the body of the request
+        first = client.post("/signing-keys/rotate", content=b"ignored" * 1000)
+        assert first.status_code == HTTPStatus.NO_CONTENT
+        second = client.get("/jwks")
+        assert second.status_code == HTTPStatus.OK
+
+        # Both requests use the same connection
+        assert _client_address(first) == _client_address(second)
+
+        # The server stops although the client keeps its connections open
+
+
+def test_run_server_in_thread_pool_keep_alive_timeout(monkeypatch: pytest.MonkeyPatch):
+    with oidc_provider_mock.run_server_in_thread(threads=1) as server:
+        monkeypatch.setattr(server, "keep_alive_timeout", 0.2)
+        address = ("localhost", server.server_port)
+
+        with socket.create_connection(address, timeout=5) as slow_client:
+            # The incomplete request occupies the only thread until it times out
+            slow_client.sendall(b"GET /jwks HTTP/1.1\r\n")
+
+            with socket.create_connection(address, timeout=5) as idle_client:
+                idle_client.sendall(b"GET /jwks HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                # The server closes the idle connection after the response
+                response = b""
+                while chunk := idle_client.recv(4096):
+                    response += chunk
+                assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+
+            assert slow_client.recv(4096) == b""
+
+
+def _client_address(response: httpx.Response) -> object:
+    stream = response.extensions["network_stream"]
+    assert isinstance(stream, httpcore.NetworkStream)
+    return stream.get_extra_info("client_addr")
@@ -0,0 +1,140 @@
+from http import HTTPStatus
+
+import flask.testing
+from faker import Faker
+
+from .conftest import fetch_tokens, use_provider_config
+
+faker = Faker()
+
+
+def test_revoke_access_token(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+    assert _is_access_token_valid(client, tokens["access_token"])
+
+    _revoke(client, tokens["access_token"])
+
+    assert not _is_access_token_valid(client, tokens["access_token"])
+    # The refresh token is still valid
+    assert _refresh(client, tokens["refresh_token"]) == HTTPStatus.OK
+
+
+def test_revoke_refresh_token(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+
+    _revoke(client, tokens["refresh_token"], "refresh_token")
+
+    assert _refresh(client, tokens["refresh_token"]) == HTTPStatus.BAD_REQUEST
+    assert not _is_access_token_valid(client, tokens["access_token"])
+
+
+@use_provider_config(cascade_token_revocation=False)
+def test_revoke_refresh_token_without_cascade(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+
+    _revoke(client, tokens["refresh_token"])
+
+    assert _refresh(client, tokens["refresh_token"]) == HTTPStatus.BAD_REQUEST
+    assert _is_access_token_valid(client, tokens["access_token"])
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_revoke_jwt_access_token(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+
+    _revoke(client, tokens["access_token"])
+
+    assert not _is_access_token_valid(client, tokens["access_token"])
+
+
+def test_revoke_refresh_token_of_other_client(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client, client_id="client")
+
+    response = client.post(
+        "/oauth2/revoke",
+        data={"token": tokens["refresh_token"]},
+        auth=("other-client", "secret"),
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json
+    assert response.json["error"] == "invalid_grant"
+    assert _refresh(client, tokens["refresh_token"]) == HTTPStatus.OK
+
+
+def test_revoke_access_token_of_other_client(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client, client_id="client")
+
+    response = client.post(
+        "/oauth2/revoke",
+        data={"token": tokens["access_token"]},
+        auth=("other-client", "secret"),
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json
+    assert response.json["error"] == "invalid_grant"
+    assert _is_access_token_valid(client, tokens["access_token"])
+
+
+def test_revoke_unknown_token(client: flask.testing.FlaskClient):
+    # Invalid tokens do not cause an error response, see RFC 7009, Section 2.2
+    _revoke(client, faker.password())
+
+
+def test_revoke_with_client_secret_post(client: flask.testing.FlaskClient):
+    tokens = fetch_tokens(client)
+
+    response = client.post(
+        "/oauth2/revoke",
+        data={
+            "token": tokens["access_token"],
+            "client_id": "client",
+            "client_secret": "secret",
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert not _is_access_token_valid(client, tokens["access_token"])
+
+
+def test_revoke_requires_client_authentication(client: flask.testing.FlaskClient):
+    response = client.post("/oauth2/revoke", data={"token": faker.password()})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json
+    assert response.json["error"] == "invalid_client"
+
+
+def test_discovery_advertises_revocation_endpoint(
+    client: flask.testing.FlaskClient,
+):
+    response = client.get("/.well-known/openid-configuration")
+    assert response.json
+    assert (
+        response.json["revocation_endpoint"] == "http://localhost:54321/oauth2/revoke"
+    )
+
+
+def _revoke(
+    client: flask.testing.FlaskClient, token: str, token_type_hint: str | None = None
+):
+    data = {"token": token}
+    if token_type_hint:
+        data["token_type_hint"] = token_type_hint
+    response = client.post("/oauth2/revoke", data=data, auth=("client", "secret"))
+    assert response.status_code == HTTPStatus.OK, response.text
+
+
+def _is_access_token_valid(
+    client: flask.testing.FlaskClient, access_token: str
+) -> bool:
+    response = client.get(
+        "/userinfo", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    return response.status_code == HTTPStatus.OK
+
+
+def _refresh(client: flask.testing.FlaskClient, refresh_token: str) -> int:
+    response = client.post(
+        "/oauth2/token",
+        data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+        auth=("client", "secret"),
+    )
+    return response.status_code
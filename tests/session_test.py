@@ -0,0 +1,149 @@
+from datetime import timedelta
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import flask.testing
+from faker import Faker
+
+from .conftest import use_provider_config
+
+faker = Faker()
+
+_REDIRECT_URI = "https://example.com/callback"
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_repeat_authorization(client: flask.testing.FlaskClient):
+    sub = faker.email()
+    response = client.post(
+        "/oauth2/authorize",
+        query_string=_authorize_query(),
+        data={"sub": sub},
+    )
+    assert response.status_code == HTTPStatus.FOUND
+
+    response = client.get("/oauth2/authorize", query_string=_authorize_query())
+    assert response.status_code == HTTPStatus.FOUND
+    assert _authorized_sub(client, response.location) == sub
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_prompt_none(client: flask.testing.FlaskClient):
+    state = faker.password()
+    response = client.get(
+        "/oauth2/authorize", query_string=_authorize_query(prompt="none", state=state)
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.location
+    query = parse_qs(urlparse(response.location).query)
+    assert query["error"] == ["login_required"]
+    assert query["state"] == [state]
+
+    sub = faker.email()
+    client.post("/oauth2/authorize", query_string=_authorize_query(), data={"sub": sub})
+
+    response = client.get(
+        "/oauth2/authorize", query_string=_authorize_query(prompt="none", state=state)
+    )
+    assert response.location
+    assert parse_qs(urlparse(response.location).query)["state"] == [state]
+    assert _authorized_sub(client, response.location) == sub
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_prompt_none_without_openid_scope(client: flask.testing.FlaskClient):
+    response = client.get(
+        "/oauth2/authorize",
+        query_string=_authorize_query(prompt="none", scope="email"),
+    )
+    assert response.location
+    assert parse_qs(urlparse(response.location).query)["error"] == ["login_required"]
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_prompt_login_shows_form(client: flask.testing.FlaskClient):
+    client.post(
+        "/oauth2/authorize", query_string=_authorize_query(), data={"sub": "alice"}
+    )
+
+    response = client.get(
+        "/oauth2/authorize", query_string=_authorize_query(prompt="login")
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.mimetype == "text/html"
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_login_hint_for_other_user(client: flask.testing.FlaskClient):
+    client.post(
+        "/oauth2/authorize", query_string=_authorize_query(), data={"sub": "alice"}
+    )
+
+    response = client.get(
+        "/oauth2/authorize", query_string=_authorize_query(login_hint="bob")
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    # Authorizing another user replaces the session
+    client.post(
+        "/oauth2/authorize", query_string=_authorize_query(), data={"sub": "bob"}
+    )
+    response = client.get("/oauth2/authorize", query_string=_authorize_query())
+    assert _authorized_sub(client, response.location) == "bob"
+
+
+@use_provider_config(session_max_age=timedelta(hours=1))
+def test_end_session(client: flask.testing.FlaskClient):
+    client.post(
+        "/oauth2/authorize", query_string=_authorize_query(), data={"sub": "alice"}
+    )
+
+    response = client.post(
+        "/oauth2/end_session/confirm", data={"redirect_uri": "https://example.com"}
+    )
+    assert response.status_code == HTTPStatus.FOUND
+
+    response = client.get("/oauth2/authorize", query_string=_authorize_query())
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_sessions_disabled(client: flask.testing.FlaskClient):
+    response = client.post(
+        "/oauth2/authorize", query_string=_authorize_query(), data={"sub": "alice"}
+    )
+    assert "Set-Cookie" not in response.headers
+
+    response = client.get("/oauth2/authorize", query_string=_authorize_query())
+    assert response.status_code == HTTPStatus.OK
+
+
+def _authorize_query(**params: str) -> dict[str, str]:
+    return {
+        "client_id": "client",
+        "redirect_uri": _REDIRECT_URI,
+        "response_type": "code",
+        "scope": "openid",
+        **params,
+    }
+
+
+def _authorized_sub(client: flask.testing.FlaskClient, location: str | None) -> str:
+    assert location
+    code = parse_qs(urlparse(location).query)["code"][0]
+    response = client.post(
+        "/oauth2/token",
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": _REDIRECT_URI,
+        },
+        auth=("client", "secret"),
+    )
+    assert response.json, response.text
+
+    response = client.get(
+        "/userinfo",
+        headers={"Authorization": f"Bearer {response.json['access_token']}"},
+    )
+    assert response.json
+    return response.json["sub"]
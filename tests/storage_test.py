@@ -0,0 +1,685 @@
+import dataclasses
+import os
+import threading
+import time
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import fakeredis
+import pytest
+from faker import Faker
+from freezegun import freeze_time
+
+import oidc_provider_mock._redis_storage
+import oidc_provider_mock._sqlite_storage
+import oidc_provider_mock._storage
+from oidc_provider_mock._keys import (
+    SIGNING_ALGORITHMS,
+    SigningAlgorithm,
+    SigningKey,
+    generate_signing_key,
+)
+from oidc_provider_mock._redis_storage import RedisStorage
+from oidc_provider_mock._sqlite_storage import SqliteStorage
+from oidc_provider_mock._storage import (
+    AccessToken,
+    AuthorizationCode,
+    Client,
+    MemoryStorage,
+    RefreshToken,
+    Storage,
+    User,
+)
+
+faker = Faker()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def storage(request: pytest.FixtureRequest, tmp_path: Path) -> Generator[Storage]:
+    if request.param == "memory":
+        yield MemoryStorage()
+    elif request.param == "sqlite":
+        storage = SqliteStorage(tmp_path / "storage.db")
+        yield storage
+        storage.close()
+    else:
+        with fakeredis.FakeRedis() as client:
+            yield RedisStorage(client)
+
+
+def test_remove_expired(storage: Storage):
+    if isinstance(storage, RedisStorage):
+        pytest.skip("Redis expires entries on the server")
+
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        now = datetime.now(UTC)
+
+        code = _authorization_code(expires_at=now + timedelta(minutes=10))
+        access_token = _access_token(expires_at=now + timedelta(hours=1))
+        refresh_token = _refresh_token(expires_at=now + timedelta(days=1))
+        storage.store_authorization_code(code)
+        storage.store_access_token(access_token)
+        storage.store_refresh_token(refresh_token)
+        storage.add_nonce("nonce", now + timedelta(minutes=10))
+
+        frozen_datetime.tick(timedelta(minutes=10))
+        storage.remove_expired()
+        assert storage.get_authorization_code(code.code) is None
+        assert not storage.exists_nonce("nonce")
+        assert storage.get_access_token(access_token.token) == access_token
+
+        frozen_datetime.tick(timedelta(hours=1))
+        storage.remove_expired()
+        assert storage.get_access_token(access_token.token) is None
+        assert storage.get_refresh_token(refresh_token.token) == refresh_token
+
+        frozen_datetime.tick(timedelta(days=1))
+        storage.remove_expired()
+        assert storage.get_refresh_token(refresh_token.token) is None
+
+
+def test_store_evicts_expired_entries():
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        storage = MemoryStorage()
+
+        for _ in range(100):
+            storage.store_access_token(
+                _access_token(expires_at=datetime.now(UTC) + timedelta(seconds=10))
+            )
+            frozen_datetime.tick(timedelta(seconds=1))
+
+        assert len(list(storage.access_tokens())) == 10
+
+
+def test_remove_expired_ignores_replaced_entries(storage: Storage):
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        now = datetime.now(UTC)
+
+        access_token = _access_token(expires_at=now + timedelta(minutes=1))
+        storage.store_access_token(access_token)
+        storage.remove_access_token(access_token.token)
+        renewed_access_token = AccessToken(
+            token=access_token.token,
+            user_id=access_token.user_id,
+            scope=access_token.scope,
+            expires_at=now + timedelta(minutes=2),
+            client_id=access_token.client_id,
+        )
+        storage.store_access_token(renewed_access_token)
+
+        frozen_datetime.tick(timedelta(minutes=1))
+        storage.remove_expired()
+        assert storage.get_access_token(access_token.token) == renewed_access_token
+
+
+def test_memory_storage_shares_strings():
+    storage = MemoryStorage()
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    user_id = faker.email()
+    first = _access_token(expires_at=expires_at, user_id=user_id)
+    # Equal, but distinct string objects
+    second = AccessToken(
+        token=faker.password(),
+        user_id=user_id.encode().decode(),
+        scope=b"openid".decode(),
+        expires_at=expires_at,
+        client_id=first.client_id.encode().decode(),
+    )
+    assert second.user_id is not first.user_id
+    storage.store_access_token(first)
+    storage.store_access_token(second)
+
+    stored_first = storage.get_access_token(first.token)
+    stored_second = storage.get_access_token(second.token)
+    assert stored_first
+    assert stored_second
+    assert stored_first == first
+    assert stored_second == second
+    assert stored_first.user_id is stored_second.user_id
+    assert stored_first.scope is stored_second.scope
+    assert stored_first.client_id is stored_second.client_id
+
+
+def test_memory_storage_releases_shared_strings():
+    storage = MemoryStorage()
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        expires_at = datetime.now(UTC) + timedelta(minutes=1)
+        storage.store_authorization_code(_authorization_code(expires_at=expires_at))
+        storage.store_tokens(
+            _access_token(expires_at=expires_at),
+            _refresh_token(expires_at=expires_at),
+        )
+        access_token = _access_token(expires_at=expires_at)
+        storage.store_access_token(access_token)
+        storage.remove_access_token(access_token.token)
+        assert len(storage._strings) > 0  # pyright: ignore[reportPrivateUsage]
+
+        frozen_datetime.tick(timedelta(minutes=1))
+        storage.remove_expired()
+        assert len(storage._strings) == 0  # pyright: ignore[reportPrivateUsage]
+
+
+def test_access_token_without_user(storage: Storage):
+    client_id = faker.uuid4()
+    access_token = AccessToken(
+        token=faker.password(),
+        user_id=None,
+        scope="openid",
+        expires_at=datetime.now(UTC) + timedelta(minutes=10),
+        client_id=client_id,
+    )
+    storage.store_access_token(access_token)
+
+    assert storage.get_access_token(access_token.token) == access_token
+    assert storage.remove_user_tokens(client_id) == []
+    assert storage.remove_access_token(access_token.token) == access_token
+    assert storage.get_access_token(access_token.token) is None
+
+
+def test_remove_authorization_code(storage: Storage):
+    code = _authorization_code(expires_at=datetime.now(UTC) + timedelta(minutes=10))
+    storage.store_authorization_code(code)
+
+    def remove(_: int) -> AuthorizationCode | None:
+        return storage.remove_authorization_code(code.code)
+
+    # The code can be redeemed only once
+    with ThreadPoolExecutor(8) as executor:
+        removed = list(executor.map(remove, range(8)))
+    assert [c for c in removed if c is not None] == [code]
+    assert storage.get_authorization_code(code.code) is None
+
+
+def test_remove_user_tokens(storage: Storage):
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    user_id = faker.email()
+    other_user_id = faker.email()
+    user_access_token = _access_token(expires_at=expires_at, user_id=user_id)
+    user_refresh_token = _refresh_token(expires_at=expires_at, user_id=user_id)
+    other_access_token = _access_token(expires_at=expires_at, user_id=other_user_id)
+    other_refresh_token = _refresh_token(expires_at=expires_at, user_id=other_user_id)
+    for access_token in (user_access_token, other_access_token):
+        storage.store_access_token(access_token)
+    for refresh_token in (user_refresh_token, other_refresh_token):
+        storage.store_refresh_token(refresh_token)
+
+    assert storage.remove_user_tokens(user_id) == [user_access_token]
+
+    assert storage.get_access_token(user_access_token.token) is None
+    assert storage.get_refresh_token(user_refresh_token.token) is None
+    assert storage.get_access_token(other_access_token.token) == other_access_token
+    assert storage.get_refresh_token(other_refresh_token.token) == other_refresh_token
+
+    # The user index is kept consistent with removals
+    storage.remove_access_token(other_access_token.token)
+    assert storage.remove_user_tokens(other_user_id) == []
+    assert storage.get_refresh_token(other_refresh_token.token) is None
+
+
+def test_store_token_batch(storage: Storage):
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    user_id = faker.email()
+    refresh_token = _refresh_token(expires_at=expires_at, user_id=user_id)
+    tokens = [
+        (
+            _access_token(
+                expires_at=expires_at, user_id=user_id, token=refresh_token.access_token
+            ),
+            refresh_token,
+        ),
+        (_access_token(expires_at=expires_at, user_id=user_id), None),
+    ]
+
+    storage.store_token_batch(tokens)
+
+    for access_token, _ in tokens:
+        assert storage.get_access_token(access_token.token) == access_token
+    assert storage.get_refresh_token(refresh_token.token) == refresh_token
+    assert sorted(
+        token.token for token in storage.remove_user_tokens(user_id)
+    ) == sorted(access_token.token for access_token, _ in tokens)
+    assert storage.get_refresh_token(refresh_token.token) is None
+
+
+def test_refresh_token_family(storage: Storage):
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    first = _refresh_token(expires_at=expires_at)
+    second = _refresh_token(expires_at=expires_at, family_id=first.family_id)
+    access_token = _access_token(expires_at=expires_at, token=second.access_token)
+    storage.store_access_token(access_token)
+    storage.store_refresh_token(first)
+    storage.store_refresh_token(second)
+
+    storage.retire_refresh_token(first.token)
+    assert storage.get_refresh_token(first.token) is None
+    assert storage.get_retired_refresh_token_family(first.token) == first.family_id
+
+    assert storage.remove_refresh_token_family(first.family_id) == [access_token]
+    assert storage.get_refresh_token(second.token) is None
+    assert storage.get_access_token(second.access_token) is None
+    if not isinstance(storage, RedisStorage):
+        assert storage.get_retired_refresh_token_family(first.token) is None
+
+
+def test_retired_refresh_token_expires(storage: Storage):
+    if isinstance(storage, RedisStorage):
+        pytest.skip("Redis expires entries on the server")
+
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        refresh_token = _refresh_token(
+            expires_at=datetime.now(UTC) + timedelta(hours=1)
+        )
+        storage.store_refresh_token(refresh_token)
+        storage.retire_refresh_token(refresh_token.token)
+
+        frozen_datetime.tick(timedelta(hours=1))
+        storage.remove_expired()
+        assert storage.get_retired_refresh_token_family(refresh_token.token) is None
+
+
+def test_memory_storage_retired_refresh_token_expires_with_its_entry():
+    storage = MemoryStorage()
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        refresh_token = _refresh_token(
+            expires_at=datetime.now(UTC) + timedelta(hours=1)
+        )
+        storage.store_refresh_token(refresh_token)
+        storage.retire_refresh_token(refresh_token.token)
+        # The entry queued for the refresh token also expires the retired token
+        assert len(storage._expiry_queue) == 1  # pyright: ignore[reportPrivateUsage]
+
+        frozen_datetime.tick(timedelta(hours=1))
+        storage.remove_expired()
+        assert storage._expiry_queue == []  # pyright: ignore[reportPrivateUsage]
+        assert storage._retired_refresh_tokens == {}  # pyright: ignore[reportPrivateUsage]
+        assert storage._retired_refresh_tokens_by_family == {}  # pyright: ignore[reportPrivateUsage]
+
+
+def test_revoked_access_tokens(storage: Storage):
+    if isinstance(storage, RedisStorage):
+        pytest.skip("Redis expires entries on the server")
+
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        token_id = faker.uuid4()
+        assert not storage.is_access_token_revoked(token_id)
+
+        storage.revoke_access_token(token_id, datetime.now(UTC) + timedelta(hours=1))
+        assert storage.is_access_token_revoked(token_id)
+
+        frozen_datetime.tick(timedelta(hours=1))
+        storage.remove_expired()
+        assert not storage.is_access_token_revoked(token_id)
+
+
+def test_sessions(storage: Storage):
+    session_id = faker.uuid4()
+    sub = faker.email()
+    assert storage.get_session(session_id) is None
+
+    storage.store_session(session_id, sub, datetime.now(UTC) + timedelta(hours=1))
+    assert storage.get_session(session_id) == sub
+
+    storage.remove_session(session_id)
+    assert storage.get_session(session_id) is None
+
+
+def test_session_expires(storage: Storage):
+    if isinstance(storage, RedisStorage):
+        pytest.skip("Redis expires entries on the server")
+
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        session_id = faker.uuid4()
+        storage.store_session(
+            session_id, faker.email(), datetime.now(UTC) + timedelta(hours=1)
+        )
+
+        # Expired sessions are not returned before they are removed
+        frozen_datetime.tick(timedelta(hours=1))
+        assert storage.get_session(session_id) is None
+
+        storage.remove_expired()
+        assert storage.get_session(session_id) is None
+
+
+def test_rotate_signing_key(storage: Storage):
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        for alg in SIGNING_ALGORITHMS:
+            old_key = storage.signing_key(alg)
+            assert storage.rotate_signing_key(
+                alg, datetime.now(UTC) + timedelta(hours=1)
+            )
+            assert storage.signing_key(alg).thumbprint() != old_key.thumbprint()
+            assert storage.signing_key_created_at(alg) == datetime.now(UTC)
+
+            retired = {key.thumbprint() for key in storage.retired_signing_keys()}
+            assert old_key.thumbprint() in retired
+
+        frozen_datetime.tick(timedelta(hours=1))
+        storage.remove_expired()
+        assert list(storage.retired_signing_keys()) == []
+
+
+def test_rotate_signing_key_max_created_at(storage: Storage):
+    created_at = storage.signing_key_created_at("RS256")
+    key = storage.signing_key("RS256")
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+
+    # Another provider has already replaced the key
+    assert not storage.rotate_signing_key(
+        "RS256", expires_at, max_created_at=created_at - timedelta(seconds=1)
+    )
+    assert storage.signing_key("RS256").thumbprint() == key.thumbprint()
+    assert list(storage.retired_signing_keys()) == []
+
+    assert storage.rotate_signing_key("RS256", expires_at, max_created_at=created_at)
+    assert storage.signing_key("RS256").thumbprint() != key.thumbprint()
+    assert [key.thumbprint() for key in storage.retired_signing_keys()] == [
+        key.thumbprint()
+    ]
+
+
+def test_rotate_signing_key_concurrently(
+    storage: Storage, monkeypatch: pytest.MonkeyPatch
+):
+    max_created_at = storage.signing_key_created_at("ES256")
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+
+    def slow_generate_signing_key(alg: SigningAlgorithm) -> SigningKey:
+        # Give the other threads time to read the current key
+        time.sleep(0.05)
+        return generate_signing_key(alg)
+
+    for module in [
+        oidc_provider_mock._storage,
+        oidc_provider_mock._sqlite_storage,
+        oidc_provider_mock._redis_storage,
+    ]:
+        monkeypatch.setattr(module, "generate_signing_key", slow_generate_signing_key)
+
+    barrier = threading.Barrier(8)
+
+    def rotate(_: int) -> bool:
+        barrier.wait()
+        return storage.rotate_signing_key(
+            "ES256", expires_at, max_created_at=max_created_at
+        )
+
+    with ThreadPoolExecutor(8) as executor:
+        rotated = list(executor.map(rotate, range(8)))
+
+    assert rotated.count(True) == 1
+    assert len(storage.retired_signing_keys()) == 1
+
+
+def test_users_and_clients(storage: Storage):
+    user = User(sub=faker.email(), claims={"name": faker.name(), "age": 42})
+    storage.store_user(user)
+    assert storage.get_user(user.sub) == user
+
+    client = Client(
+        id=faker.uuid4(),
+        secret=faker.password(),
+        redirect_uris=[faker.uri()],
+        allowed_scopes=["openid", "email"],
+        token_endpoint_auth_method="client_secret_post",
+        id_token_signed_response_alg="ES256",
+    )
+    storage.store_client(client)
+    assert storage.get_client(client.id) == client
+
+
+def test_recent_subjects(storage: Storage):
+    subjects = [faker.email() for _ in range(25)]
+    for sub in subjects:
+        storage.record_subject(sub)
+    storage.record_subject(subjects[10])
+
+    assert list(storage.get_recent_subjects()) == [
+        subjects[10],
+        *reversed(subjects[11:]),
+        *reversed(subjects[5:10]),
+    ]
+
+
+def test_concurrent_access(storage: Storage):
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    user_ids = [faker.email() for _ in range(4)]
+
+    def issue_tokens(user_id: str) -> list[RefreshToken]:
+        refresh_tokens: list[RefreshToken] = []
+        for _ in range(50):
+            access_token = _access_token(expires_at=expires_at, user_id=user_id)
+            refresh_token = _refresh_token(expires_at=expires_at, user_id=user_id)
+            storage.store_tokens(access_token, refresh_token)
+            storage.retire_refresh_token(refresh_token.token)
+            storage.record_subject(user_id)
+            refresh_tokens.append(refresh_token)
+        return refresh_tokens
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as executor:
+        issued = list(executor.map(issue_tokens, user_ids))
+        list(executor.map(storage.remove_user_tokens, user_ids))
+
+    assert set(storage.get_recent_subjects()) == set(user_ids)
+    for refresh_tokens in issued:
+        for refresh_token in refresh_tokens:
+            assert storage.get_refresh_token(refresh_token.token) is None
+            assert (
+                storage.get_retired_refresh_token_family(refresh_token.token)
+                == refresh_token.family_id
+            )
+
+    if isinstance(storage, MemoryStorage):
+        assert not any(storage._access_tokens_by_user.values())  # pyright: ignore[reportPrivateUsage]
+        assert not any(storage._refresh_tokens_by_user.values())  # pyright: ignore[reportPrivateUsage]
+
+
+def test_redis_storage_shared():
+    server = fakeredis.FakeServer()
+    with (
+        fakeredis.FakeRedis(server=server) as first_client,
+        fakeredis.FakeRedis(server=server) as second_client,
+    ):
+        first = RedisStorage(first_client)
+        second = RedisStorage(second_client)
+
+        for alg in SIGNING_ALGORITHMS:
+            assert (
+                first.signing_key(alg).thumbprint()
+                == second.signing_key(alg).thumbprint()
+            )
+
+        expires_at = datetime.now(UTC) + timedelta(hours=1)
+        access_token = _access_token(expires_at=expires_at)
+        refresh_token = _refresh_token(expires_at=expires_at)
+        first.store_tokens(access_token, refresh_token)
+        assert second.get_access_token(access_token.token) == access_token
+        assert second.get_refresh_token(refresh_token.token) == refresh_token
+
+
+def test_redis_storage_ttl():
+    with fakeredis.FakeRedis() as client:
+        storage = RedisStorage(client, prefix="test:")
+        access_token = _access_token(
+            expires_at=datetime.now(UTC) + timedelta(minutes=10)
+        )
+        storage.store_access_token(access_token)
+
+        ttl = client.pttl(f"test:access_token:{access_token.token}")
+        assert (
+            timedelta(minutes=9) < timedelta(milliseconds=ttl) <= timedelta(minutes=10)
+        )
+
+
+def test_redis_storage_prunes_token_indexes():
+    with (
+        freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime,
+        fakeredis.FakeRedis() as client,
+    ):
+        storage = RedisStorage(client, prefix="test:")
+        user_id = faker.email()
+        for _ in range(3):
+            frozen_datetime.tick(timedelta(minutes=2))
+            storage.store_access_token(
+                _access_token(
+                    expires_at=datetime.now(UTC) + timedelta(minutes=1),
+                    user_id=user_id,
+                )
+            )
+
+        # Only the token that has not expired is indexed
+        assert client.zcard(f"test:user_access_tokens:{user_id}") == 1
+
+
+def test_redis_storage_token_index_ttl_is_not_shortened():
+    with fakeredis.FakeRedis() as client:
+        storage = RedisStorage(client, prefix="test:")
+        user_id = faker.email()
+        now = datetime.now(UTC)
+        storage.store_access_token(
+            _access_token(expires_at=now + timedelta(hours=1), user_id=user_id)
+        )
+        # Stored by a provider with a shorter token lifetime
+        storage.store_access_token(
+            _access_token(expires_at=now + timedelta(minutes=1), user_id=user_id)
+        )
+
+        ttl = client.pttl(f"test:user_access_tokens:{user_id}")
+        assert isinstance(ttl, int)
+        assert ttl > timedelta(minutes=59) // timedelta(milliseconds=1)
+
+
+def test_redis_rotate_signing_key_race(monkeypatch: pytest.MonkeyPatch):
+    with fakeredis.FakeRedis() as client:
+        storage = RedisStorage(client)
+        other = RedisStorage(client)
+        key = storage.signing_key("RS256")
+        expires_at = datetime.now(UTC) + timedelta(hours=1)
+
+        def generate_key(alg: SigningAlgorithm) -> SigningKey:
+            # The other provider rotates the key after `storage` has read it
+            monkeypatch.undo()
+            assert other.rotate_signing_key(alg, expires_at)
+            return generate_signing_key(alg)
+
+        monkeypatch.setattr(
+            oidc_provider_mock._redis_storage, "generate_signing_key", generate_key
+        )
+        assert not storage.rotate_signing_key("RS256", expires_at)
+
+        # Only the key of the other provider replaced the original key
+        assert [key.thumbprint() for key in storage.retired_signing_keys()] == [
+            key.thumbprint()
+        ]
+        assert storage.signing_key("RS256").thumbprint() == (
+            other.signing_key("RS256").thumbprint()
+        )
+
+
+def test_sqlite_storage_shared(tmp_path: Path):
+    first = SqliteStorage(tmp_path / "storage.db")
+    second = SqliteStorage(tmp_path / "storage.db")
+
+    for alg in SIGNING_ALGORITHMS:
+        assert (
+            first.signing_key(alg).thumbprint() == second.signing_key(alg).thumbprint()
+        )
+
+    access_token = _access_token(expires_at=datetime.now(UTC) + timedelta(hours=1))
+    first.store_access_token(access_token)
+    assert second.get_access_token(access_token.token) == access_token
+
+    first.close()
+    second.close()
+
+
+def test_sqlite_storage_removes_expired_entries_periodically(tmp_path: Path):
+    with freeze_time(faker.date_time(tzinfo=UTC)) as frozen_datetime:
+        storage = SqliteStorage(tmp_path / "storage.db")
+        expired = _access_token(expires_at=datetime.now(UTC) + timedelta(seconds=1))
+        storage.store_access_token(expired)
+
+        frozen_datetime.tick(timedelta(seconds=2))
+        storage.store_access_token(
+            _access_token(expires_at=datetime.now(UTC) + timedelta(hours=1))
+        )
+        # Expired entries were removed less than ten seconds ago
+        assert storage.get_access_token(expired.token) == expired
+
+        frozen_datetime.tick(timedelta(seconds=10))
+        storage.store_access_token(
+            _access_token(expires_at=datetime.now(UTC) + timedelta(hours=1))
+        )
+        assert storage.get_access_token(expired.token) is None
+
+        storage.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork()")
+def test_sqlite_storage_fork(tmp_path: Path):
+    storage = SqliteStorage(tmp_path / "storage.db")
+    access_token = _access_token(expires_at=datetime.now(UTC) + timedelta(hours=1))
+    storage.store_access_token(access_token)
+
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            # The child must open its own connection
+            storage.store_access_token(
+                dataclasses.replace(access_token, token="from-child")
+            )
+            storage.close()
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert storage.get_access_token("from-child")
+    assert storage.get_access_token(access_token.token) == access_token
+    storage.close()
+
+
+def _authorization_code(*, expires_at: datetime) -> AuthorizationCode:
+    return AuthorizationCode(
+        code=faker.password(),
+        client_id=faker.uuid4(),
+        redirect_uri=faker.uri(),
+        user_id=faker.email(),
+        scope="openid",
+        nonce=None,
+        expires_at=expires_at,
+    )
+
+
+def _access_token(
+    *, expires_at: datetime, user_id: str | None = None, token: str | None = None
+) -> AccessToken:
+    return AccessToken(
+        token=faker.password() if token is None else token,
+        user_id=faker.email() if user_id is None else user_id,
+        scope="openid",
+        expires_at=expires_at,
+        client_id=faker.uuid4(),
+    )
+
+
+def _refresh_token(
+    *,
+    expires_at: datetime,
+    user_id: str | None = None,
+    family_id: str | None = None,
+) -> RefreshToken:
+    token = faker.password()
+    return RefreshToken(
+        token=token,
+        user_id=faker.email() if user_id is None else user_id,
+        scope="openid",
+        expires_at=expires_at,
+        client_id=faker.uuid4(),
+        access_token=faker.password(),
+        family_id=token if family_id is None else family_id,
+    )
@@ -1,16 +1,32 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlparse
 
 import flask.testing
 import httpx
+import joserfc.jwk
 import joserfc.jws
+import joserfc.jwt
 import pytest
 from authlib.integrations.base_client import OAuthError
 from faker import Faker
 from freezegun import freeze_time
 
+import oidc_provider_mock
+import oidc_provider_mock._app
+import oidc_provider_mock._keys
 from oidc_provider_mock._client_lib import OidcClient, TokenData
+from oidc_provider_mock._keys import (
+    SIGNING_ALGORITHMS,
+    SigningAlgorithm,
+    generate_signing_key,
+)
 
-from .conftest import fake_client, use_provider_config
+from .conftest import fake_client, run_server, use_provider_config
 
 faker = Faker()
 
@@ -50,6 +66,39 @@ def test_refresh_token_rotates_access_token(oidc_server: str):
     client.fetch_userinfo(token=refresh_token_data.access_token)
 
 
+def test_refresh_token_rotation(oidc_server: str):
+    client = fake_client(oidc_server)
+
+    token_data = _authorize_and_fetch_token(client)
+    assert token_data.refresh_token is not None
+
+    refresh_token_data = client.refresh_token(refresh_token=token_data.refresh_token)
+    assert refresh_token_data.refresh_token is not None
+    assert refresh_token_data.refresh_token != token_data.refresh_token
+
+    client.refresh_token(refresh_token=refresh_token_data.refresh_token)
+
+
+def test_refresh_token_reuse_revokes_family(oidc_server: str):
+    client = fake_client(oidc_server)
+
+    token_data = _authorize_and_fetch_token(client)
+    assert token_data.refresh_token is not None
+    refresh_token_data = client.refresh_token(refresh_token=token_data.refresh_token)
+    assert refresh_token_data.refresh_token is not None
+
+    with pytest.raises(OAuthError, match="invalid_grant: invalid refresh token"):
+        client.refresh_token(token_data.refresh_token)
+
+    # All tokens descending from the reused token are revoked
+    with pytest.raises(httpx.HTTPStatusError) as e:
+        client.fetch_userinfo(token=refresh_token_data.access_token)
+    assert e.value.response.json()["error"] == "access_denied"
+
+    with pytest.raises(OAuthError, match="invalid_grant: invalid refresh token"):
+        client.refresh_token(refresh_token_data.refresh_token)
+
+
 @use_provider_config(access_token_max_age=timedelta(minutes=2))
 def test_refresh_token_respects_configured_token_max_age(oidc_server: str):
     client = fake_client(oidc_server)
@@ -75,6 +124,8 @@ def test_refresh_token_issues_id_token(oidc_server: str):
 
     assert refresh_token_data.claims is not None
     assert refresh_token_data.claims["sub"] == email
+    # The time the user authenticated is not known when refreshing
+    assert "auth_time" not in refresh_token_data.claims
 
 
 def test_revoke_tokens(oidc_server: str):
@@ -112,15 +163,319 @@ def test_userinfo_expired_token(oidc_server: str):
         assert response["error"] == "invalid_token"
 
 
+@use_provider_config(authorization_code_max_age=timedelta(minutes=5))
+def test_authorization_code_expired(oidc_server: str):
+    with freeze_time(faker.date(), tick=True) as frozen_datetime:
+        client = fake_client(oidc_server)
+        state = faker.password()
+        response = httpx.post(
+            client.authorization_url(state=state),
+            data={"sub": faker.email()},
+        )
+        assert response.status_code == 302
+
+        frozen_datetime.tick(timedelta(minutes=6))
+        with pytest.raises(OAuthError, match="invalid_grant"):
+            client.fetch_token(response.headers["location"], state=state)
+
+
 def test_id_token_header_has_kid(oidc_server: str):
     client = fake_client(oidc_server)
 
     _authorize_and_fetch_token(client)
 
-    id_token = client._authlib_client.token["id_token"]  # type: ignore[index]
-    assert isinstance(id_token, str)
-    header = joserfc.jws.extract_compact(id_token.encode()).protected
-    assert "kid" in header
+    jwks = httpx.get(f"{oidc_server}jwks").json()
+    assert _id_token_kid(client) in [key["kid"] for key in jwks["keys"]]
+
+
+def test_id_token_claims(oidc_server: str):
+    sub = faker.email()
+    # Claims of the user don’t override the standard claims
+    httpx.put(
+        f"{oidc_server}users/{sub}", json={"iss": "https://example.com"}
+    ).raise_for_status()
+    client = fake_client(oidc_server)
+
+    _authorize_and_fetch_token(client, sub=sub)
+
+    claims = _id_token_claims(client)
+    assert claims["iss"] == oidc_server.rstrip("/")
+    assert claims["aud"] == [client.id]
+    assert claims["auth_time"] == claims["iat"]
+    assert "nonce" not in claims
+
+
+def test_rotate_signing_keys(oidc_server: str):
+    client = fake_client(oidc_server)
+    old_token_data = _authorize_and_fetch_token(client)
+    old_kid = _id_token_kid(client)
+
+    response = httpx.post(f"{oidc_server}signing-keys/rotate")
+    assert response.status_code == 204
+
+    # The client fetches the new key when it sees an unknown `kid`
+    _authorize_and_fetch_token(client)
+    new_kid = _id_token_kid(client)
+    assert new_kid != old_kid
+
+    jwks = httpx.get(f"{oidc_server}jwks").json()
+    kids = [key["kid"] for key in jwks["keys"]]
+    assert old_kid in kids
+    assert new_kid in kids
+    # Tokens issued before the rotation stay valid
+    client.fetch_userinfo(old_token_data.access_token)
+
+
+def test_rotate_signing_keys_unsupported_alg(oidc_server: str):
+    response = httpx.post(f"{oidc_server}signing-keys/rotate", params={"alg": "HS256"})
+    assert response.status_code == 400
+
+
+@use_provider_config(
+    signing_key_rotation_interval=timedelta(hours=1),
+    access_token_max_age=timedelta(minutes=10),
+)
+def test_scheduled_signing_key_rotation(oidc_server: str):
+    with freeze_time(faker.date(), tick=True) as frozen_datetime:
+        client = fake_client(oidc_server)
+        _authorize_and_fetch_token(client)
+        old_kid = _id_token_kid(client)
+
+        frozen_datetime.tick(timedelta(minutes=30))
+        _authorize_and_fetch_token(client)
+        assert _id_token_kid(client) == old_kid
+
+        frozen_datetime.tick(timedelta(minutes=31))
+        _authorize_and_fetch_token(client)
+        assert _id_token_kid(client) != old_kid
+
+        kids = [key["kid"] for key in httpx.get(f"{oidc_server}jwks").json()["keys"]]
+        assert old_kid in kids
+
+        # The retired key is removed once all tokens signed with it expired
+        frozen_datetime.tick(timedelta(minutes=11))
+        kids = [key["kid"] for key in httpx.get(f"{oidc_server}jwks").json()["keys"]]
+        assert old_kid not in kids
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_jwt_access_token(oidc_server: str):
+    sub = faker.email()
+    client = fake_client(oidc_server)
+    token_data = _authorize_and_fetch_token(client, sub=sub)
+
+    jwks = joserfc.jwk.KeySet.import_key_set(httpx.get(f"{oidc_server}jwks").json())
+    token = joserfc.jwt.decode(token_data.access_token, jwks)
+    assert token.header["typ"] == "at+jwt"
+    assert token.claims["iss"] == oidc_server.rstrip("/")
+    assert token.claims["sub"] == sub
+    assert token.claims["client_id"] == client.id
+    assert token.claims["aud"] == client.id
+    assert token.claims["scope"] == "openid email"
+    assert token.claims["exp"] - token.claims["iat"] == 3600
+
+    assert client.fetch_userinfo(token_data.access_token)["sub"] == sub
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_jwt_access_token_invalid_signature(oidc_server: str):
+    client = fake_client(oidc_server)
+    token_data = _authorize_and_fetch_token(client)
+
+    # Sign the same header and claims with a different key
+    token = joserfc.jws.extract_compact(token_data.access_token.encode())
+    forged = joserfc.jwt.encode(
+        token.protected, json.loads(token.payload), generate_signing_key("RS256")
+    )
+    with pytest.raises(httpx.HTTPStatusError) as e:
+        client.fetch_userinfo(forged)
+    assert e.value.response.json()["error"] == "access_denied"
+
+
+@use_provider_config(jwt_access_tokens=True, access_token_max_age=timedelta(minutes=5))
+def test_jwt_access_token_expired(oidc_server: str):
+    with freeze_time(faker.date(), tick=True) as frozen_datetime:
+        client = fake_client(oidc_server)
+        token_data = _authorize_and_fetch_token(client)
+        frozen_datetime.tick(timedelta(minutes=6))
+        with pytest.raises(httpx.HTTPStatusError) as e:
+            client.fetch_userinfo(token_data.access_token)
+        assert e.value.response.json()["error"] == "invalid_token"
+
+
+@use_provider_config(jwt_access_tokens=True)
+def test_jwt_access_token_revoked(oidc_server: str):
+    sub = faker.email()
+    client = fake_client(oidc_server)
+    token_data = _authorize_and_fetch_token(client, sub=sub)
+
+    assert token_data.refresh_token
+    refreshed = client.refresh_token(token_data.refresh_token)
+    # Refreshing revokes the previous access token
+    with pytest.raises(httpx.HTTPStatusError) as e:
+        client.fetch_userinfo(token_data.access_token)
+    assert e.value.response.json()["error"] == "access_denied"
+
+    client.fetch_userinfo(refreshed.access_token)
+    httpx.post(f"{oidc_server}users/{sub}/revoke-tokens").raise_for_status()
+    with pytest.raises(httpx.HTTPStatusError) as e:
+        client.fetch_userinfo(refreshed.access_token)
+    assert e.value.response.json()["error"] == "access_denied"
+
+
+def test_jwt_access_token_validated_without_shared_storage(tmp_path: Path):
+    key_file = tmp_path / "key.pem"
+    key_file.write_bytes(generate_signing_key("RS256").as_pem(private=True))
+    with (
+        run_server(
+            oidc_provider_mock.app(
+                jwt_access_tokens=True, signing_key_file=str(key_file)
+            )
+        ) as first,
+        run_server(
+            oidc_provider_mock.app(
+                jwt_access_tokens=True, signing_key_file=str(key_file)
+            )
+        ) as second,
+    ):
+        sub = faker.email()
+        token_data = _authorize_and_fetch_token(fake_client(first.url()), sub=sub)
+
+        # Both providers are reached under the same issuer URL, for example
+        # behind a load balancer.
+        response = httpx.get(
+            second.url("/userinfo"),
+            headers={
+                "authorization": f"Bearer {token_data.access_token}",
+                "host": urlparse(first.url()).netloc,
+            },
+        )
+        assert response.json() == {"sub": sub}
+
+
+def test_shared_sqlite_storage(tmp_path: Path):
+    storage_url = f"sqlite:{tmp_path / 'provider.db'}"
+    with (
+        run_server(oidc_provider_mock.app(storage_url=storage_url)) as first,
+        run_server(oidc_provider_mock.app(storage_url=storage_url)) as second,
+    ):
+        sub = faker.email()
+        token_data = _authorize_and_fetch_token(fake_client(first.url()), sub=sub)
+
+        response = httpx.get(
+            second.url("/userinfo"),
+            headers={"authorization": f"Bearer {token_data.access_token}"},
+        )
+        assert response.json()["sub"] == sub
+
+
+def test_authorization_code_exchanged_once_with_shared_storage(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    storage_url = f"sqlite:{tmp_path / 'provider.db'}"
+    redirect_uri = "https://example.com/callback"
+
+    # Hold exchanges between reading and removing the code until both requests
+    # got there or the barrier times out.
+    barrier = threading.Barrier(2, timeout=1)
+    authenticate_user = oidc_provider_mock._app.AuthorizationCodeGrant.authenticate_user
+
+    def wait_and_authenticate_user(self: Any, authorization_code: Any):
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return authenticate_user(self, authorization_code)
+
+    monkeypatch.setattr(
+        oidc_provider_mock._app.AuthorizationCodeGrant,
+        "authenticate_user",
+        wait_and_authenticate_user,
+    )
+
+    with (
+        run_server(oidc_provider_mock.app(storage_url=storage_url)) as first,
+        run_server(oidc_provider_mock.app(storage_url=storage_url)) as second,
+    ):
+        response = httpx.post(
+            first.url("/oauth2/authorize"),
+            params={
+                "client_id": "client",
+                "redirect_uri": redirect_uri,
+                "response_type": "code",
+                "scope": "openid email",
+            },
+            data={"sub": faker.email()},
+        )
+        code = parse_qs(urlparse(response.headers["location"]).query)["code"][0]
+
+        def exchange(server_url: str) -> int:
+            return httpx.post(
+                f"{server_url}oauth2/token",
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": redirect_uri,
+                },
+                auth=("client", "secret"),
+            ).status_code
+
+        with ThreadPoolExecutor(2) as executor:
+            status_codes = list(executor.map(exchange, [first.url(), second.url()]))
+
+    assert sorted(status_codes) == [200, 400]
+
+
+@pytest.mark.parametrize("alg", SIGNING_ALGORITHMS)
+@pytest.mark.parametrize("key_format", ["pem", "jwk"])
+def test_signing_key_file(tmp_path: Path, key_format: str, alg: SigningAlgorithm):
+    key = generate_signing_key(alg)
+    key_file = tmp_path / f"key.{key_format}"
+    if key_format == "pem":
+        key_file.write_bytes(key.as_pem(private=True))
+    else:
+        key_file.write_text(json.dumps(key.as_dict(private=True)))
+
+    with run_server(oidc_provider_mock.app(signing_key_file=str(key_file))) as server:
+        jwks = joserfc.jwk.KeySet.import_key_set(httpx.get(server.url("/jwks")).json())
+        assert key.thumbprint() in [k.thumbprint() for k in jwks.keys]
+
+        # The client verifies the ID token with the key set
+        sub = faker.email()
+        token_data = _authorize_and_fetch_token(fake_client(server.url()), sub=sub)
+        assert token_data.claims["sub"] == sub
+
+
+def test_signing_key_file_public_key(tmp_path: Path):
+    key = joserfc.jwk.RSAKey.generate_key(private=True)
+    key_file = tmp_path / "key.pem"
+    key_file.write_bytes(key.as_pem(private=False))
+
+    with pytest.raises(ValueError, match="does not contain a private key"):
+        oidc_provider_mock.app(signing_key_file=str(key_file))
+
+
+def test_app_does_not_generate_signing_key(monkeypatch: pytest.MonkeyPatch):
+    generated_keys: list[joserfc.jwk.RSAKey] = []
+    generate_key = joserfc.jwk.RSAKey.generate_key
+
+    def generate_key_spy(*args: Any, **kwargs: Any):
+        key = generate_key(*args, **kwargs)
+        generated_keys.append(key)
+        return key
+
+    monkeypatch.setattr(joserfc.jwk.RSAKey, "generate_key", generate_key_spy)
+    # Forget the keys that other tests generated
+    monkeypatch.setattr(oidc_provider_mock._keys, "_default_signing_keys", {})
+
+    apps = [oidc_provider_mock.app() for _ in range(10)]
+    # Keys are generated lazily
+    assert generated_keys == []
+
+    # The key is shared by all providers in the process
+    for app in apps:
+        assert app.test_client().get("/jwks").status_code == 200
+    assert len(generated_keys) == 1
 
 
 def _authorize_and_fetch_token(client: OidcClient, sub: str | None = None) -> TokenData:
@@ -131,3 +486,19 @@ def _authorize_and_fetch_token(client: OidcClient, sub: str | None = None) -> To
     )
     assert response.status_code == 302
     return client.fetch_token(response.headers["location"], state=state)
+
+
+def _id_token_kid(client: OidcClient) -> str:
+    kid = _id_token(client).protected.get("kid")
+    assert isinstance(kid, str)
+    return kid
+
+
+def _id_token_claims(client: OidcClient) -> dict[str, Any]:
+    return json.loads(_id_token(client).payload)
+
+
+def _id_token(client: OidcClient) -> joserfc.jws.CompactSignature:
+    id_token = client._authlib_client.token["id_token"]  # type: ignore[index]
+    assert isinstance(id_token, str)
+    return joserfc.jws.extract_compact(id_token.encode())